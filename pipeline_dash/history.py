@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from pipeline_dash.job_data import JobDataDict, JobName, JobStatus, ServerUrl
+
+logger = logging.getLogger(__name__)
+
+HISTORY_SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    server TEXT NOT NULL,
+    job TEXT NOT NULL,
+    build_num INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    timestamp REAL,
+    duration REAL,
+    serial TEXT,
+    url TEXT,
+    PRIMARY KEY (server, job, build_num)
+) WITHOUT ROWID;
+"""
+
+_UNFINISHED = (JobStatus.IN_PROGRESS, JobStatus.UNDEFINED, JobStatus.NOT_RUN)
+
+
+@dataclass
+class BuildRecord:
+    """A finished build of a job, as stored in the `JobHistory`"""
+
+    build_num: int
+    status: JobStatus
+    timestamp: Optional[datetime] = None
+    """Start of the build (UTC)"""
+    duration: Optional[float] = None
+    """Seconds the build took, None if unknown"""
+    serial: Optional[str] = None
+    url: Optional[str] = None
+
+
+def _to_epoch(timestamp: Optional[datetime]) -> Optional[float]:
+    return None if timestamp is None else timestamp.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _from_epoch(epoch: Optional[float]) -> Optional[datetime]:
+    return None if epoch is None else datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None)
+
+
+def _build_number(job: JobName, build_num: Any) -> Optional[int]:
+    """Number of the build with the id `build_num`, None if the id is not a number and cannot be stored"""
+    if build_num is None:
+        return None
+    try:
+        return int(build_num)
+    except (TypeError, ValueError):
+        logger.debug(f"Not storing build {build_num!r} of {job}, its id is not a number")
+        return None
+
+
+class JobHistory:
+    """
+    Append-only history of the finished builds of all jobs, in an SQLite database in WAL mode. Builds are keyed by
+    (server, job, build number): each build is stored once, when it is first seen finished, and never updated. Reads
+    do not block the ingestion of new builds, and can be done from any thread or process.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as con:
+            version = con.execute("PRAGMA user_version").fetchone()[0]
+            if version not in (0, HISTORY_SCHEMA_VERSION):
+                # there is no migration between the versions yet, the history is recorded again
+                logger.warning(
+                    f"History {path} has schema version {version} instead of {HISTORY_SCHEMA_VERSION}, recreating it"
+                )
+                con.execute("DROP TABLE IF EXISTS builds")
+            con.executescript(_SCHEMA)
+            con.execute(f"PRAGMA user_version = {HISTORY_SCHEMA_VERSION}")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connection of the calling thread, reconnects in forked processes"""
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.pid = os.getpid()
+            self._local.con = sqlite3.connect(self.path, timeout=10.0)
+            self._local.con.execute("PRAGMA journal_mode = WAL")
+            self._local.con.execute("PRAGMA synchronous = NORMAL")
+        return self._local.con
+
+    def ingest(self, job_data: JobDataDict) -> int:
+        """
+        Store the last builds of `job_data`, and the builds of their `history`, that are finished and not stored yet.
+        Running builds are stored by a later ingestion, once they finished.
+        :return: Number of builds stored
+        """
+        rows = [
+            (
+                data.server or "",
+                name,
+                build_num,
+                data.status.value,
+                _to_epoch(data.timestamp),
+                data.duration,
+                data.serial,
+                data.url,
+            )
+            for name, data in job_data.items()
+            if data and not data.stale and data.status not in _UNFINISHED
+            if (build_num := _build_number(name, data.build_num)) is not None
+        ]
+        # earlier builds requested with the job, after the last builds so that those are stored with serial and url
+        rows += [
+            (
+                data.server or "",
+                name,
+                build.number,
+                build.status.value,
+                _to_epoch(build.timestamp),
+                build.duration,
+                None,
+                None,
+            )
+            for name, data in job_data.items()
+            if data and data.history and not data.stale
+            for build in data.history
+            if build.status not in _UNFINISHED
+        ]
+        with self._connection() as con:
+            stored = con.executemany("INSERT OR IGNORE INTO builds VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows).rowcount
+        if stored:
+            logger.debug(f"Stored {stored} new builds in {self.path}")
+        return stored
+
+    def last_builds(self, server: ServerUrl, job: JobName, n: int = 10) -> list[BuildRecord]:
+        """Last `n` finished builds of `job`, newest first"""
+        rows = self._connection().execute(
+            "SELECT build_num, status, timestamp, duration, serial, url FROM builds "
+            "WHERE server = ? AND job = ? ORDER BY build_num DESC LIMIT ?",
+            (server, job, n),
+        )
+        return [
+            BuildRecord(
+                build_num=build_num,
+                status=JobStatus(status),
+                timestamp=_from_epoch(timestamp),
+                duration=duration,
+                serial=serial,
+                url=url,
+            )
+            for build_num, status, timestamp, duration, serial, url in rows
+        ]
+
+    def last_results(self, server: ServerUrl, job: JobName, n: int = 10) -> list[JobStatus]:
+        """Results of the last `n` finished builds of `job`, newest first"""
+        return [build.status for build in self.last_builds(server, job, n)]
+
+    def durations(self, server: ServerUrl, job: JobName, n: int = 10) -> list[Optional[float]]:
+        """Durations in seconds of the last `n` finished builds of `job`, newest first"""
+        return [build.duration for build in self.last_builds(server, job, n)]
+
+    def serials(self, server: ServerUrl, job: JobName, n: int = 10) -> list[Optional[str]]:
+        """Serials of the last `n` finished builds of `job`, newest first"""
+        return [build.serial for build in self.last_builds(server, job, n)]
+
+    def close(self) -> None:
+        """Close the connection of the calling thread"""
+        if getattr(self._local, "pid", None) == os.getpid():
+            self._local.con.close()
+            del self._local.pid
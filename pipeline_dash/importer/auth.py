@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Callable, Optional
+from urllib.parse import urljoin, urlsplit
+
+import aiohttp
+import yarl
+
+from pipeline_dash.importer.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+SSO_PROVIDER = "login.ubuntu.com"
+
+
+class LoginError(Exception):
+    """A server still asks for a login after the `SsoAuthenticator` logged in to it"""
+
+
+class LoginRequiredError(Exception):
+    """A server answered a request with 401/403 or redirected it to a login page"""
+
+
+@dataclass
+class _Form:
+    id: Optional[str]
+    action: str
+    inputs: dict[str, str] = field(default_factory=dict)
+
+
+class _FormParser(HTMLParser):
+    """Collects the forms of an HTML page with the values of their named inputs"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.forms: list[_Form] = []
+        self._form: Optional[_Form] = None
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
+        attributes = dict(attrs)
+        if tag == "form":
+            self._form = _Form(id=attributes.get("id"), action=attributes.get("action") or "")
+            self.forms.append(self._form)
+        elif tag == "input" and self._form is not None and (name := attributes.get("name")):
+            self._form.inputs[name] = attributes.get("value") or ""
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "form":
+            self._form = None
+
+
+def find_form(html: str, form_id: str) -> _Form:
+    """Find the form with the id `form_id` in `html`, raises `LoginError` if there is none"""
+    parser = _FormParser()
+    parser.feed(html)
+    for form in parser.forms:
+        if form.id == form_id:
+            return form
+    raise LoginError(f"Login page has no form {form_id!r}")
+
+
+def needs_login(requested_url: str, status: int, response_url: str) -> bool:
+    """
+    Check if a response asks for a login: 401/403, or redirected away from the requested resource, which is how
+    Jenkins behind an SSO realm answers requests without a valid session cookie. The URLs are compared decoded, as
+    the response URL has the path percent-encoded (e.g. job names with spaces or non-ASCII characters).
+    """
+    if status in (401, 403):
+        return True
+    requested, response = yarl.URL(requested_url), yarl.URL(response_url)
+    return (requested.host, requested.port, requested.path) != (response.host, response.port, response.path)
+
+
+class SsoAuthenticator:
+    """
+    Logs in to Jenkins controllers using login.ubuntu.com SSO, on the importer's pooled HTTP client. The session cookies
+    of all controllers are kept in one cookie jar, which every session of the importer shares and which is persisted to
+    `cookie_file`, so that later sessions and restarts reuse the login. A controller is only logged in to again when it
+    rejects a request, and concurrent requests that were rejected by the same controller share a single login.
+    """
+
+    def __init__(
+        self,
+        user_config: dict,
+        cookie_file: Optional[str] = ".cookies",
+        token_fn: Callable[[], str] = lambda: input("2FA Token: "),
+    ):
+        """
+        :param user_config: User config dict, "email" and "password" keys are used to log in
+        :param cookie_file: File the cookie jar is loaded from and saved to, None to keep it in memory only
+        :param token_fn: Called (in a worker thread) to get the 2FA token of a login
+        """
+        if not {"email", "password"} <= user_config.keys():
+            raise ValueError("SSO authentication requires 'email' and 'password' in the user file")
+        self.email = user_config["email"]
+        self.password = user_config["password"]
+        self.cookie_file = cookie_file
+        self.token_fn = token_fn
+        self.logins = 0
+        """Logins performed"""
+        self._generations: dict[str, int] = {}
+        self._jar: Optional[aiohttp.CookieJar] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._login_flight: SingleFlight[None] = SingleFlight()
+
+    def cookie_jar(self) -> aiohttp.CookieJar:
+        """
+        Cookie jar to create the sessions of the running event loop with. Loaded from `cookie_file` the first time it is
+        used on a loop, e.g. in a forked process.
+        """
+        loop = asyncio.get_running_loop()
+        if self._jar is None or self._loop is not loop:
+            self._loop = loop
+            self._login_flight = SingleFlight()
+            # unsafe: also keep the cookies of controllers addressed by IP
+            self._jar = aiohttp.CookieJar(unsafe=True)
+            if self.cookie_file and os.path.exists(self.cookie_file):
+                try:
+                    self._jar.load(self.cookie_file)
+                except Exception as e:
+                    logger.warning(f"Failed to load cookies from {self.cookie_file}: {e!r}")
+        return self._jar
+
+    def generation(self, url: str) -> int:
+        """Number of logins to the server of `url` so far, to be taken before sending a request to it"""
+        return self._generations.get(urlsplit(url).netloc, 0)
+
+    async def refresh(self, session: aiohttp.ClientSession, url: str, generation: int) -> None:
+        """
+        Log in to the server of `url` after it rejected a request sent at `generation`. Does not log in again if another
+        request logged in since, and shares a login already in flight.
+        """
+        server = urlsplit(url).netloc
+        if self.generation(url) != generation:
+            return
+        await self._login_flight.do(server, lambda: self._login(session, url))
+
+    async def _login(self, session: aiohttp.ClientSession, url: str) -> None:
+        server = urlsplit(url).netloc
+        logger.info(f"Logging in to {server} with {SSO_PROVIDER}")
+        await self._sso_login(session, url)
+        self.logins += 1
+        self._generations[server] = self._generations.get(server, 0) + 1
+        if self.cookie_file:
+            self.cookie_jar().save(self.cookie_file)
+
+    async def _sso_login(self, session: aiohttp.ClientSession, url: str) -> None:
+        """OpenID login flow of login.ubuntu.com, starting at the protected resource `url`"""
+
+        async def post(post_url: str, data: dict, referer: Optional[str] = None) -> tuple[str, str]:
+            headers = {"Referer": referer} if referer else None
+            async with session.post(post_url, data=data, headers=headers) as r:
+                return str(r.url), await r.text()
+
+        async with session.get(url) as r:
+            response_url = str(r.url)
+            if not needs_login(url, r.status, response_url):
+                return
+        response_url, html = await post(response_url, {"openid_identifier": SSO_PROVIDER})
+        form = find_form(html, "openid_message")
+        response_url, html = await post(urljoin(response_url, form.action), form.inputs)
+        if not needs_login(url, 200, response_url):
+            return
+
+        form = find_form(html, "login-form")
+        login_url = urljoin(response_url, form.action)
+        data = _pick(form.inputs, "csrfmiddlewaretoken", "user-intentions", "openid.usernamesecret")
+        data.update(email=self.email, password=self.password, **{"continue": ""})
+        response_url, html = await post(login_url, data, referer=login_url)
+
+        token = await asyncio.to_thread(self.token_fn)
+        form = find_form(html, "login-form")
+        data = _pick(form.inputs, "csrfmiddlewaretoken", "openid.usernamesecret")
+        data.update(oath_token=token, **{"continue": ""})
+        token_url = response_url
+        response_url, html = await post(token_url, data, referer=token_url)
+
+        if "device-verify" in response_url:
+            form = find_form(html, "login-form")
+            data = _pick(form.inputs, "csrfmiddlewaretoken", "openid.usernamesecret")
+            data["continue"] = ""
+            await post(response_url, data, referer=response_url)
+
+
+def _pick(inputs: dict[str, str], *names: str) -> dict[str, str]:
+    try:
+        return {name: inputs[name] for name in names}
+    except KeyError as e:
+        raise LoginError(f"Login form has no input {e}")
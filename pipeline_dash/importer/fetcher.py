@@ -0,0 +1,365 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, cast, Optional, TypeVar
+
+import diskcache  # type: ignore
+
+from pipeline_dash.history import JobHistory
+from pipeline_dash.importer.jenkins import FetchStats, JenkinsImporter
+from pipeline_dash.importer.scheduler import JobPoller, PollingConfig
+from pipeline_dash.importer.singleflight import SingleFlight
+from pipeline_dash.importer.webhook import apply_event, is_newer, JobEvent, same_server
+from pipeline_dash.job_data import JobDataDict, JobName, ServerUrl
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+FETCH_INTERVAL = 60.0
+REQUEST_POLL_INTERVAL = 0.5
+"""Seconds between checks for refreshes requested through the `SnapshotStore`"""
+
+
+@dataclass
+class Snapshot:
+    """Job data of a pipeline config as published by the `BackgroundFetcher`"""
+
+    version: int
+    timestamp: datetime
+    job_data: JobDataDict
+    changed: Optional[frozenset[JobName]] = None
+    """Jobs whose data differs from the previous snapshot, None if unknown"""
+
+
+class SnapshotStore:
+    """
+    Versioned job data snapshots per pipeline config. Backed by a `diskcache.Cache`, so that snapshots published in the
+    main process can be read by Dash background callbacks running in other processes.
+    """
+
+    def __init__(self, cache: diskcache.Cache, prefix: str = "snapshot"):
+        self.cache = cache
+        self.prefix = prefix
+
+    def _key(self, config_name: str) -> str:
+        return f"{self.prefix}:{config_name}"
+
+    def publish(
+        self, config_name: str, job_data: JobDataDict, changed: Optional[frozenset[JobName]] = None
+    ) -> Snapshot:
+        """
+        Publish `job_data` as the newest snapshot of `config_name`
+        :param changed: Jobs whose data differs from the previous snapshot, None if unknown
+        """
+        version = self.cache.incr(f"{self._key(config_name)}:version")
+        snapshot = Snapshot(version=version, timestamp=datetime.utcnow(), job_data=job_data, changed=changed)
+        self.cache.set(self._key(config_name), snapshot)
+        return snapshot
+
+    def latest(self, config_name: str) -> Optional[Snapshot]:
+        """Newest snapshot of `config_name`, None if none was published"""
+        return self.cache.get(self._key(config_name))
+
+    def request_refresh(self, config_name: str) -> int:
+        """
+        Ask the `BackgroundFetcher` to refresh `config_name` as soon as possible, from any process. Requests that arrive
+        while a refresh is pending or in flight share that refresh.
+        :return: Version of the newest snapshot at the time of the request
+        """
+        self.cache.incr(f"{self._key(config_name)}:requested")
+        return self.cache.get(f"{self._key(config_name)}:version", 0)
+
+    def refresh_requests(self, config_name: str) -> int:
+        """Number of refreshes of `config_name` requested so far"""
+        return self.cache.get(f"{self._key(config_name)}:requested", 0)
+
+    def record_coalesced(self, config_name: str, count: int) -> None:
+        self.cache.incr(f"{self._key(config_name)}:coalesced", count)
+
+    def coalesced(self, config_name: str) -> int:
+        """Number of requested refreshes of `config_name` that were served by a refresh requested earlier"""
+        return self.cache.get(f"{self._key(config_name)}:coalesced", 0)
+
+    def wait_for_newer(self, config_name: str, version: int, timeout: Optional[float] = None) -> Optional[Snapshot]:
+        """Wait until a snapshot newer than `version` is published, returns the newest snapshot after `timeout`"""
+        end = None if timeout is None else time.monotonic() + timeout
+        while (snapshot := self.latest(config_name)) is None or snapshot.version <= version:
+            if end is not None and time.monotonic() >= end:
+                break
+            time.sleep(REQUEST_POLL_INTERVAL)
+        return snapshot
+
+
+@dataclass
+class _ConfigState:
+    jobs: dict[JobName, ServerUrl]
+    job_data: JobDataDict
+    interval: Optional[float]
+    poller: Optional[JobPoller] = None
+    next_refresh: Optional[float] = None
+    handled_requests: int = 0
+    pushed: JobDataDict = field(default_factory=dict)
+    """Job data received with `push`, kept until a refresh fetched the same or a later build"""
+    published: Optional[JobDataDict] = None
+    """Job data of the last published snapshot"""
+
+
+class BackgroundFetcher:
+    """
+    Refreshes the job data of every pipeline config on its own schedule on the importer's event loop, and publishes
+    each result to a `SnapshotStore`. Readers never trigger fetches, so the load on the Jenkins servers does not depend
+    on the number of viewers. Configs that are due at the same time are refreshed concurrently, so that jobs shared by
+    several configs are fetched only once (see `JenkinsImporter.get_job_data`).
+    """
+
+    def __init__(
+        self,
+        importer: JenkinsImporter,
+        store: SnapshotStore,
+        deadline: Optional[float] = None,
+        incremental: bool = False,
+        history: Optional[JobHistory] = None,
+    ):
+        """
+        :param importer: `JenkinsImporter` used to fetch the jobs
+        :param store: `SnapshotStore` to publish to
+        :param deadline: Max number of seconds to wait for the jobs of a single refresh
+        :param incremental: Refresh with `JenkinsImporter.refresh_job_data`, only fetching changed or running jobs
+        :param history: `JobHistory` to store the finished builds of every published snapshot in, written by a thread
+        of its own so that the event loop never waits for SQLite
+        """
+        self.importer = importer
+        self.store = store
+        self.deadline = deadline
+        self.incremental = incremental
+        self.history = history
+        self.refresh_flight: SingleFlight[Snapshot] = SingleFlight()
+        """Coalesces concurrent refreshes of the same pipeline config"""
+        self._configs: dict[str, _ConfigState] = {}
+        self._running: list[concurrent.futures.Future] = []
+        self._saving: Optional[asyncio.Task] = None
+        self._mismatched_servers: set[tuple[ServerUrl, ServerUrl]] = set()
+        """Pairs of (config, notified) server URLs of the same job that were logged as ignored"""
+        self._history_writer: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        """Single thread ingesting published snapshots into the `history` in order"""
+        self._store_io: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        """Single thread reading and writing the `store` for the event loop, so that snapshots are published in order"""
+
+    async def _in_store_thread(self, fn: Callable[..., T], *args: Any) -> T:
+        """Call `fn` in the thread of the `store` I/O, as diskcache blocks on SQLite and the disk"""
+        if self._store_io is None:
+            self._store_io = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="snapshots")
+        return await asyncio.get_running_loop().run_in_executor(self._store_io, functools.partial(fn, *args))
+
+    def _prepare_publish(
+        self, config_name: str, job_data: JobDataDict
+    ) -> tuple[JobDataDict, Optional[frozenset[JobName]]]:
+        """
+        Job data to publish as the next snapshot of `config_name`, with the pushed builds that are still newer, and the
+        jobs changed since the last snapshot
+        """
+        config = self._configs.get(config_name)
+        if pushed := config.pushed if config is not None else None:
+            # a refresh that was in flight while an event was pushed may have fetched an older build
+            for job, data in list(pushed.items()):
+                if is_newer(data, job_data.get(job)):
+                    job_data = job_data | {job: data}
+                else:
+                    del pushed[job]
+        if self.history is not None:
+            if self._history_writer is None:
+                self._history_writer = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="history")
+            self._history_writer.submit(self._ingest, job_data)
+        changed = None
+        if config is not None and (published := config.published) is not None:
+            # unchanged jobs mostly keep their `JobData` object between refreshes
+            changed = frozenset(
+                job for job, data in job_data.items() if (old := published.get(job)) is not data and old != data
+            ) | (published.keys() - job_data.keys())
+        if config is not None:
+            config.published = job_data
+        return job_data, changed
+
+    async def _publish(self, config_name: str, job_data: JobDataDict) -> Snapshot:
+        job_data, changed = self._prepare_publish(config_name, job_data)
+        return await self._in_store_thread(self.store.publish, config_name, job_data, changed)
+
+    def _ingest(self, job_data: JobDataDict) -> None:
+        try:
+            cast(JobHistory, self.history).ingest(job_data)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to store builds in the job history: {e!r}")
+
+    async def _publish_fetched(self, config_name: str, job_data: JobDataDict) -> Snapshot:
+        """`_publish` fetched job data, and write the responses fetched for it to the packed snapshot of `--store`"""
+        snapshot = await self._publish(config_name, job_data)
+        if self._saving is None or self._saving.done():
+            # responses fetched while a save is running are written after the next fetch
+            self._saving = asyncio.create_task(self._write_snapshot())
+        return snapshot
+
+    async def _write_snapshot(self) -> None:
+        try:
+            await self.importer.write_snapshot()
+        except OSError as e:
+            logger.warning(f"Failed to save the packed snapshot: {e!r}")
+
+    async def _refresh(self, config_name: str) -> Snapshot:
+        config = self._configs[config_name]
+        stats = FetchStats()
+        if config.poller is not None:
+            # published by the poller
+            await config.poller.poll(config.jobs, stats)
+            snapshot = cast(Snapshot, await self._in_store_thread(self.store.latest, config_name))
+        else:
+            if self.incremental:
+                job_data = await self.importer.refresh_job_data(config.jobs, config.job_data, stats, self.deadline)
+            else:
+                job_data = await self.importer.collect_job_data(config.jobs, stats, config.job_data, self.deadline)
+            config.job_data = job_data
+            snapshot = await self._publish_fetched(config_name, job_data)
+        logger.info(
+            f"Published {config_name} v{snapshot.version} ({stats.requests} requests, "
+            f"{stats.coalesced} jobs shared with other configs)"
+        )
+        return snapshot
+
+    async def refresh(self, config_name: str) -> Snapshot:
+        """Refresh all jobs of `config_name` now and publish the result, joining a refresh already in flight"""
+        return await self.refresh_flight.do(config_name, lambda: self._refresh(config_name))
+
+    async def push(self, event: JobEvent) -> list[str]:
+        """
+        Apply a build event notified by Jenkins to the job data of every config with its job, and publish the configs
+        right away, without any request to Jenkins
+        :return: Names of the configs that were published
+        """
+        published = []
+        for config_name, config in self._configs.items():
+            if event.job not in config.jobs:
+                continue
+            if not same_server(server := config.jobs[event.job], event.server):
+                # e.g. the Jenkins URL of the plugin differs from the one in the pipeline config
+                log = logger.debug if (server, event.server) in self._mismatched_servers else logger.warning
+                self._mismatched_servers.add((server, event.server))
+                log(
+                    f"Ignoring build {event.build_num} of {event.job} notified by {event.server}, "
+                    f"{config_name} has it on {server}"
+                )
+                continue
+            job_data = config.published if config.published is not None else config.job_data
+            if (patched := apply_event(job_data.get(event.job), event)) is None:
+                continue
+            job_data = job_data | {event.job: patched}
+            config.job_data = job_data
+            if config.poller is not None:
+                config.poller.snapshot = job_data
+            snapshot = await self._publish(config_name, job_data)
+            config.pushed[event.job] = patched
+            published.append(config_name)
+            logger.info(f"Published {config_name} v{snapshot.version} for build {event.build_num} of {event.job}")
+        return published
+
+    def push_event(self, event: JobEvent) -> list[str]:
+        """`push` from any thread"""
+        return self.importer.run(self.push(event))
+
+    def _refresh_requests(self) -> dict[str, int]:
+        """`SnapshotStore.refresh_requests` of every config"""
+        return {config_name: self.store.refresh_requests(config_name) for config_name in self._configs}
+
+    def _is_due(self, config_name: str, now: float, requested: int) -> bool:
+        config = self._configs[config_name]
+        if requested != config.handled_requests:
+            return True
+        return config.next_refresh is not None and now >= config.next_refresh
+
+    async def _refresh_due(self, config_name: str) -> None:
+        config = self._configs[config_name]
+        try:
+            await self.refresh(config_name)
+        except Exception as e:
+            logger.exception(f"Failed to refresh {config_name}: {e!r}")
+        # every request that arrived until now was served by this refresh
+        requested = await self._in_store_thread(self.store.refresh_requests, config_name)
+        if (coalesced := requested - config.handled_requests - 1) > 0:
+            await self._in_store_thread(self.store.record_coalesced, config_name, coalesced)
+        config.handled_requests = requested
+        if config.interval is not None:
+            config.next_refresh = asyncio.get_running_loop().time() + config.interval
+
+    async def _serve(self) -> None:
+        """
+        Refresh every config every `interval` seconds, and whenever a refresh is requested through the store. All
+        configs that are due are refreshed concurrently.
+        """
+        loop = asyncio.get_running_loop()
+        requested = await self._in_store_thread(self._refresh_requests)
+        for config_name, config in self._configs.items():
+            config.handled_requests = requested[config_name]
+            config.next_refresh = None if config.interval is None else loop.time() + config.interval
+        while True:
+            next_refresh = min(
+                (c.next_refresh for c in self._configs.values() if c.next_refresh is not None), default=None
+            )
+            timeout = REQUEST_POLL_INTERVAL if next_refresh is None else next_refresh - loop.time()
+            await asyncio.sleep(max(0.0, min(REQUEST_POLL_INTERVAL, timeout)))
+            # the request counters of all configs are read at once, to keep the loop free of disk I/O
+            requested = await self._in_store_thread(self._refresh_requests)
+            now = loop.time()
+            if due := [name for name in self._configs if self._is_due(name, now, requested[name])]:
+                await asyncio.gather(*(self._refresh_due(name) for name in due))
+
+    def add_config(
+        self,
+        config_name: str,
+        jobs: dict[JobName, ServerUrl],
+        job_data: JobDataDict,
+        interval: float = FETCH_INTERVAL,
+        polling: Optional[PollingConfig] = None,
+    ) -> None:
+        """
+        Publish `job_data` as the first snapshot of `config_name` and schedule its refreshes
+        :param config_name: Name of the pipeline config
+        :param jobs: Jobs of the pipeline config
+        :param job_data: Current job data of `jobs`
+        :param interval: Seconds between refreshes of all `jobs`, unused with `polling`
+        :param polling: Poll every job on its own adaptive schedule instead of refreshing all jobs every `interval`
+        """
+        self.store.publish(config_name, *self._prepare_publish(config_name, job_data))
+        config = self._configs[config_name] = _ConfigState(jobs, job_data, interval, published=job_data)
+        if polling is not None:
+            config.interval = None
+            config.poller = JobPoller(
+                self.importer,
+                jobs,
+                job_data,
+                polling,
+                self.deadline,
+                on_update=lambda snapshot: self._publish_fetched(config_name, snapshot),
+            )
+            self._running.append(self.importer.submit(config.poller.run()))
+
+    def start(self) -> None:
+        """Start refreshing all added configs"""
+        self._running.append(self.importer.submit(self._serve()))
+
+    def stop(self) -> None:
+        """Cancel all scheduled refreshes, and wait for the published snapshots to be stored and added to the history"""
+        for future in self._running:
+            future.cancel()
+        self._running = []
+        if self._history_writer is not None:
+            self._history_writer.shutdown()
+            self._history_writer = None
+        if self._store_io is not None:
+            self._store_io.shutdown()
+            self._store_io = None
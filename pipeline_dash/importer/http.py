@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Optional
+
+import aiohttp
+
+
+@dataclass
+class PoolConfig:
+    """Settings of the pooled HTTP client shared by all requests of an importer"""
+
+    limit: int = 100
+    """Max number of open connections in total"""
+    limit_per_host: int = 20
+    """Max number of open connections to a single host"""
+    keepalive_timeout: float = 60.0
+    """Seconds an idle connection is kept open for reuse"""
+    dns_cache_ttl: int = 300
+    """Seconds a resolved host name is cached"""
+
+
+@dataclass
+class ConnectionStats:
+    """Connection reuse counters of a pooled HTTP client"""
+
+    requests: int = 0
+    connections_created: int = 0
+    connections_reused: int = 0
+    dns_cache_hits: int = 0
+    dns_cache_misses: int = 0
+
+
+def create_session(
+    pool_config: PoolConfig,
+    stats: ConnectionStats,
+    auth: Optional[aiohttp.BasicAuth] = None,
+    cookie_jar: Optional[aiohttp.abc.AbstractCookieJar] = None,
+) -> aiohttp.ClientSession:
+    """
+    Create a pooled `aiohttp.ClientSession` with keep-alive and DNS caching, which updates `stats` for every request.
+    Must be called from within the event loop that will use the session.
+    :param cookie_jar: Cookie jar shared with other sessions, e.g. holding the login cookies of the servers
+    """
+
+    async def on_request_start(session, ctx: SimpleNamespace, params) -> None:
+        stats.requests += 1
+
+    async def on_connection_create_end(session, ctx: SimpleNamespace, params) -> None:
+        stats.connections_created += 1
+
+    async def on_connection_reuseconn(session, ctx: SimpleNamespace, params) -> None:
+        stats.connections_reused += 1
+
+    async def on_dns_cache_hit(session, ctx: SimpleNamespace, params) -> None:
+        stats.dns_cache_hits += 1
+
+    async def on_dns_cache_miss(session, ctx: SimpleNamespace, params) -> None:
+        stats.dns_cache_misses += 1
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+    trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+    trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+
+    connector = aiohttp.TCPConnector(
+        limit=pool_config.limit,
+        limit_per_host=pool_config.limit_per_host,
+        keepalive_timeout=pool_config.keepalive_timeout,
+        use_dns_cache=True,
+        ttl_dns_cache=pool_config.dns_cache_ttl,
+    )
+    return aiohttp.ClientSession(connector=connector, auth=auth, cookie_jar=cookie_jar, trace_configs=[trace_config])
+
+
+@dataclass
+class _ValidatedResponse:
+    etag: Optional[str]
+    last_modified: Optional[str]
+    text: str
+
+
+class ValidatorCache:
+    """
+    In-memory cache of API responses with their ETag / Last-Modified validators, keyed by `hash_url(api_url)`.
+    Used by `api()` to send conditional requests and reuse the response when the server answers 304. Responses are
+    kept as the raw response text and parsed on every hit, so callers never share (and modify) the same dict.
+    """
+
+    def __init__(self, max_entries: int = 20000):
+        self.max_entries = max_entries
+        self.hits = 0
+        """Requests answered with 304 Not Modified and served from memory"""
+        self.misses = 0
+        """Requests that downloaded a full response"""
+        self._entries: OrderedDict[str, _ValidatedResponse] = OrderedDict()
+
+    def request_headers(self, key: str) -> dict[str, str]:
+        """Conditional request headers for `key`, empty if there is no validated response for it"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def not_modified(self, key: str) -> Optional[dict]:
+        """Get a newly parsed copy of the stored response for `key` after the server answered 304 Not Modified"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return json.loads(entry.text)
+
+    def store(self, key: str, etag: Optional[str], last_modified: Optional[str], text: str) -> None:
+        """Store the response `text` for `key` if the server sent any validators for it"""
+        self.misses += 1
+        if not etag and not last_modified:
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = _ValidatedResponse(etag=etag, last_modified=last_modified, text=text)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -1,25 +1,88 @@
 import asyncio
 import base64
+import concurrent.futures
+import copy
 import hashlib
 import json
 import logging
 import os
 import pathlib
-import pickle
+from collections import defaultdict
+from dataclasses import dataclass, replace
 from datetime import datetime
+from enum import Enum
 from pprint import pformat
 from textwrap import indent
-from typing import Callable, cast, Optional
+from typing import Any, Callable, cast, Coroutine, Optional, TypeVar
 from urllib.parse import urlparse, urlsplit
 
 import aiohttp
 import tenacity
-from tenacity import retry, RetryCallState, RetryError, stop_after_delay, wait_random_exponential
+from tenacity import (
+    retry,
+    RetryCallState,
+    RetryError,
+    stop_after_delay,
+    wait_random_exponential,
+)
 
-from pipeline_dash.job_data import JobData, JobDataDict, JobStatus
+from pipeline_dash.importer.auth import LoginError, LoginRequiredError, needs_login, SsoAuthenticator
+from pipeline_dash.importer.http import ConnectionStats, create_session, PoolConfig, ValidatorCache
+from pipeline_dash.importer.limiter import LimiterConfig, LimiterStats, ServerLimiter, ThrottledError
+from pipeline_dash.importer.loop import EventLoopThread
+from pipeline_dash.importer.packed import PACKED_SNAPSHOT_SUFFIX, PackedSnapshot, PackedSnapshotWriter
+from pipeline_dash.importer.resilience import BreakerConfig, CircuitBreaker, CircuitOpenError, RetryBudget
+from pipeline_dash.importer.response_cache import ResponseCache
+from pipeline_dash.importer.singleflight import SingleFlight
+from pipeline_dash.importer.topology import TopologyCache
+from pipeline_dash.job_data import BuildHistory, JobData, JobDataDict, JobStatus
 
 logger = logging.getLogger(__name__)
 
+JOB_TREE = "name,lastBuild[url],downstreamProjects[name,url]"
+BUILD_TREE = "id,result,timestamp,actions[parameters[name,value]]"
+SNAPSHOT_TREE = "name,lastBuild[id,result,timestamp,url,actions[parameters[name,value]]],downstreamProjects[name,url]"
+BUILD_DURATION_TREE = "id,result,timestamp,duration,actions[parameters[name,value]]"
+"""`BUILD_TREE` with the duration of the build"""
+SNAPSHOT_DURATION_TREE = (
+    "name,lastBuild[id,result,timestamp,duration,url,actions[parameters[name,value]]],downstreamProjects[name,url]"
+)
+"""`SNAPSHOT_TREE` with the duration of the last build"""
+PROBE_TREE = "name,lastBuild[number]"
+HISTORY_TREE = "builds[number,result,timestamp,duration]"
+BULK_PAGE_SIZE = 500
+DISCOVERY_CONCURRENCY = 50
+REFRESH_DEADLINE = 30.0
+
+
+class FetchMode(Enum):
+    """How job data is requested from a Jenkins controller"""
+
+    TWO_STEP = "two-step"
+    """One request for the job, a second one for its last build"""
+    SNAPSHOT = "snapshot"
+    """Job and last build fields in a single nested `tree=` request"""
+    BULK = "bulk"
+    """Paginated `jobs[...]` listing of each server/folder, filtered locally to the requested jobs"""
+
+
+@dataclass
+class FetchStats:
+    """Request counters for a single refresh"""
+
+    jobs: int = 0
+    requests: int = 0
+    round_trips_saved: int = 0
+    snapshot_fallbacks: int = 0
+    unchanged: int = 0
+    """Jobs reused from the previous refresh because their last build did not change"""
+    coalesced: int = 0
+    """Jobs that shared the fetch of a concurrent request for the same job"""
+
+
+class BadRequestError(Exception):
+    """Jenkins rejected the request (HTTP 400), e.g. because it does not support the requested `tree=` projection"""
+
 
 def hash_url(url_or_path: str) -> str:
     file_name = base64.urlsafe_b64encode(url_or_path.encode())
@@ -54,6 +117,19 @@ def _cb_api_failure(retry_state: RetryCallState) -> dict:
             raise RetryError(retry_state.outcome) from ex
 
 
+def _retry_api(retry_state: RetryCallState) -> bool:
+    """tenacity.retry predicate of `api()`: retry failed requests as long as the importer's `RetryBudget` allows"""
+    ex = retry_state.outcome.exception() if retry_state.outcome else None
+    if ex is None or isinstance(ex, (BadRequestError, CircuitOpenError, LoginError)):
+        return False
+    importer: JenkinsImporter = retry_state.args[0]
+    if not importer.retry_budget.try_spend():
+        url = retry_state.kwargs.get("url") or retry_state.args[1]
+        logger.info(f"Retry budget exhausted, not retrying {url}")
+        return False
+    return True
+
+
 def log_retry(
     log_level: int,
     sec_format: str = "%0.2f",
@@ -70,76 +146,27 @@ def log_retry(
     return fn
 
 
-@retry(
-    wait=wait_random_exponential(multiplier=0.5, max=10),
-    stop=stop_after_delay(10),
-    # before=before_log(logger, logging.DEBUG),
-    after=log_retry(logging.INFO),
-    retry_error_callback=_cb_api_failure,
-)
-async def api(
-    session: aiohttp.ClientSession,
-    url: str,
-    tree: str = "",
-    depth: Optional[int] = None,
-    load_dir: Optional[str] = None,
-    store_dir: Optional[str] = None,
-) -> dict:
-    api_url = f"{url}/api/json"
-    q = "?"
-    if tree:
-        api_url += f"{q}tree={tree}"
-        q = "?"
-    if depth:
-        api_url += f"{q}depth={depth}"
-        q = "?"
-    file_name = hash_url(api_url)
-    if load_dir:
-        possible_path = os.path.join(load_dir, file_name)
-        if os.path.exists(possible_path):
-            with open(possible_path, "r") as f:
-                return json.load(f)
-    async with session.get(api_url) as req:
-        d = await req.text()
-    # todo handle error better than throwing JSONDecodeError here if failed to get job API
-    json_data = json.loads(d)
-    if store_dir:
-        possible_path = os.path.join(store_dir, file_name)
-        with open(possible_path, "w") as f:
-            json.dump(json_data, f)
-    return json_data
-
-
-async def get_job_data(
-    session: aiohttp.ClientSession,
-    server: str,
-    job: str,
-    load_dir: Optional[str],
-    store_dir: Optional[str],
-) -> Optional[JobData]:
-    """
-    Get data for a single Jenkins `job` from the `server` url
-    :param session: aiohttp.ClientSession to use for requests
-    :param server: Base URL of the Jenkins Server
-    :param job: Job name for which to get data
-    :param load_dir: Local directory path str from which to load cached Jenkins data (can be used to run this
-    function without an internet connection to `server`)
-    :param store_dir: Local directory path str where to store cached Jenkins data (can be used to run this
-    function without an internet connection to `server`). Can later be used as the `load_dir` param of this function.
-    :return: JobData dataclass containing job data
-    """
-    server_url = urlparse(server)
-    r = await api(
-        session,
-        f"{server}/job/{job}",
-        tree="name,lastBuild[url],downstreamProjects[name,url]",
-        load_dir=load_dir,
-        store_dir=store_dir,
+def _job_data_from_build(name: str, server: str, url: str, build: dict, downstream: dict[str, str]) -> JobData:
+    """Create `JobData` from the `BUILD_TREE` fields of a Jenkins build"""
+    parameters: list = next(
+        (a["parameters"] for a in build["actions"] if a and a["_class"] == "hudson.model.ParametersAction"), []
     )
-    if not r:
-        return None
-    name = r["name"]
+    return JobData(
+        name=name,
+        build_num=build["id"],
+        status=JobStatus(build["result"]),
+        timestamp=datetime.utcfromtimestamp(build["timestamp"] / 1000.0),
+        duration=build["duration"] / 1000.0 if build.get("duration") else None,
+        serial=next((p["value"] for p in parameters if p["name"] == "SERIAL"), None),
+        url=url,
+        downstream=downstream,
+        server=server,
+    )
+
 
+def _job_data_from_snapshot(server: str, r: dict) -> JobData:
+    """Create `JobData` from a `SNAPSHOT_TREE` job response"""
+    name = r["name"]
     if not r["lastBuild"]:
         # there has not been a build
         return JobData(
@@ -148,113 +175,802 @@ async def get_job_data(
             server=server,
         )
     downstream = {i["name"]: server for i in r["downstreamProjects"]}
-    # update base netloc of url to use that of the job config's server address, to avoid problems with SSO
-    url = urlsplit(r["lastBuild"]["url"])
-    url = url._replace(netloc=server_url.netloc, scheme=server_url.scheme)
+    url = _server_build_url(server, r["lastBuild"]["url"])
+    return _job_data_from_build(name, server, url, r["lastBuild"], downstream)
 
-    r = await api(
-        session,
-        cast(str, url.geturl()),
-        tree="id,result,timestamp,actions[parameters[name,value]]",
-        load_dir=load_dir,
-        store_dir=store_dir,
-    )
-    if not r:
-        return JobData(
-            name=name,
-            status=JobStatus.UNDEFINED,
-            server=server,
-        )
-    parameters: list = next(
-        (a["parameters"] for a in r["actions"] if a and a["_class"] == "hudson.model.ParametersAction"), []
-    )
-    data = JobData(
-        name=name,
-        build_num=r["id"],
-        status=JobStatus(r["result"]),
-        timestamp=datetime.utcfromtimestamp(r["timestamp"] / 1000.0),
-        serial=next((p["value"] for p in parameters if p["name"] == "SERIAL"), None),
-        url=url.geturl(),
-        downstream=downstream,
-        server=server,
-    )
+
+def _add_history(data: JobData, r: dict, capacity: int) -> JobData:
+    """Attach the `HISTORY_TREE` builds of job response `r`, if it has any, to `data`"""
+    if capacity and r.get("builds") is not None:
+        data.history = BuildHistory.from_builds(r["builds"], capacity)
+        if data.duration is None and data.history and (newest := list(data.history)[-1]).number == _int(data.build_num):
+            data.duration = newest.duration
     return data
 
 
+def _copy_job_data(data: JobData) -> JobData:
+    """Copy of `data` for another pipeline config, which does not share the mutable downstream dict and history"""
+    return replace(data, downstream=dict(data.downstream), history=copy.deepcopy(data.history))
+
+
+def _int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_snapshot(r: dict) -> bool:
+    """Check that the server honored the nested `lastBuild[...]` projection of `SNAPSHOT_TREE`"""
+    return "lastBuild" in r and (not r["lastBuild"] or "id" in r["lastBuild"])
+
+
+def _split_folder(job: str) -> tuple[str, str]:
+    """
+    Split a `job` path, as used in `{server}/job/{job}`, into its folder path and the job's name within that folder
+    e.g. "team/job/Build" -> ("team", "Build"), "Build" -> ("", "Build")
+    """
+    folder, _, name = job.rpartition("/job/")
+    return folder, name
+
+
+def _server_build_url(server: str, build_url: str) -> str:
+    """
+    Update base netloc of `build_url` to use that of the job config's server address, to avoid problems with SSO
+    """
+    server_url = urlparse(server)
+    url = urlsplit(build_url)
+    url = url._replace(netloc=server_url.netloc, scheme=server_url.scheme)
+    return cast(str, url.geturl())
+
+
 JobName = str
 ServerUrl = str
+T = TypeVar("T")
+
+FETCH_ERRORS = (
+    RetryError,
+    CircuitOpenError,
+    ThrottledError,
+    aiohttp.ClientError,
+    asyncio.TimeoutError,
+    json.JSONDecodeError,
+)
+"""Exceptions of a job fetch that failed for good, after retries"""
 
 
-async def collect_job_data(
-    pipeline_jobs: dict[JobName, ServerUrl],
-    load_dir: Optional[str],
-    store_dir: Optional[str],
-    user_config: Optional[dict],
-) -> JobDataDict:
+class JenkinsImporter:
     """
-    Get dict of all job data
-    :param pipeline_jobs:
-    :param load_dir: Local directory path str from which to load cached Jenkins data (can be used to run this
-    function without an internet connection to `server`)
-    :param store_dir: Local directory path str where to store cached Jenkins data (can be used to run this
-    function without an internet connection to `server`). Can later be used as the `load_dir` param of this function.
-    :return: Dictionary containing all JobData for every entry in `pipeline_jobs`
+    Fetches job data from Jenkins servers. Owns the event loop thread, the pooled HTTP client and the response caches,
+    and is meant to outlive individual refreshes so that connections and cached responses are reused between them.
+    Fetches can be submitted from any thread, e.g. concurrent Dash callbacks, and share the loop and pool.
     """
-    auth = (
-        aiohttp.BasicAuth(login=user_config["user"], password=user_config["token"])
-        if user_config and {"user", "token"} <= user_config.keys()
-        else None
+
+    def __init__(
+        self,
+        load_dir: Optional[str] = None,
+        store_dir: Optional[str] = None,
+        user_config: Optional[dict] = None,
+        fetch_mode: FetchMode = FetchMode.TWO_STEP,
+        pool_config: Optional[PoolConfig] = None,
+        use_uvloop: bool = False,
+        limiter_config: Optional[LimiterConfig] = None,
+        breaker_config: Optional[BreakerConfig] = None,
+        retry_budget: Optional[RetryBudget] = None,
+        response_cache: Optional[ResponseCache] = None,
+        build_history: int = 0,
+        authenticator: Optional[SsoAuthenticator] = None,
+        build_duration: bool = False,
+    ):
+        """
+        :param load_dir: Packed snapshot file (see `PackedSnapshot`) or directory from which to load cached Jenkins
+        data (can be used to run the importer without an internet connection to the servers)
+        :param store_dir: Packed snapshot file where to store cached Jenkins data if it ends with
+        `PACKED_SNAPSHOT_SUFFIX`, else an existing directory to store one file per response in. Can later be used as
+        `load_dir`.
+        :param user_config: User config dict, "user" and "token" keys are used for basic authentication
+        :param fetch_mode: `FetchMode` used to request each job
+        :param pool_config: Settings of the pooled HTTP client
+        :param use_uvloop: Run the importer's event loop on uvloop, if it is installed
+        :param limiter_config: Settings of the adaptive limit of concurrent requests per server
+        :param breaker_config: Settings of the circuit breaker of each server
+        :param retry_budget: `RetryBudget` shared by the requests to all servers
+        :param response_cache: Persistent `ResponseCache` to serve responses from, expired responses are served
+        immediately and revalidated in the background
+        :param build_history: Number of most recent builds to request along with every job (see `JobData.history`),
+        0 to request the last build only
+        :param authenticator: `SsoAuthenticator` to log in to servers that reject requests, its cookie jar is shared by
+        all sessions of the importer
+        :param build_duration: Also request the duration of the last build (see `JobData.duration`). Changes the request
+        URLs, so responses stored without it are not found in `load_dir`.
+        """
+        self.load_dir = load_dir
+        self.store_dir = store_dir
+        self.loaded = PackedSnapshot(load_dir) if load_dir and os.path.isfile(load_dir) else None
+        """Packed snapshot at `load_dir`, None if it is a directory"""
+        self.stored = (
+            PackedSnapshotWriter(store_dir)
+            if store_dir and store_dir.endswith(PACKED_SNAPSHOT_SUFFIX) and not os.path.isdir(store_dir)
+            else None
+        )
+        """Packed snapshot at `store_dir`, None if it is a directory"""
+        self.fetch_mode = fetch_mode
+        self.pool_config = pool_config or PoolConfig()
+        self.limiter_config = limiter_config or LimiterConfig()
+        self.breaker_config = breaker_config or BreakerConfig()
+        self.retry_budget = retry_budget or RetryBudget()
+        self.response_cache = response_cache
+        self.build_history = build_history
+        self.authenticator = authenticator
+        self.build_tree = BUILD_DURATION_TREE if build_duration else BUILD_TREE
+        self.snapshot_tree = SNAPSHOT_DURATION_TREE if build_duration else SNAPSHOT_TREE
+        self.auth = (
+            aiohttp.BasicAuth(login=user_config["user"], password=user_config["token"])
+            if user_config and {"user", "token"} <= user_config.keys()
+            else None
+        )
+        self.validators = ValidatorCache()
+        self.connection_stats = ConnectionStats()
+        self.snapshot_rejected_servers: set[str] = set()
+        """Servers that rejected a `SNAPSHOT_TREE` request or listing, only queried with `FetchMode.TWO_STEP` after"""
+        self.loop = EventLoopThread(use_uvloop=use_uvloop)
+        """Event loop thread all requests of this importer run on"""
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stale_sessions: list[aiohttp.ClientSession] = []
+        self._limiters: dict[str, ServerLimiter] = {}
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self.api_flight: SingleFlight[dict] = SingleFlight()
+        """Coalesces concurrent requests of the same API URL"""
+        self.job_flight: SingleFlight[Optional[JobData]] = SingleFlight()
+        """Coalesces concurrent fetches of the same job, e.g. of a job shared by several pipeline configs"""
+        self._revalidations: set[asyncio.Task] = set()
+
+    def _bind_loop(self) -> None:
+        """Reset all state bound to an event loop when called from another loop, e.g. in a forked process"""
+        loop = asyncio.get_running_loop()
+        if self._session_loop is loop:
+            return
+        if self._session is not None and not self._session.closed:
+            # a session from another loop (e.g. of the parent of a forked process) can not be reused or closed
+            # without acting on the other loop's sockets, keep it referenced but unused
+            self._stale_sessions.append(self._session)
+        self._session = None
+        self._session_loop = loop
+        self._limiters = {}
+        self.api_flight = SingleFlight()
+        self.job_flight = SingleFlight()
+        self._revalidations = set()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        self._bind_loop()
+        if self._session is None or self._session.closed:
+            cookie_jar = self.authenticator.cookie_jar() if self.authenticator is not None else None
+            self._session = create_session(self.pool_config, self.connection_stats, self.auth, cookie_jar)
+        return self._session
+
+    def _get_limiter(self, url: str) -> ServerLimiter:
+        server = urlsplit(url).netloc
+        if server not in self._limiters:
+            self._limiters[server] = ServerLimiter(server, self.limiter_config)
+        return self._limiters[server]
+
+    def get_breaker(self, url: str) -> CircuitBreaker:
+        """`CircuitBreaker` of the server of `url`"""
+        server = urlsplit(url).netloc
+        if server not in self._breakers:
+            self._breakers[server] = CircuitBreaker(server, self.breaker_config)
+        return self._breakers[server]
+
+    def _job_tree(self, tree: str) -> str:
+        """Add the `HISTORY_TREE` of the last `build_history` builds to the job `tree`"""
+        return f"{tree},{HISTORY_TREE}{{0,{self.build_history}}}" if self.build_history else tree
+
+    def limiter_stats(self) -> dict[str, LimiterStats]:
+        """Current concurrency limit, in-flight requests and queue depth per server"""
+        return {server: limiter.stats() for server, limiter in self._limiters.items()}
+
+    def submit(self, coro: Coroutine[Any, Any, T]) -> concurrent.futures.Future[T]:
+        """Schedule `coro` on the importer's event loop thread, thread-safe. Returns a future for its result."""
+        return self.loop.submit(coro)
+
+    def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        """Run `coro` on the importer's event loop thread and wait for its result"""
+        return self.loop.run(coro)
+
+    async def _close_session(self) -> None:
+        for task in self._revalidations:
+            task.cancel()
+        if self._session is not None and self._session_loop is asyncio.get_running_loop():
+            await self._session.close()
+        self._session = None
+
+    async def write_snapshot(self) -> None:
+        """Write the responses fetched so far to the packed snapshot at `store_dir`, in a worker thread"""
+        if self.stored is not None and self.stored.dirty:
+            await asyncio.to_thread(self.stored.save)
+
+    def save_snapshot(self) -> None:
+        """`write_snapshot` from any thread"""
+        self.run(self.write_snapshot())
+
+    def close(self) -> None:
+        """Save the packed snapshot, close the pooled HTTP client and stop the importer's event loop thread"""
+        self.save_snapshot()
+        self.run(self._close_session())
+        self.loop.stop()
+        if self.loaded is not None:
+            self.loaded.close()
+
+    @retry(
+        wait=wait_random_exponential(multiplier=0.5, max=10),
+        stop=stop_after_delay(10),
+        # before=before_log(logger, logging.DEBUG),
+        after=log_retry(logging.INFO),
+        retry=_retry_api,
+        retry_error_callback=_cb_api_failure,
     )
-    async with aiohttp.ClientSession(auth=auth) as session:
-        pipeline_promises = dict()
+    async def api(
+        self,
+        url: str,
+        tree: str = "",
+        depth: Optional[int] = None,
+    ) -> dict:
+        api_url = f"{url}/api/json"
+        q = "?"
+        if tree:
+            api_url += f"{q}tree={tree}"
+            q = "?"
+        if depth:
+            api_url += f"{q}depth={depth}"
+            q = "?"
+        file_name = hash_url(api_url)
+        if self.loaded is not None:
+            if (data := self.loaded.get(file_name)) is not None:
+                return data
+        elif self.load_dir:
+            possible_path = os.path.join(self.load_dir, file_name)
+            if os.path.exists(possible_path):
+                with open(possible_path, "r") as f:
+                    return json.load(f)
+        session = self._get_session()
+        if self.response_cache and (cached := await self.response_cache.get(file_name)) is not None:
+            data, fresh = cached
+            if not fresh and not self.api_flight.in_flight(api_url):
+                task = asyncio.create_task(self._revalidate(session, url, api_url, file_name))
+                self._revalidations.add(task)
+                task.add_done_callback(self._revalidations.discard)
+            return data
+        return await self.api_flight.do(api_url, lambda: self._fetch(session, url, api_url, file_name))
+
+    async def _revalidate(self, session: aiohttp.ClientSession, url: str, api_url: str, file_name: str) -> None:
+        """Refetch an expired response of the `response_cache` in the background, without retries"""
+        try:
+            await self.api_flight.do(api_url, lambda: self._fetch(session, url, api_url, file_name))
+        except (BadRequestError, *FETCH_ERRORS) as e:
+            logger.debug(f"Failed to revalidate {api_url}, keeping the cached response: {e!r}")
+
+    async def _fetch(
+        self, session: aiohttp.ClientSession, url: str, api_url: str, file_name: str, login: bool = True
+    ) -> dict:
+        """
+        Request `api_url` from the server, concurrent requests of the same `api_url` are coalesced by `api()`
+        :param login: Log in with the `authenticator` and request again if the server asks for a login
+        """
+        breaker = self.get_breaker(url)
+        if not breaker.allow():
+            raise CircuitOpenError(api_url)
+        self.retry_budget.record_request()
+        generation = self.authenticator.generation(url) if self.authenticator is not None else 0
+        try:
+            async with self._get_limiter(url).request():
+                async with session.get(api_url, headers=self.validators.request_headers(file_name)) as req:
+                    if req.status in (429, 503):
+                        raise ThrottledError(f"{api_url}: {req.status}")
+                    if req.status >= 500:
+                        req.raise_for_status()
+                    breaker.record_success()
+                    if self.authenticator is not None and needs_login(api_url, req.status, str(req.url)):
+                        raise LoginRequiredError(api_url)
+                    if req.status == 400:
+                        raise BadRequestError(api_url)
+                    not_modified = self.validators.not_modified(file_name) if req.status == 304 else None
+                    if not_modified is None:
+                        d = await req.text()
+                        etag, last_modified = req.headers.get("ETag"), req.headers.get("Last-Modified")
+        except (ThrottledError, aiohttp.ClientError, asyncio.TimeoutError):
+            breaker.record_failure()
+            raise
+        except LoginRequiredError:
+            if not login or self.authenticator is None:
+                raise LoginError(f"{api_url}: still asking for a login after logging in")
+            await self.authenticator.refresh(session, url, generation)
+            return await self._fetch(session, url, api_url, file_name, login=False)
+        # the response cache is written after the connection is released
+        if not_modified is not None:
+            if self.response_cache:
+                await self.response_cache.store(file_name, not_modified)
+            return not_modified
+        # todo handle error better than throwing JSONDecodeError here if failed to get job API
+        json_data = json.loads(d)
+        self.validators.store(file_name, etag, last_modified, d)
+        if self.response_cache:
+            await self.response_cache.store(file_name, json_data)
+        if self.stored is not None:
+            self.stored.add(file_name, json_data)
+        elif self.store_dir:
+            possible_path = os.path.join(self.store_dir, file_name)
+            with open(possible_path, "w") as f:
+                json.dump(json_data, f)
+        return json_data
+
+    async def get_job_data(
+        self,
+        server: str,
+        job: str,
+        fetch_mode: Optional[FetchMode] = None,
+        stats: Optional[FetchStats] = None,
+    ) -> Optional[JobData]:
+        """
+        Get data for a single Jenkins `job` from the `server` url
+        :param server: Base URL of the Jenkins Server
+        :param job: Job name for which to get data
+        :param fetch_mode: Overrides the importer's `FetchMode`. `FetchMode.SNAPSHOT` requests job and last build in
+        one round trip, falling back to `FetchMode.TWO_STEP` if the server rejects the nested `tree=` projection
+        :param stats: Optional `FetchStats` to update with request counters
+        :return: JobData dataclass containing job data. Concurrent calls for the same job share a single fetch.
+        """
+        fetch_mode = fetch_mode or self.fetch_mode
+        stats = stats if stats is not None else FetchStats()
+        key = (server, job, fetch_mode)
+        self._bind_loop()
+        if self.job_flight.in_flight(key):
+            stats.coalesced += 1
+        return await self.job_flight.do(key, lambda: self._get_job_data(server, job, fetch_mode, stats))
+
+    async def _get_job_data(self, server: str, job: str, fetch_mode: FetchMode, stats: FetchStats) -> Optional[JobData]:
+        stats.jobs += 1
+        if fetch_mode is not FetchMode.TWO_STEP and server not in self.snapshot_rejected_servers:
+            try:
+                stats.requests += 1
+                r = await self.api(f"{server}/job/{job}", tree=self._job_tree(self.snapshot_tree))
+            except BadRequestError:
+                r = None
+            if r == {}:
+                return None
+            if r is not None and _is_snapshot(r):
+                if r["lastBuild"]:
+                    stats.round_trips_saved += 1
+                return _add_history(_job_data_from_snapshot(server, r), r, self.build_history)
+            logger.info(f"Server {server} rejected snapshot request for {job}, falling back to two requests")
+            self.snapshot_rejected_servers.add(server)
+            stats.snapshot_fallbacks += 1
+
+        try:
+            stats.requests += 1
+            r = await self.api(f"{server}/job/{job}", tree=self._job_tree(JOB_TREE))
+        except BadRequestError:
+            return None
+        if not r:
+            return None
+        name = r["name"]
+
+        if not r["lastBuild"]:
+            # there has not been a build
+            return JobData(
+                name=name,
+                status=JobStatus.NOT_RUN,
+                server=server,
+            )
+        downstream = {i["name"]: server for i in r["downstreamProjects"]}
+        url = _server_build_url(server, r["lastBuild"]["url"])
+        job_r = r
+
+        try:
+            stats.requests += 1
+            r = await self.api(url, tree=self.build_tree)
+        except BadRequestError:
+            r = {}
+        if not r:
+            return JobData(
+                name=name,
+                status=JobStatus.UNDEFINED,
+                server=server,
+            )
+        return _add_history(_job_data_from_build(name, server, url, r, downstream), job_r, self.build_history)
+
+    async def get_folder_job_data(
+        self,
+        server: str,
+        folder: str,
+        jobs: list[str],
+        stats: Optional[FetchStats] = None,
+        page_size: int = BULK_PAGE_SIZE,
+    ) -> Optional[dict[str, JobData]]:
+        """
+        Get data for all `jobs` in a single Jenkins `folder` from paginated listings of the folder
+        :param server: Base URL of the Jenkins Server
+        :param folder: Folder path of the jobs, "" for jobs at the root of `server`
+        :param jobs: Job paths (as used in `get_job_data`) for which to get data
+        :param stats: Optional `FetchStats` to update with request counters
+        :param page_size: Number of jobs requested per listing page
+        :return: Dict of JobData for every entry of `jobs` found in the folder, None if the server rejected the listing
+        """
+        stats = stats if stats is not None else FetchStats()
+        url = f"{server}/job/{folder}" if folder else server
+        wanted = {_split_folder(job)[1]: job for job in jobs}
+        found: dict[str, JobData] = {}
+        two_step_requests = 0
+        pages = 0
+        start = 0
+        while True:
+            pages += 1
+            stats.requests += 1
+            try:
+                tree = f"jobs[{self._job_tree(self.snapshot_tree)}]{{{start},{start + page_size}}}"
+                r = await self.api(url, tree=tree)
+            except BadRequestError:
+                r = {}
+            page = r.get("jobs")
+            # entries without a "lastBuild" are not jobs, e.g. sub-folders
+            page_jobs = [j for j in page if "lastBuild" in j] if page is not None else None
+            if page_jobs is None or not all(_is_snapshot(j) for j in page_jobs):
+                logger.info(f"Server {url} rejected bulk listing, falling back to per-job requests")
+                self.snapshot_rejected_servers.add(server)
+                return None
+            for j in page_jobs:
+                if (job := wanted.get(j["name"])) is not None:
+                    found[job] = _add_history(_job_data_from_snapshot(server, j), j, self.build_history)
+                    two_step_requests += 2 if j["lastBuild"] else 1
+            if len(page) < page_size or len(found) == len(wanted):
+                break
+            start += page_size
+
+        stats.jobs += len(found)
+        stats.round_trips_saved += two_step_requests - pages
+        return found
+
+    async def _fetch_job(
+        self,
+        server: ServerUrl,
+        name: JobName,
+        data: dict[JobName, Optional[JobData]],
+        stats: FetchStats,
+        fetch_mode: Optional[FetchMode] = None,
+    ) -> None:
+        """Fetch a single job into `data`, leaving it out if the fetch fails"""
+        try:
+            data[name] = await self.get_job_data(server, name, fetch_mode, stats)
+        except FETCH_ERRORS as e:
+            logger.warning(f"Failed to get job {name} from {server}: {e!r}")
+
+    async def _fetch_folder(
+        self,
+        server: ServerUrl,
+        folder: str,
+        jobs: list[JobName],
+        data: dict[JobName, Optional[JobData]],
+        stats: FetchStats,
+    ) -> None:
+        """
+        Fetch `jobs` of a single server/folder into `data` with one listing, and per-job requests for any job that is
+        missing from the listing
+        """
+        listing = None
+        if server not in self.snapshot_rejected_servers:
+            try:
+                listing = await self.get_folder_job_data(server, folder, jobs, stats)
+            except FETCH_ERRORS as e:
+                logger.warning(f"Failed to list folder '{folder}' of {server}: {e!r}")
+        data.update(listing or {})
+        missing = [job for job in jobs if job not in data]
+        await asyncio.gather(*(self._fetch_job(server, job, data, stats, FetchMode.SNAPSHOT) for job in missing))
+
+    async def probe_folder(
+        self,
+        server: str,
+        folder: str,
+        jobs: list[str],
+        stats: Optional[FetchStats] = None,
+        page_size: int = BULK_PAGE_SIZE,
+    ) -> Optional[dict[str, Optional[str]]]:
+        """
+        Get the last build number of all `jobs` in a single Jenkins `folder` from paginated `PROBE_TREE` listings
+        :param server: Base URL of the Jenkins Server
+        :param folder: Folder path of the jobs, "" for jobs at the root of `server`
+        :param jobs: Job paths (as used in `get_job_data`) to probe
+        :param stats: Optional `FetchStats` to update with request counters
+        :param page_size: Number of jobs requested per listing page
+        :return: Dict of last build number (None if never built) for every entry of `jobs` found in the folder, None if
+        the server rejected the listing. Servers that reject it are added to `snapshot_rejected_servers`.
+        """
+        stats = stats if stats is not None else FetchStats()
+        url = f"{server}/job/{folder}" if folder else server
+        wanted = {_split_folder(job)[1]: job for job in jobs}
+        found: dict[str, Optional[str]] = {}
+        start = 0
+        while True:
+            stats.requests += 1
+            try:
+                r = await self.api(url, tree=f"jobs[{PROBE_TREE}]{{{start},{start + page_size}}}")
+            except BadRequestError:
+                r = {}
+            page = r.get("jobs")
+            if page is None:
+                logger.info(f"Server {url} rejected probe listing, fetching its jobs in full")
+                self.snapshot_rejected_servers.add(server)
+                return None
+            # entries without a "lastBuild" are not jobs, e.g. sub-folders
+            for j in page:
+                if "lastBuild" in j and (job := wanted.get(j["name"])) is not None:
+                    found[job] = str(j["lastBuild"]["number"]) if j.get("lastBuild") else None
+            if len(page) < page_size or len(found) == len(wanted):
+                break
+            start += page_size
+        return found
+
+    async def _probe_folder(
+        self,
+        server: ServerUrl,
+        folder: str,
+        jobs: list[JobName],
+        probes: dict[JobName, Optional[str]],
+        stats: FetchStats,
+    ) -> None:
+        listing = None
+        try:
+            listing = await self.probe_folder(server, folder, jobs, stats)
+        except FETCH_ERRORS as e:
+            logger.warning(f"Failed to probe folder '{folder}' of {server}: {e!r}")
+        probes.update(listing or {})
+
+    async def refresh_job_data(
+        self,
+        pipeline_jobs: dict[JobName, ServerUrl],
+        previous: JobDataDict,
+        stats: Optional[FetchStats] = None,
+        deadline: Optional[float] = None,
+    ) -> JobDataDict:
+        """
+        Incrementally refresh `previous` job data: probe the last build number of all jobs with one listing per
+        server/folder, and only fetch jobs whose last build changed, was still running or could not be probed. Jobs of
+        servers in `snapshot_rejected_servers` are always fetched.
+        :param pipeline_jobs: Jobs to refresh
+        :param previous: Job data of the previous refresh
+        :param stats: Optional `FetchStats` to update with request counters for this refresh
+        :param deadline: Max number of seconds to wait for probes and jobs, unlimited if None
+        :return: Dictionary containing JobData for every entry in `pipeline_jobs`, unchanged jobs are taken from
+        `previous`
+        """
+        stats = stats if stats is not None else FetchStats()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        folders: dict[tuple[str, str], list[str]] = defaultdict(list)
+        for job, server in pipeline_jobs.items():
+            if previous.get(job) and server not in self.snapshot_rejected_servers:
+                folders[(server, _split_folder(job)[0])].append(job)
+        probes: dict[JobName, Optional[str]] = {}
+        if folders:
+            tasks = [
+                asyncio.create_task(self._probe_folder(server, folder, jobs, probes, stats))
+                for (server, folder), jobs in folders.items()
+            ]
+            _, pending = await asyncio.wait(tasks, timeout=deadline)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        unchanged: JobDataDict = {}
+        for job, data in previous.items():
+            if (
+                job in pipeline_jobs
+                and data
+                and not data.stale
+                and data.status not in (JobStatus.IN_PROGRESS, JobStatus.UNDEFINED)
+                and job in probes
+                and probes[job] == (str(data.build_num) if data.build_num is not None else None)
+            ):
+                unchanged[job] = data
+        changed = {job: server for job, server in pipeline_jobs.items() if job not in unchanged}
+        stats.unchanged += len(unchanged)
+        logger.info(f"Probed {len(probes)} jobs, {len(changed)} changed or running, {len(unchanged)} unchanged")
+
+        remaining = None if deadline is None else max(0.0, deadline - (loop.time() - start))
+        fetched = await self.collect_job_data(changed, stats, previous, remaining) if changed else {}
+        return {job: fetched[job] if job in fetched else unchanged[job] for job in pipeline_jobs}
+
+    async def collect_job_data(
+        self,
+        pipeline_jobs: dict[JobName, ServerUrl],
+        stats: Optional[FetchStats] = None,
+        previous: Optional[JobDataDict] = None,
+        deadline: Optional[float] = None,
+    ) -> JobDataDict:
+        """
+        Get dict of all job data
+        :param pipeline_jobs:
+        :param stats: Optional `FetchStats` to update with request counters for this refresh
+        :param previous: Job data of the previous refresh, used for jobs that could not be fetched
+        :param deadline: Max number of seconds to wait for the jobs, unlimited if None. Jobs that are not fetched in
+        time are cancelled.
+        :return: Dictionary containing all JobData for every entry in `pipeline_jobs`. Jobs that failed or were not
+        fetched before the `deadline` keep their `previous` data, marked as stale.
+        """
+        stats = stats if stats is not None else FetchStats()
+        previous = previous or dict()
+        data: dict[JobName, Optional[JobData]] = {}
+        if self.fetch_mode is FetchMode.BULK:
+            folders: dict[tuple[str, str], list[str]] = defaultdict(list)
+            for job, server in pipeline_jobs.items():
+                folders[(server, _split_folder(job)[0])].append(job)
+            coros = [
+                self._fetch_folder(server, folder, jobs, data, stats) for (server, folder), jobs in folders.items()
+            ]
+        else:
+            coros = [self._fetch_job(server, name, data, stats) for name, server in pipeline_jobs.items()]
+        if coros:
+            tasks = [asyncio.create_task(c) for c in coros]
+            _, pending = await asyncio.wait(tasks, timeout=deadline)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        result: list[Optional[JobData]] = []
+        stale = 0
         for name, server in pipeline_jobs.items():
-            fields_promise = get_job_data(session, server, name, load_dir, store_dir)
-            pipeline_promises[name] = fields_promise
+            job_data = data.get(name)
+            if job_data is None and (name not in data or previous.get(name)):
+                stale += 1
+                job_data = (
+                    replace(previous[name], stale=True)
+                    if previous.get(name)
+                    else JobData(name=name, status=JobStatus.UNDEFINED, server=server, stale=True)
+                )
+            result.append(job_data)
+        if stale:
+            logger.warning(f"{stale} of {len(pipeline_jobs)} jobs could not be fetched in time, showing stale data")
 
-        result = await asyncio.gather(*pipeline_promises.values())
+        cs = self.connection_stats
+        for server, ls in self.limiter_stats().items():
+            logger.debug(
+                f"{server}: limit {ls.limit}, {ls.in_flight} in flight, {ls.queued} queued, {ls.throttled} throttled"
+            )
+        logger.info(
+            f"Fetched {stats.jobs} jobs in {stats.requests} requests ({self.fetch_mode.value}), "
+            f"saved {stats.round_trips_saved} round trips, {stats.snapshot_fallbacks} snapshot fallbacks; "
+            f"in total: {self.validators.hits} not modified / {self.validators.misses} downloaded responses, "
+            f"{cs.connections_created} connections created / {cs.connections_reused} reused, "
+            f"{self.api_flight.coalesced} coalesced requests"
+        )
+        if rc := self.response_cache:
+            logger.info(f"Response cache: {rc.fresh} fresh / {rc.stale} stale (revalidated) / {rc.misses} misses")
+        return dict(zip(pipeline_jobs.keys(), result))
 
-    return dict(zip(pipeline_jobs.keys(), result))
+    async def collect_shared_job_data(
+        self,
+        configs: dict[str, dict[JobName, ServerUrl]],
+        stats: Optional[FetchStats] = None,
+        deadline: Optional[float] = None,
+    ) -> dict[str, JobDataDict]:
+        """
+        Get job data of several pipeline configs, fetching every (server, job) pair shared by several configs only
+        once, and the jobs of all servers concurrently
+        :param configs: Jobs of each pipeline config
+        :param stats: Optional `FetchStats` to update with request counters
+        :param deadline: Max number of seconds to wait for the jobs, see `collect_job_data`
+        :return: Job data of each pipeline config. Every config gets its own copy of a shared job's `JobData`.
+        """
+        by_server: dict[ServerUrl, dict[JobName, ServerUrl]] = defaultdict(dict)
+        for jobs in configs.values():
+            for job, server in jobs.items():
+                by_server[server][job] = server
+        result = await asyncio.gather(
+            *(self.collect_job_data(jobs, stats, deadline=deadline) for jobs in by_server.values())
+        )
+        shared = dict(zip(by_server, result))
+        logger.info(
+            f"Fetched {sum(len(jobs) for jobs in by_server.values())} unique jobs for "
+            f"{sum(len(jobs) for jobs in configs.values())} jobs of {len(configs)} pipeline configs"
+        )
+        return {
+            name: {job: _copy_job_data(data) if (data := shared[server][job]) else data for job, server in jobs.items()}
+            for name, jobs in configs.items()
+        }
+
+    async def discover_downstream(
+        self,
+        roots: JobDataDict,
+        known: Optional[JobDataDict] = None,
+        max_concurrency: int = DISCOVERY_CONCURRENCY,
+        max_depth: Optional[int] = None,
+        stats: Optional[FetchStats] = None,
+    ) -> JobDataDict:
+        """
+        Discover all jobs downstream of `roots`. Every downstream job is fetched as soon as its parent's data arrives,
+        so the discovery takes as long as the slowest chain of jobs rather than the sum of the slowest job per level.
+        :param roots: Job data of the jobs to start discovery from
+        :param known: Job data that is already up-to-date, used instead of fetching the job
+        :param max_concurrency: Max number of jobs fetched concurrently
+        :param max_depth: Max number of levels to discover below `roots`, unlimited if None
+        :param stats: Optional `FetchStats` to update with request counters
+        :return: Dict of JobData of all discovered jobs, excluding `roots`
+        """
+        known = known or dict()
+        stats = stats if stats is not None else FetchStats()
+        semaphore = asyncio.Semaphore(max_concurrency)
+        seen: set[tuple[ServerUrl, JobName]] = {(data.server or "", name) for name, data in roots.items() if data}
+        discovered: JobDataDict = dict()
+        tasks: set[asyncio.Task] = set()
+
+        def visit(data: JobData, depth: int) -> None:
+            if max_depth is not None and depth >= max_depth:
+                return
+            for name, server in data.downstream.items():
+                if (server, name) in seen or name in roots:
+                    continue
+                seen.add((server, name))
+                if name in known:
+                    discovered[name] = known[name]
+                    visit(known[name], depth + 1)
+                else:
+                    tasks.add(asyncio.create_task(fetch(server, name, depth + 1)))
+
+        async def fetch(server: ServerUrl, name: JobName, depth: int) -> None:
+            try:
+                async with semaphore:
+                    data = await self.get_job_data(server, name, stats=stats)
+            except FETCH_ERRORS as e:
+                logger.warning(f"Failed to get downstream job {name} from {server}: {e!r}")
+                return
+            if data is None:
+                logger.warning(f"Failed to get downstream job {name} from {server}")
+                return
+            discovered[name] = data
+            visit(data, depth)
+
+        for data in roots.values():
+            if data:
+                visit(data, 0)
+        while tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            tasks.difference_update(done)
+            for task in done:
+                task.result()
+
+        logger.info(f"Discovered {len(discovered)} downstream jobs in {stats.requests} requests")
+        return discovered
 
 
 def recurse_downstream(
     job_data: JobDataDict,
-    load: Optional[str],
-    store: Optional[str],
+    importer: JenkinsImporter,
     jobs_cache_file: pathlib.Path,
-    user_config: Optional[dict],
+    max_concurrency: int = DISCOVERY_CONCURRENCY,
+    max_depth: Optional[int] = None,
+    known: Optional[JobDataDict] = None,
 ) -> None:
     """
     Recurse through `job_data` dict and fetch `JobData` for every listed "downstream" and add it to `job_data` dict
     :param job_data: Dict of job data
-    :param load: Local directory path str from which to load cached Jenkins data (can be used to run this
-    function without an internet connection to `server`)
-    :param store: Local directory path str where to store cached Jenkins data (can be used to run this
-    function without an internet connection to `server`). Can later be used as the `load_dir` param of this function
-    :param jobs_cache_file:
+    :param importer: `JenkinsImporter` used to fetch the downstream jobs
+    :param jobs_cache_file: `TopologyCache` file of the previous run. Downstream jobs of roots whose build number did
+    not change are fetched concurrently up front, instead of level by level during the discovery. All jobs are still
+    fetched for their current status, the cache only saves latency.
+    :param max_concurrency: Max number of jobs fetched concurrently during discovery
+    :param max_depth: Max number of levels to discover below the jobs in `job_data`, unlimited if None
+    :param known: Up-to-date job data, e.g. discovered for another pipeline config, used instead of fetching the job
     """
+    known = known or dict()
+    topology = TopologyCache.load(jobs_cache_file)
+    to_fetch = {k: v for k, v in topology.valid_subtree(job_data).items() if k not in known}
+    # jobs that could not be fetched are discovered again, their stale data has no downstream jobs to follow
+    fetched = importer.run(importer.collect_job_data(to_fetch)) if to_fetch else {}
+    prefetched = {k: v for k, v in fetched.items() if v and not v.stale}
+    changed = [name for name, data in (job_data | prefetched).items() if data and not topology.is_valid(name, data)]
+    logger.info(f"Topology cache: {len(prefetched)} jobs fetched up front, {len(changed)} changed or new subtrees")
+
+    discovered = importer.run(importer.discover_downstream(job_data, known | prefetched, max_concurrency, max_depth))
+    # jobs of `known` are shared with another pipeline config, which may translate their URLs differently
+    job_data.update({k: _copy_job_data(v) if k in known else v for k, v in discovered.items()})
 
-    def get_to_fetch(job_data_: JobDataDict) -> dict[JobName, ServerUrl]:
-        to_fetch_ = dict()
-        for k, v in job_data_.items():
-            for name in v.downstream:
-                if name not in job_data_:
-                    to_fetch_[name] = v.downstream[name]
-        return to_fetch_
-
-    to_fetch_cache = dict()
-    if jobs_cache_file.exists():
-        with open(jobs_cache_file, "rb") as fr:
-            to_fetch = pickle.load(fr)
-            job_data2 = asyncio.run(collect_job_data(to_fetch, load, store, user_config))
-            job_data.update(job_data2)
-            to_fetch_cache = to_fetch.copy()
-    to_fetch = get_to_fetch(job_data)
-    to_fetch_cache.update(to_fetch)
-    while to_fetch:
-        job_data2 = asyncio.run(collect_job_data(to_fetch, load, store, user_config))
-        job_data.update(job_data2)
-        to_fetch = get_to_fetch(job_data2)
-        to_fetch_cache.update(to_fetch)
-
-    with open(jobs_cache_file, "wb") as fw:
-        pickle.dump(to_fetch_cache, fw)
+    TopologyCache.from_job_data(job_data).save(jobs_cache_file)
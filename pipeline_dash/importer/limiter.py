@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LimiterConfig:
+    """Settings of the per-server adaptive concurrency limit"""
+
+    max_in_flight: int = 20
+    """Upper bound of concurrent requests to a single server"""
+    min_in_flight: int = 1
+    """Lower bound the limit is reduced to when the server is overloaded"""
+    latency_tolerance: float = 3.0
+    """Back off when a response takes longer than this factor times the server's typical latency"""
+
+
+@dataclass
+class LimiterStats:
+    """Snapshot of the state of a `ServerLimiter`, for monitoring"""
+
+    limit: int
+    in_flight: int
+    queued: int
+    throttled: int
+    latency: Optional[float]
+
+
+class ThrottledError(Exception):
+    """Server answered with 429 Too Many Requests or 503 Service Unavailable"""
+
+
+class ServerLimiter:
+    """
+    Adaptive limit of concurrent requests to a single server (AIMD): the limit grows by one for every window of
+    successful requests and is halved when the server throttles (429/503) or its latency increases sharply.
+    Must only be used from a single event loop.
+    """
+
+    _LATENCY_WEIGHT = 0.1
+
+    def __init__(self, name: str, config: LimiterConfig):
+        self.name = name
+        self.config = config
+        self.limit = float(config.max_in_flight)
+        self.in_flight = 0
+        self.queued = 0
+        self.throttled = 0
+        self.latency: Optional[float] = None
+        """Exponentially weighted moving average of the response time in seconds"""
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    def _decrease(self, reason: str) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < (self.latency or 1.0):
+            # responses to requests sent before the last decrease do not reflect it yet
+            return
+        self._last_decrease = now
+        limit = max(float(self.config.min_in_flight), self.limit / 2)
+        if int(limit) != int(self.limit):
+            logger.info(f"Reducing concurrent requests to {self.name} to {int(limit)} ({reason})")
+        self.limit = limit
+
+    def _on_response(self, latency: float) -> None:
+        if self.latency is not None and latency > self.config.latency_tolerance * self.latency:
+            self._decrease(f"latency {latency:.2f}s, typically {self.latency:.2f}s")
+        else:
+            self.limit = min(float(self.config.max_in_flight), self.limit + 1 / self.limit)
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency = (1 - self._LATENCY_WEIGHT) * self.latency + self._LATENCY_WEIGHT * latency
+
+    def _on_throttled(self) -> None:
+        self.throttled += 1
+        self._decrease("throttled by server")
+
+    @asynccontextmanager
+    async def request(self) -> AsyncIterator[None]:
+        """Wait for a free request slot of this server, and adapt the limit to the outcome of the request"""
+        async with self._condition:
+            self.queued += 1
+            try:
+                await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            finally:
+                self.queued -= 1
+            self.in_flight += 1
+        start = time.monotonic()
+        try:
+            yield
+        except ThrottledError:
+            self._on_throttled()
+            raise
+        else:
+            self._on_response(time.monotonic() - start)
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def stats(self) -> LimiterStats:
+        return LimiterStats(
+            limit=int(self.limit),
+            in_flight=self.in_flight,
+            queued=self.queued,
+            throttled=self.throttled,
+            latency=self.latency,
+        )
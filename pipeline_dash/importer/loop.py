@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+from typing import Any, Coroutine, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def new_event_loop(use_uvloop: bool = False) -> asyncio.AbstractEventLoop:
+    """Create a new event loop, using uvloop if requested and installed"""
+    if use_uvloop:
+        try:
+            import uvloop  # type: ignore
+
+            return uvloop.new_event_loop()
+        except ImportError:
+            logger.warning("uvloop is not installed, using the default asyncio event loop")
+    return asyncio.new_event_loop()
+
+
+class EventLoopThread:
+    """
+    Event loop running forever in a daemon thread. Coroutines can be submitted from any thread and share the loop, and
+    with it everything bound to the loop (e.g. HTTP connection pools).
+    """
+
+    def __init__(self, name: str = "importer-loop", use_uvloop: bool = False):
+        self.name = name
+        self.use_uvloop = use_uvloop
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The running event loop, started on first use"""
+        with self._lock:
+            if self._pid != os.getpid():
+                # the loop thread does not exist in a forked process (e.g. a background Dash callback)
+                logger.debug(f"{self.name} used in forked process {os.getpid()}, starting new event loop")
+                self._loop = None
+                self._thread = None
+                self._pid = os.getpid()
+            if self._loop is None:
+                self._loop = new_event_loop(self.use_uvloop)
+                self._thread = threading.Thread(target=self._loop.run_forever, name=self.name, daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def is_loop_thread(self) -> bool:
+        """Check if called from within the loop thread"""
+        return threading.current_thread() is self._thread
+
+    def submit(self, coro: Coroutine[Any, Any, T]) -> concurrent.futures.Future[T]:
+        """Schedule `coro` on the loop, thread-safe. Returns a future for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+        """Run `coro` on the loop and block until it is done. Must not be called from the loop thread."""
+        if self.is_loop_thread():
+            coro.close()
+            raise RuntimeError(f"{self.name}.run() would deadlock when called from the loop thread")
+        return self.submit(coro).result(timeout)
+
+    def stop(self) -> None:
+        """Stop the loop and wait for its thread to finish"""
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                return
+            loop, thread = self._loop, self._thread
+            self._loop = None
+            self._thread = None
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join()
+        loop.close()
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import zlib
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"PDPACK01"
+PACKED_SNAPSHOT_SUFFIX = ".pack"
+"""File name suffix of packed snapshots, `--store` paths without it are directories with one file per response"""
+_TRAILER = struct.Struct("<QQ8s")
+"""Offset and length of the index, followed by `MAGIC` again to detect truncated files"""
+
+
+class PackedSnapshotError(Exception):
+    """File is not a packed snapshot, or it is truncated"""
+
+
+class PackedSnapshot:
+    """
+    Read-only view of a packed snapshot file: API responses keyed by `hash_url(api_url)`, as stored with `--store`.
+    The file is memory mapped, only the index is decoded on open, and each response is decompressed and parsed when
+    it is requested.
+
+    Layout: `MAGIC`, the zlib compressed JSON records, the zlib compressed JSON index {key: [offset, length]}, and
+    the trailer. Records with identical content are stored once and shared by all their keys.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            # an empty file can not be memory mapped
+            if os.fstat(f.fileno()).st_size < len(MAGIC) + _TRAILER.size:
+                raise PackedSnapshotError(f"{path} is not a packed snapshot")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if self._mmap[: len(MAGIC)] != MAGIC:
+                raise PackedSnapshotError(f"{path} is not a packed snapshot")
+            index_offset, index_length, magic = _TRAILER.unpack_from(self._mmap, len(self._mmap) - _TRAILER.size)
+            if magic != MAGIC:
+                raise PackedSnapshotError(f"{path} is truncated")
+            self._index: dict[str, list[int]] = json.loads(
+                zlib.decompress(self._mmap[index_offset : index_offset + index_length])
+            )
+        except (zlib.error, ValueError) as e:
+            self._mmap.close()
+            raise PackedSnapshotError(f"{path} is corrupt: {e}") from e
+        except Exception:
+            self._mmap.close()
+            raise
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def keys(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def raw(self, key: str) -> Optional[bytes]:
+        """Compressed record of `key`, None if there is none"""
+        if (entry := self._index.get(key)) is None:
+            return None
+        offset, length = entry
+        return self._mmap[offset : offset + length]
+
+    def get(self, key: str) -> Optional[dict]:
+        """Parsed API response of `key`, None if there is none"""
+        raw = self.raw(key)
+        return None if raw is None else json.loads(zlib.decompress(raw))
+
+    def close(self) -> None:
+        self._mmap.close()
+
+    def __enter__(self) -> PackedSnapshot:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class PackedSnapshotWriter:
+    """
+    Collects API responses in memory and writes them to a packed snapshot file (see `PackedSnapshot`). Responses
+    already in an existing file at `path` are kept unless they are replaced, and records no key refers to any more are
+    dropped. Every `save()` rewrites the whole file atomically, so readers never see a partially written snapshot.
+    `save()` may run in another thread than `add()`.
+    """
+
+    def __init__(self, path: str, level: int = 6):
+        """
+        :param path: Path of the packed snapshot file
+        :param level: zlib compression level of the records
+        """
+        self.path = path
+        self.level = level
+        self.dirty = False
+        """Responses were added since the last `save()`"""
+        self._keys: dict[str, bytes] = {}
+        """Key to digest of its record"""
+        self._records: dict[bytes, bytes] = {}
+        """Digest to compressed record"""
+        self._refs: dict[bytes, int] = {}
+        """Digest to number of keys with its record"""
+        self._lock = threading.Lock()
+        """Guards the responses against `save()` in another thread"""
+        self._save_lock = threading.Lock()
+        # an empty file is a new snapshot
+        if os.path.exists(path) and os.path.getsize(path):
+            with PackedSnapshot(path) as existing:
+                for key in existing.keys():
+                    self._add_raw(key, existing.raw(key) or b"")
+            self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _add_raw(self, key: str, raw: bytes) -> None:
+        digest = hashlib.sha1(raw).digest()
+        with self._lock:
+            if (old := self._keys.get(key)) == digest:
+                return
+            self._records.setdefault(digest, raw)
+            self._refs[digest] = self._refs.get(digest, 0) + 1
+            self._keys[key] = digest
+            if old is not None:
+                # drop the superseded record, unless another key shares it
+                self._refs[old] -= 1
+                if not self._refs[old]:
+                    del self._refs[old]
+                    del self._records[old]
+            self.dirty = True
+
+    def add(self, key: str, data: dict) -> None:
+        # compressing the same input at the same level is deterministic, so the digest of the compressed record
+        # identifies its content
+        self._add_raw(key, zlib.compress(json.dumps(data, sort_keys=True).encode(), self.level))
+
+    def save(self) -> None:
+        """Write all responses to `path`, replacing it atomically"""
+        with self._save_lock:
+            with self._lock:
+                keys, records = self._keys.copy(), self._records.copy()
+                self.dirty = False
+            try:
+                self._write(keys, records)
+            except BaseException:
+                self.dirty = True
+                raise
+        logger.debug(f"Saved {len(keys)} responses ({len(set(keys.values()))} unique) to {self.path}")
+
+    def _write(self, keys: dict[str, bytes], records: dict[bytes, bytes]) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(self.path)}.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(MAGIC)
+                offsets: dict[bytes, list[int]] = {}
+                for digest in dict.fromkeys(keys.values()):
+                    record = records[digest]
+                    offsets[digest] = [f.tell(), len(record)]
+                    f.write(record)
+                index = zlib.compress(json.dumps({key: offsets[d] for key, d in keys.items()}).encode())
+                index_offset = f.tell()
+                f.write(index)
+                f.write(_TRAILER.pack(index_offset, len(index), MAGIC))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def pack_directory(directory: str, path: str) -> PackedSnapshotWriter:
+    """
+    Convert a directory of one JSON file per response, as written by `--store` before packed snapshots, to a packed
+    snapshot file at `path`
+    """
+    writer = PackedSnapshotWriter(path)
+    for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        if entry.is_file():
+            with open(entry.path, "r") as f:
+                writer.add(entry.name, json.load(f))
+    writer.save()
+    return writer
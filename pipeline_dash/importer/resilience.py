@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BreakerConfig:
+    """Settings of the per-server circuit breaker"""
+
+    failure_threshold: int = 5
+    """Number of consecutive failed requests after which a server is short-circuited"""
+    reset_timeout: float = 30.0
+    """Seconds a short-circuited server is left alone before a single probe request is let through"""
+
+
+class BreakerState(Enum):
+    CLOSED = "closed"
+    """Server is healthy, all requests are let through"""
+    OPEN = "open"
+    """Server is failing, requests are rejected without being sent"""
+    HALF_OPEN = "half-open"
+    """Server was failing, a probe request is let through every `reset_timeout` seconds"""
+
+
+class CircuitOpenError(Exception):
+    """Request was not sent because the server's circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Short-circuits requests to a server after `failure_threshold` consecutive failures, so that an unreachable server
+    fails fast instead of every request waiting for its own timeouts and retries. While open, a single probe request is
+    let through every `reset_timeout` seconds, and the first successful response closes the breaker again.
+    """
+
+    def __init__(self, name: str, config: BreakerConfig):
+        self.name = name
+        self.config = config
+        self.state = BreakerState.CLOSED
+        self.failures = 0
+        """Consecutive failed requests"""
+        self.rejected = 0
+        """Requests rejected while the breaker was open"""
+        self._next_probe = 0.0
+
+    def allow(self) -> bool:
+        """Check if a request to the server may be sent"""
+        if self.state is BreakerState.CLOSED:
+            return True
+        now = time.monotonic()
+        if now >= self._next_probe:
+            # let one probe through, the next one is only allowed if this one does not report back in time
+            self.state = BreakerState.HALF_OPEN
+            self._next_probe = now + self.config.reset_timeout
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        if self.state is not BreakerState.CLOSED:
+            logger.info(f"Server {self.name} is responding again, closing circuit breaker")
+        self.state = BreakerState.CLOSED
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state is BreakerState.HALF_OPEN or (
+            self.state is BreakerState.CLOSED and self.failures >= self.config.failure_threshold
+        ):
+            if self.state is BreakerState.CLOSED:
+                logger.warning(
+                    f"Server {self.name} failed {self.failures} requests in a row, short-circuiting it for "
+                    f"{self.config.reset_timeout}s"
+                )
+            self.state = BreakerState.OPEN
+            self._next_probe = time.monotonic() + self.config.reset_timeout
+
+
+class RetryBudget:
+    """
+    Limits retries to a fraction of all requests, so that retries can not multiply the load on servers that are
+    already struggling. Every request deposits `ratio` tokens, every retry spends one. `min_per_second` tokens are
+    added over time so that a few retries are always possible, and at most `max_tokens` can be saved up.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, max_tokens: float = 100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.exhausted = 0
+        """Retries denied because the budget was used up"""
+        self._last_refill: Optional[float] = None
+
+    def _refill(self, tokens: float) -> None:
+        now = time.monotonic()
+        if self._last_refill is not None:
+            tokens += (now - self._last_refill) * self.min_per_second
+        self._last_refill = now
+        self.tokens = min(self.max_tokens, self.tokens + tokens)
+
+    def record_request(self) -> None:
+        self._refill(self.ratio)
+
+    def try_spend(self) -> bool:
+        """Take a token for a retry, returns False if there is none left"""
+        self._refill(0.0)
+        if self.tokens < 1.0:
+            self.exhausted += 1
+            return False
+        self.tokens -= 1.0
+        return True
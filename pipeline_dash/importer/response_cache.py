@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+import diskcache  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheTTL:
+    """Seconds a cached API response is served without revalidation, by the build result it contains"""
+
+    success: float = 3600.0
+    """Responses of successful builds"""
+    completed: float = 3600.0
+    """Responses of builds that completed with any other result, e.g. FAILURE or ABORTED"""
+    in_progress: float = 5.0
+    """Responses of builds that are still running"""
+    job: float = 30.0
+    """Responses of jobs and job listings, which change as soon as a new build starts"""
+    max_stale: float = 7 * 24 * 3600.0
+    """Seconds an expired response is kept, and served while it is revalidated"""
+
+    @classmethod
+    def from_options(cls, options: tuple[str, ...]) -> CacheTTL:
+        """Create from "key=seconds" strings, e.g. ("success=86400", "in_progress=2")"""
+        ttl = cls()
+        for option in options:
+            key, _, seconds = option.partition("=")
+            key = key.strip().replace("-", "_")
+            if key not in cls.__dataclass_fields__:
+                raise ValueError(f"Unknown cache TTL '{key}', expected one of {', '.join(cls.__dataclass_fields__)}")
+            setattr(ttl, key, float(seconds))
+        return ttl
+
+    def for_result(self, result: Optional[str]) -> float:
+        if result is None:
+            return self.in_progress
+        if result == "SUCCESS":
+            return self.success
+        return self.completed
+
+    def for_response(self, data: dict) -> float:
+        """
+        TTL of an API response: builds (`BUILD_TREE`) by their result, jobs and job listings by the `job` TTL, or
+        shorter if one of their last builds is still running
+        """
+        if "result" in data:
+            return self.for_result(data["result"])
+        return min([self.job, *(self.for_result(result) for result in _last_build_results(data))])
+
+
+def _last_build_results(data: dict) -> Iterator[Optional[str]]:
+    """Results of the `lastBuild[result]` projections in a job response or a `jobs[...]` listing"""
+    for job in [data, *data.get("jobs", [])]:
+        if isinstance(last_build := job.get("lastBuild"), dict) and "result" in last_build:
+            yield last_build["result"]
+
+
+@dataclass
+class _CachedResponse:
+    expires: float
+    """Wall clock time, so that entries stay valid across restarts"""
+    data: dict
+
+
+class ResponseCache:
+    """
+    Persistent read-through cache of parsed API responses, keyed by `hash_url(api_url)`. Entries are fresh for a TTL
+    that depends on the build result they contain (see `CacheTTL`). Expired entries are still returned, marked as
+    stale, so that `api()` can serve them immediately and revalidate them in the background.
+    """
+
+    def __init__(self, cache: diskcache.Cache, ttl: Optional[CacheTTL] = None):
+        self.cache = cache
+        self.ttl = ttl or CacheTTL()
+        self.fresh = 0
+        """Responses served from the cache"""
+        self.stale = 0
+        """Expired responses served from the cache while being revalidated"""
+        self.misses = 0
+        """Responses that were not cached"""
+
+    async def get(self, key: str) -> Optional[tuple[dict, bool]]:
+        """
+        Get the cached response for `key`, reading the disk in a worker thread
+        :return: Tuple of the response and whether it is still fresh, None if `key` is not cached
+        """
+        entry: Optional[_CachedResponse] = await asyncio.to_thread(self.cache.get, key)
+        if entry is None:
+            self.misses += 1
+            return None
+        fresh = time.time() < entry.expires
+        if fresh:
+            self.fresh += 1
+        else:
+            self.stale += 1
+        return entry.data, fresh
+
+    async def store(self, key: str, data: dict) -> None:
+        """Store the response `data` for `key`, writing to disk in a worker thread. Do not modify `data` meanwhile."""
+        ttl = self.ttl.for_response(data)
+        entry = _CachedResponse(expires=time.time() + ttl, data=data)
+        await asyncio.to_thread(self.cache.set, key, entry, expire=ttl + self.ttl.max_stale)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Awaitable, Callable, Optional
+
+from pipeline_dash.importer.jenkins import FetchStats, JenkinsImporter
+from pipeline_dash.job_data import JobData, JobDataDict, JobName, JobStatus, ServerUrl
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PollingConfig:
+    """Poll interval bounds of the jobs of a pipeline config, set by its `polling` key"""
+
+    floor: float = 30.0
+    """Seconds between polls of running and just changed jobs"""
+    ceiling: float = 1800.0
+    """Max seconds between polls of jobs that have not changed"""
+    backoff: float = 2.0
+    """Factor the poll interval of a job grows by every time it is polled without change"""
+    interval: Optional[float] = None
+    """Seconds between refreshes of all jobs when not polling adaptively, overrides the `--fetch-interval` option"""
+
+    @classmethod
+    def from_pipeline_config(cls, config: dict) -> PollingConfig:
+        polling = config.get("polling", {})
+        return cls(**{k: float(v) for k, v in polling.items()})
+
+
+def _is_active(data: Optional[JobData]) -> bool:
+    return data is None or data.status in (JobStatus.IN_PROGRESS, JobStatus.UNDEFINED)
+
+
+def _has_changed(old: Optional[JobData], new: Optional[JobData]) -> bool:
+    if old is None or new is None:
+        return old is not new
+    return (old.build_num, old.status) != (new.build_num, new.status)
+
+
+class PollScheduler:
+    """
+    Keeps the next poll time of every job. Running jobs and jobs whose last build just changed are polled every
+    `floor` seconds, the interval of jobs that did not change grows exponentially up to `ceiling` seconds.
+    """
+
+    def __init__(self, jobs: dict[JobName, ServerUrl], config: PollingConfig):
+        self.jobs = jobs
+        self.config = config
+        now = time.monotonic()
+        self._interval: dict[JobName, float] = {job: config.floor for job in jobs}
+        self._next_poll: dict[JobName, float] = {job: now + config.floor for job in jobs}
+
+    def due(self, now: Optional[float] = None) -> dict[JobName, ServerUrl]:
+        """Jobs whose next poll time has passed"""
+        now = time.monotonic() if now is None else now
+        return {job: server for job, server in self.jobs.items() if self._next_poll.get(job, now) <= now}
+
+    def seconds_until_next(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        return max(0.0, min(self._next_poll.values(), default=now + self.config.floor) - now)
+
+    def update(self, previous: JobDataDict, polled: JobDataDict, now: Optional[float] = None) -> None:
+        """
+        Schedule the next poll of the `polled` jobs, comparing them to their `previous` data. Stale jobs, which could
+        not be fetched, are polled again after `floor` seconds, as their status is not known.
+        """
+        now = time.monotonic() if now is None else now
+        for job, data in polled.items():
+            if _is_active(data) or (data is not None and data.stale) or _has_changed(previous.get(job), data):
+                interval = self.config.floor
+            else:
+                interval = min(self.config.ceiling, self._interval.get(job, self.config.floor) * self.config.backoff)
+            self._interval[job] = interval
+            self._next_poll[job] = now + interval
+
+
+class JobPoller:
+    """
+    Polls the jobs of a pipeline config on the importer's event loop as scheduled by a `PollScheduler`, and merges
+    the results into `snapshot`. The snapshot is replaced rather than modified, so it can be read from any thread.
+    """
+
+    def __init__(
+        self,
+        importer: JenkinsImporter,
+        jobs: dict[JobName, ServerUrl],
+        snapshot: JobDataDict,
+        config: PollingConfig,
+        deadline: Optional[float] = None,
+        on_update: Optional[Callable[[JobDataDict], Awaitable[Any]]] = None,
+    ):
+        """
+        :param importer: `JenkinsImporter` used to fetch the jobs
+        :param jobs: Jobs to poll
+        :param snapshot: Job data of all `jobs` to start from
+        :param config: Poll interval bounds
+        :param deadline: Max number of seconds to wait for the jobs of a single poll
+        :param on_update: Awaited with the new snapshot after every poll
+        """
+        self.importer = importer
+        self.scheduler = PollScheduler(jobs, config)
+        self.snapshot = snapshot
+        self.deadline = deadline
+        self.polls = 0
+        self.on_update = on_update
+
+    async def poll(self, jobs: dict[JobName, ServerUrl], stats: Optional[FetchStats] = None) -> None:
+        stats = stats if stats is not None else FetchStats()
+        polled = await self.importer.collect_job_data(jobs, stats, self.snapshot, self.deadline)
+        self.scheduler.update(self.snapshot, polled)
+        self.snapshot = self.snapshot | polled
+        self.polls += 1
+        if self.on_update is not None:
+            await self.on_update(self.snapshot)
+        logger.debug(f"Polled {len(jobs)} of {len(self.scheduler.jobs)} jobs in {stats.requests} requests")
+
+    async def run(self) -> None:
+        """Poll due jobs until cancelled"""
+        while True:
+            if due := self.scheduler.due():
+                try:
+                    await self.poll(due)
+                except Exception as e:
+                    logger.exception(f"Failed to poll {len(due)} jobs: {e!r}")
+                    failed = {job: replace(data, stale=True) for job in due if (data := self.snapshot.get(job))}
+                    self.scheduler.update(self.snapshot, failed)
+            await asyncio.sleep(max(1.0, self.scheduler.seconds_until_next()))
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """
+    Coalesces concurrent calls with the same key: while a call for a key is in flight, further calls for that key await
+    and share its result (or exception) instead of starting their own. A call is cancelled once everyone waiting for
+    it was cancelled. Must only be used from a single event loop.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        """Calls that did the work"""
+        self.coalesced = 0
+        """Calls that shared the result of a call already in flight"""
+        self._in_flight: dict[Hashable, asyncio.Future[T]] = {}
+        self._waiters: dict[asyncio.Future[T], int] = {}
+        """Number of callers awaiting each call in flight"""
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._in_flight
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        if (future := self._in_flight.get(key)) is not None:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            future = asyncio.ensure_future(fn())
+            self._in_flight[key] = future
+            self._waiters[future] = 0
+
+            def done(f: asyncio.Future[T]) -> None:
+                if self._in_flight.get(key) is f:
+                    del self._in_flight[key]
+                del self._waiters[f]
+                if not f.cancelled():
+                    # retrieve the exception, the call may have outlived everyone waiting for it
+                    f.exception()
+
+            future.add_done_callback(done)
+        self._waiters[future] += 1
+        try:
+            # shield, so that a cancelled caller does not cancel the call shared with others
+            return await asyncio.shield(future)
+        finally:
+            if not future.done():
+                self._waiters[future] -= 1
+                if not self._waiters[future]:
+                    future.cancel()
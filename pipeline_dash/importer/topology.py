@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import logging
+import pathlib
+import pickle
+from dataclasses import dataclass, field
+from typing import Optional
+
+from pipeline_dash.job_data import JobData, JobDataDict, JobName, ServerUrl
+
+logger = logging.getLogger(__name__)
+
+TOPOLOGY_CACHE_VERSION = 1
+
+
+@dataclass
+class TopologyEntry:
+    """Downstream edges of a job, as observed on build `build_num`"""
+
+    server: ServerUrl
+    build_num: Optional[str]
+    downstream: dict[JobName, ServerUrl] = field(default_factory=dict)
+
+
+@dataclass
+class TopologyCache:
+    """
+    Downstream edges of all jobs found by recursive discovery. Edges of a job are considered valid as long as the job's
+    build number has not changed since they were observed.
+
+    The cache only saves latency: every job still has to be fetched for its current status, but the jobs below
+    unchanged roots can be fetched concurrently up front instead of one level at a time.
+    """
+
+    jobs: dict[JobName, TopologyEntry] = field(default_factory=dict)
+    version: int = TOPOLOGY_CACHE_VERSION
+
+    @classmethod
+    def load(cls, path: pathlib.Path) -> TopologyCache:
+        """Load the cache from `path`, returns an empty cache if it does not exist or is of another version"""
+        if not path.exists():
+            return cls()
+        try:
+            with open(path, "rb") as f:
+                cache = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+            logger.warning(f"Failed to load topology cache {path}: {e}")
+            return cls()
+        if not isinstance(cache, TopologyCache) or cache.version != TOPOLOGY_CACHE_VERSION:
+            logger.info(f"Discarding outdated topology cache {path}")
+            return cls()
+        return cache
+
+    def save(self, path: pathlib.Path) -> None:
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+    @classmethod
+    def from_job_data(cls, job_data: JobDataDict) -> TopologyCache:
+        """Cache of the edges in `job_data`. Stale jobs are left out, their edges were not observed on this run."""
+        return cls(
+            jobs={
+                name: TopologyEntry(server=data.server or "", build_num=data.build_num, downstream=data.downstream)
+                for name, data in job_data.items()
+                if data and not data.stale
+            }
+        )
+
+    def is_valid(self, name: JobName, data: JobData) -> bool:
+        """Check if the cached edges of job `name` were observed on its current build"""
+        entry = self.jobs.get(name)
+        return entry is not None and entry.build_num == data.build_num
+
+    def valid_subtree(self, roots: JobDataDict) -> dict[JobName, ServerUrl]:
+        """
+        Get all cached jobs below the `roots` whose build number has not changed. Subtrees below changed roots are
+        left out, as their edges have to be discovered again. The build numbers of the jobs below the roots are not
+        known before they are fetched, so their cached edges are followed as they are. Edges that changed are found by
+        the discovery afterwards, jobs that are no longer downstream are fetched once for nothing.
+        """
+        jobs: dict[JobName, ServerUrl] = dict()
+        stack = [name for name, data in roots.items() if data and self.is_valid(name, data)]
+        while stack:
+            for name, server in self.jobs[stack.pop()].downstream.items():
+                if name in jobs or name in roots:
+                    continue
+                jobs[name] = server
+                if name in self.jobs:
+                    stack.append(name)
+        return jobs
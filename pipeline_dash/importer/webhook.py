@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from typing import Optional
+
+from pipeline_dash.importer.jenkins import _server_build_url
+from pipeline_dash.job_data import BuildHistory, BuildSummary, JobData, JobName, JobStatus, ServerUrl
+
+logger = logging.getLogger(__name__)
+
+_PHASES = ("STARTED", "COMPLETED", "FINALIZED")
+
+
+@dataclass
+class JobEvent:
+    """A build of a job started or completed, as notified by Jenkins"""
+
+    server: ServerUrl
+    job: JobName
+    """Job path as used in `{server}/job/{job}`"""
+    build_num: int
+    status: JobStatus
+    url: str
+    timestamp: Optional[datetime] = None
+    serial: Optional[str] = None
+
+
+def parse_notification(payload: dict) -> Optional[JobEvent]:
+    """
+    Create a `JobEvent` from the JSON payload of the Jenkins Notification plugin, e.g.
+    {"name": "Build", "url": "job/Build/", "build": {"number": 5, "phase": "COMPLETED", "status": "SUCCESS",
+    "full_url": "https://jenkins/job/Build/5/", "url": "job/Build/5/", "parameters": {"SERIAL": "1.2"}}}
+    :return: None if the payload is not about a started or completed build
+    """
+    build = payload.get("build")
+    if not isinstance(build, dict) or build.get("phase") not in _PHASES:
+        return None
+    try:
+        job_url = payload["url"].strip("/")
+        full_url, build_url = build["full_url"], build["url"]
+        number = int(build["number"])
+    except (KeyError, AttributeError, TypeError, ValueError):
+        logger.warning(f"Ignoring invalid Jenkins notification: {payload!r}")
+        return None
+    if not job_url.startswith("job/") or not full_url.endswith(build_url):
+        logger.warning(f"Ignoring Jenkins notification of unknown job url {job_url}")
+        return None
+    status = JobStatus.IN_PROGRESS
+    if build["phase"] != "STARTED" and build.get("status"):
+        try:
+            status = JobStatus(build["status"])
+        except ValueError:
+            logger.warning(f"Ignoring unknown status {build['status']} of {full_url}")
+            return None
+    parameters = build.get("parameters")
+    return JobEvent(
+        server=full_url[: -len(build_url)].rstrip("/"),
+        job=job_url.removeprefix("job/"),
+        build_num=number,
+        status=status,
+        url=full_url,
+        timestamp=datetime.fromtimestamp(build["timestamp"] / 1000.0, timezone.utc).replace(tzinfo=None)
+        if build.get("timestamp")
+        else None,
+        serial=parameters.get("SERIAL") if isinstance(parameters, dict) else None,
+    )
+
+
+def same_server(a: Optional[str], b: Optional[str]) -> bool:
+    return (a or "").rstrip("/").lower() == (b or "").rstrip("/").lower()
+
+
+def _build_key(data: JobData) -> tuple[int, bool]:
+    try:
+        build_num = int(data.build_num) if data.build_num is not None else -1
+    except ValueError:
+        build_num = -1
+    return build_num, data.status not in (JobStatus.IN_PROGRESS, JobStatus.UNDEFINED)
+
+
+def is_newer(data: JobData, than: Optional[JobData]) -> bool:
+    """Check if `data` is of a later build than `than`, or of the same build but finished while `than` was not"""
+    return than is None or _build_key(data) > _build_key(than)
+
+
+def apply_event(data: Optional[JobData], event: JobEvent) -> Optional[JobData]:
+    """
+    Patch the job data of `event`'s job with its build
+    :return: New job data, None if `data` already describes the same or a later build
+    """
+    if data is None:
+        return None
+    same_build = data.build_num == str(event.build_num)
+    patched = replace(
+        data,
+        build_num=str(event.build_num),
+        status=event.status,
+        timestamp=event.timestamp or (data.timestamp if same_build else None),
+        duration=None,
+        serial=event.serial if event.serial is not None or not same_build else data.serial,
+        url=_server_build_url(data.server, event.url) if data.server else event.url,
+        stale=False,
+    )
+    if not is_newer(patched, data):
+        return None
+    if data.history is not None:
+        patched.history = BuildHistory(data.history.capacity)
+        patched.history.extend(b for b in data.history if b.number != event.build_num)
+        patched.history.append(BuildSummary(event.build_num, event.status, patched.timestamp))
+    return patched
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import math
+from array import array
 from dataclasses import dataclass, field
-from datetime import datetime
+from datetime import datetime, timezone
 from enum import Enum
-from typing import ClassVar, Optional
+from typing import ClassVar, Iterable, Iterator, NamedTuple, Optional
 
 JobName = str
 ServerUrl = str
@@ -19,17 +21,127 @@ class JobStatus(Enum):
     UNDEFINED: None = None
 
 
+_STATUSES = list(JobStatus)
+
+
+class BuildSummary(NamedTuple):
+    number: int
+    status: JobStatus
+    timestamp: Optional[datetime] = None
+    """Start of the build (UTC)"""
+    duration: Optional[float] = None
+    """Seconds the build took, None if it is still running or unknown"""
+
+
+class BuildHistory:
+    """
+    Ring buffer of the most recent builds of a job, which keeps the last `capacity` builds appended to it. Stored in
+    flat arrays rather than objects per build, so that the history of thousands of jobs stays small in memory and in
+    the pickled snapshots shared with other processes.
+    """
+
+    __slots__ = ("capacity", "_numbers", "_statuses", "_timestamps", "_durations", "_start", "_size")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._numbers = array("q", bytes(8 * capacity))
+        self._statuses = bytearray(capacity)
+        """Index of each build's `JobStatus`"""
+        self._timestamps = array("d", [math.nan]) * capacity
+        """Seconds since the epoch, NaN if unknown"""
+        self._durations = array("d", [math.nan]) * capacity
+        """Seconds, NaN if unknown"""
+        self._start = 0
+        self._size = 0
+
+    @classmethod
+    def from_builds(cls, builds: list[dict], capacity: Optional[int] = None) -> BuildHistory:
+        """
+        Create from the `builds[number,result,timestamp,duration]` of a Jenkins job response, which lists the newest
+        build first
+        """
+        history = cls(capacity if capacity is not None else len(builds))
+        for build in reversed(builds):
+            history.append(
+                BuildSummary(
+                    number=build["number"],
+                    status=JobStatus(build["result"]) if build["result"] else JobStatus.IN_PROGRESS,
+                    timestamp=datetime.fromtimestamp(build["timestamp"] / 1000.0, timezone.utc).replace(tzinfo=None)
+                    if build.get("timestamp")
+                    else None,
+                    duration=build["duration"] / 1000.0 if build.get("duration") else None,
+                )
+            )
+        return history
+
+    def append(self, build: BuildSummary) -> None:
+        """Add `build` as the newest build, dropping the oldest one if the history is full"""
+        if not self.capacity:
+            return
+        if self._size < self.capacity:
+            i = (self._start + self._size) % self.capacity
+            self._size += 1
+        else:
+            i = self._start
+            self._start = (self._start + 1) % self.capacity
+        self._numbers[i] = build.number
+        self._statuses[i] = _STATUSES.index(build.status)
+        self._timestamps[i] = (
+            build.timestamp.replace(tzinfo=timezone.utc).timestamp() if build.timestamp is not None else math.nan
+        )
+        self._durations[i] = build.duration if build.duration is not None else math.nan
+
+    def extend(self, builds: Iterable[BuildSummary]) -> None:
+        for build in builds:
+            self.append(build)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[BuildSummary]:
+        """Builds from the oldest to the newest"""
+        for j in range(self._size):
+            i = (self._start + j) % self.capacity
+            timestamp, duration = self._timestamps[i], self._durations[i]
+            yield BuildSummary(
+                number=self._numbers[i],
+                status=_STATUSES[self._statuses[i]],
+                timestamp=None
+                if math.isnan(timestamp)
+                else datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None),
+                duration=None if math.isnan(duration) else duration,
+            )
+
+    def statuses(self) -> list[JobStatus]:
+        """Results of the builds from the oldest to the newest"""
+        return [_STATUSES[self._statuses[(self._start + j) % self.capacity]] for j in range(self._size)]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, BuildHistory):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return f"BuildHistory({[(b.number, b.status.value) for b in self]})"
+
+
 @dataclass
 class JobData:
     name: str
     status: JobStatus
     build_num: Optional[int] = None
     timestamp: Optional[datetime] = None
+    duration: Optional[float] = None
+    """Seconds the build took, None if it is still running or unknown"""
     serial: Optional[str] = None
     url: Optional[str] = None
     human_url: Optional[str] = None
     downstream: dict[JobName, ServerUrl] = field(default_factory=dict)
     server: Optional[str] = None
+    stale: bool = False
+    """Data is from an earlier refresh, because the job could not be fetched in time"""
+    history: Optional[BuildHistory] = None
+    """Most recent builds, if requested with the job (see `--build-history`)"""
 
     @classmethod
     def _undefined(cls) -> JobData:
@@ -1,21 +1,36 @@
-import asyncio
 import collections
 import http.client
-import itertools
 import logging
 import os
 import pathlib
 import sys
 import time
-from typing import List, Optional
+from typing import Optional
 
 import mergedeep  # type: ignore
 import rich_click as click
 import yaml
 
 import pipeline_dash.importer.utils as importer_utils
-from pipeline_dash.importer.jenkins import collect_job_data, hash_url, JobName, recurse_downstream
-from pipeline_dash.job_data import JobData, JobDataDict, JobStatus
+from pipeline_dash.importer.auth import SsoAuthenticator
+from pipeline_dash.importer.http import PoolConfig
+from pipeline_dash.importer.jenkins import (
+    DISCOVERY_CONCURRENCY,
+    FetchMode,
+    hash_url,
+    JenkinsImporter,
+    JobName,
+    recurse_downstream,
+    REFRESH_DEADLINE,
+)
+from pipeline_dash.importer.fetcher import BackgroundFetcher, FETCH_INTERVAL, SnapshotStore
+from pipeline_dash.importer.limiter import LimiterConfig
+from pipeline_dash.importer.packed import PACKED_SNAPSHOT_SUFFIX, pack_directory, PackedSnapshotError
+from pipeline_dash.importer.response_cache import CacheTTL, ResponseCache
+from pipeline_dash.importer.scheduler import PollingConfig
+from pipeline_dash.importer.webhook import parse_notification
+from pipeline_dash.history import JobHistory
+from pipeline_dash.job_data import JobDataDict
 from pipeline_dash.pipeline_config_schema import validate_pipeline_config
 from pipeline_dash.pipeline_utils import (
     add_recursive_jobs_pipeline,
@@ -23,8 +38,8 @@ from pipeline_dash.pipeline_utils import (
     collect_jobs_pipeline,
     find_all_pipeline,
     PipelineDict,
-    recurse_pipeline,
 )
+from pipeline_dash.status import StatusAggregator
 from pipeline_dash.viz.dash import viz_dash
 from pipeline_dash.viz.dash.viz_dash import display_dash
 from pipeline_dash.viz.viz_rich import display_rich_table
@@ -46,62 +61,6 @@ def do_verbose():
     requests_log.propagate = True
 
 
-def calculate_status(pipeline: PipelineDict, job_data: JobDataDict) -> None:
-    """
-    Add "status" and "downstream_status" values to each `pipeline` entry recursively.
-    :param pipeline: `PipelineDict` pipeline to update
-    :param job_data: Job data dict that whill be used to calculate "status" and "downstream_statu"
-    """
-
-    def recursive_calculate_status(name: JobName, p: PipelineDict, serial: Optional[str] = None) -> List[str]:
-        if not serial:
-            serial = job_data.get(name, JobData.UNDEFINED).serial
-        statuses = recurse_pipeline(p, recursive_calculate_status, serial)
-        old_serial = False
-        if "server" in p:
-            if (
-                    (job_data[name].serial is None and serial)
-                    or (
-                        serial
-                        and job_data[name].serial is not None
-                        and float(job_data[name].serial or 0) < float(serial)
-                    )
-            ):
-                status = [JobStatus.NOT_RUN.value]
-                old_serial = True
-            else:
-                if job_data[name].status.value is None:
-                    job_data[name].status = JobStatus.IN_PROGRESS
-                status = [job_data[name].status.value]
-
-            p["status"] = status[0]
-            if statuses is None:
-                statuses = []
-            statuses.append(status)
-        if isinstance(statuses, list) and isinstance(statuses[0], list):
-            statuses = list(itertools.chain.from_iterable(statuses))
-        if len(statuses) > 1:
-            counter = collections.Counter(statuses[:-1])
-            if old_serial:
-                p["downstream_status"] = "NOT RUN"
-            elif counter["FAILURE"]:
-                p["downstream_status"] = "FAILURE"
-            elif counter["UNSTABLE"]:
-                p["downstream_status"] = "UNSTABLE"
-            elif counter["In Progress"] or counter[None]:
-                p["downstream_status"] = "In Progress"
-            elif counter["SUCCESS"]:
-                p["downstream_status"] = "SUCCESS"
-            else:
-                p["downstream_status"] = "NOT RUN"
-        else:
-            p["downstream_status"] = None
-
-        return statuses
-
-    s = recursive_calculate_status("", pipeline)
-
-
 @click.group()
 def cli():
     pass
@@ -121,6 +80,19 @@ def help(ctx, subcommand):
 @cli.command()
 @click.argument("pipeline-config", nargs=-1, required=True, type=click.Path(exists=True))
 @click.option("--recurse", is_flag=True, help="BETA: Recursively fetch job data for EVERY job listed")
+@click.option(
+    "--recurse-depth",
+    type=int,
+    default=None,
+    help="Max number of downstream levels to discover with --recurse  [default: unlimited]",
+)
+@click.option(
+    "--recurse-concurrency",
+    type=int,
+    default=DISCOVERY_CONCURRENCY,
+    help="Max number of jobs fetched concurrently while discovering downstream jobs with --recurse",
+    show_default=True,
+)
 @click.option("--verbose", is_flag=True, help="Show verbose output")
 @click.option("--debug", is_flag=True, help="Turn on debug features (verbose logging, inspection features, etc)")
 @click.option("--cli-report", is_flag=True, help="Generate a text-based report rather than graph visualization")
@@ -131,27 +103,177 @@ def help(ctx, subcommand):
     default=f"{pathlib.Path(__file__).parent.resolve()}/.cache",
     show_default=True,
 )
-@click.option("--store", help="EXPERIMENTAL: Directory to store Jenkins JSON data")
-@click.option("--load", help="EXPERIMENTAL: Directory to load Jenkins JSON data")
+@click.option(
+    "--store",
+    help="EXPERIMENTAL: Directory to store Jenkins JSON data in, or packed snapshot file if it ends with "
+    f"'{PACKED_SNAPSHOT_SUFFIX}'",
+)
+@click.option("--load", help="EXPERIMENTAL: Packed snapshot file or directory to load Jenkins JSON data from")
 @click.option(
     "--auth/--no-auth",
     default=False,
-    help="EXPERIMENTAL: Perform login.ubuntu.com SSO authentication",
+    help="EXPERIMENTAL: Perform login.ubuntu.com SSO authentication with the 'email' and 'password' of the --user-file "
+    "when a server asks for a login, the session cookies are kept in the --cache directory",
     show_default=True,
 )
 @click.option("--user-file", help="User file if server authentication is required", type=click.Path(exists=True))
-def dash(pipeline_config, user_file, recurse, verbose, cli_report, short_links, cache, store, load, auth, debug):
+@click.option(
+    "--fetch-mode",
+    type=click.Choice([m.value for m in FetchMode]),
+    default=FetchMode.TWO_STEP.value,
+    help="How job data is requested: 'two-step' (job, then last build), 'snapshot' (one nested request per job) or "
+    "'bulk' (one paginated listing per server/folder)",
+    show_default=True,
+)
+@click.option(
+    "--max-connections-per-host",
+    type=int,
+    default=PoolConfig.limit_per_host,
+    help="Max number of concurrent connections kept open to each Jenkins server",
+    show_default=True,
+)
+@click.option(
+    "--max-requests-per-server",
+    type=int,
+    default=LimiterConfig.max_in_flight,
+    help="Max number of concurrent requests to each Jenkins server, reduced automatically when a server is overloaded",
+    show_default=True,
+)
+@click.option(
+    "--refresh-deadline",
+    type=float,
+    default=REFRESH_DEADLINE,
+    help="Max number of seconds a refresh waits for job data, jobs not fetched in time are shown with stale data",
+    show_default=True,
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help="Refresh incrementally: probe the last build number of every job and only fetch changed or running jobs",
+)
+@click.option(
+    "--fetch-interval",
+    type=float,
+    default=FETCH_INTERVAL,
+    help="Seconds between background refreshes of each pipeline config, can be overridden by its 'polling: interval'",
+    show_default=True,
+)
+@click.option(
+    "--adaptive-polling",
+    is_flag=True,
+    help="Poll every job on its own schedule in the background, refreshes show the latest polled data",
+)
+@click.option(
+    "--read-through-cache",
+    is_flag=True,
+    help="Keep Jenkins responses in the --cache directory and serve them from there, also after a restart. Expired "
+    "responses are served immediately and refetched in the background",
+)
+@click.option(
+    "--cache-ttl",
+    multiple=True,
+    metavar="KEY=SECONDS",
+    help="Seconds cached responses are fresh with --read-through-cache, by key: success, completed, in_progress, job, "
+    "max_stale  [default: success=3600 completed=3600 in_progress=5 job=30]",
+)
+@click.option(
+    "--history",
+    type=click.Path(dir_okay=False),
+    help="SQLite database file to record every finished build of all jobs in",
+)
+@click.option(
+    "--build-history",
+    type=int,
+    default=0,
+    help="Number of most recent builds to fetch along with every job, their results are shown in the table and the "
+    "diagram",
+    show_default=True,
+)
+@click.option(
+    "--webhook",
+    is_flag=True,
+    help=f"Accept Jenkins Notification plugin events at {viz_dash.NOTIFICATION_ROUTE} and update the notified jobs "
+    "right away, use a long --fetch-interval to keep polling as a consistency check only",
+)
+@click.option(
+    "--webhook-token",
+    envvar="PD_WEBHOOK_TOKEN",
+    help="Secret every --webhook notification has to carry, in the 'token' query parameter of the notification URL or "
+    f"the {viz_dash.NOTIFICATION_TOKEN_HEADER} header (default: $PD_WEBHOOK_TOKEN)",
+)
+@click.option("--uvloop", is_flag=True, help="Run the Jenkins importer on uvloop (if installed)")
+def dash(
+    pipeline_config,
+    user_file,
+    recurse,
+    recurse_depth,
+    recurse_concurrency,
+    verbose,
+    cli_report,
+    short_links,
+    cache,
+    store,
+    load,
+    auth,
+    debug,
+    fetch_mode,
+    max_connections_per_host,
+    max_requests_per_server,
+    refresh_deadline,
+    incremental,
+    fetch_interval,
+    adaptive_polling,
+    read_through_cache,
+    cache_ttl,
+    history,
+    build_history,
+    webhook,
+    webhook_token,
+    uvloop,
+):
     import diskcache  # type: ignore
 
     dcache = diskcache.Cache(".diskcache")
     if verbose:
         do_verbose()
-    if store:
+    if webhook and not webhook_token:
+        raise click.BadParameter("required with --webhook", param_hint="--webhook-token")
+    if store and not store.endswith(PACKED_SNAPSHOT_SUFFIX):
         os.makedirs(store, exist_ok=True)
 
     # noinspection PyPep8Naming
     PipelineConfigName = str
     user_config = yaml.safe_load(pathlib.Path(user_file).read_text()) if user_file else dict()
+    response_cache = None
+    if read_through_cache:
+        try:
+            ttl = CacheTTL.from_options(cache_ttl)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--cache-ttl")
+        response_cache = ResponseCache(diskcache.Cache(os.path.join(cache, "responses")), ttl)
+    authenticator = None
+    if auth:
+        try:
+            authenticator = SsoAuthenticator(user_config, cookie_file=os.path.join(cache, "cookies"))
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--user-file")
+    try:
+        importer = JenkinsImporter(
+            load_dir=load,
+            store_dir=store,
+            user_config=user_config,
+            fetch_mode=FetchMode(fetch_mode),
+            pool_config=PoolConfig(limit_per_host=max_connections_per_host),
+            use_uvloop=uvloop,
+            limiter_config=LimiterConfig(max_in_flight=max_requests_per_server),
+            response_cache=response_cache,
+            build_history=build_history,
+            authenticator=authenticator,
+            # the duration is only recorded in the history, and changes the keys of --store / --load
+            build_duration=bool(history),
+        )
+    except PackedSnapshotError as e:
+        raise click.ClickException(str(e))
 
     job_configs = collections.OrderedDict()
     for path in (pathlib.Path(f) for f in pipeline_config):
@@ -169,61 +291,138 @@ def dash(pipeline_config, user_file, recurse, verbose, cli_report, short_links,
         sys.exit(1)
 
     job_server_dicts: dict[PipelineConfigName, dict[JobName, str]] = dict()
-    job_data: dict[PipelineConfigName, JobDataDict] = dict()
     pipeline_dicts: dict[PipelineConfigName, PipelineDict] = dict()
+    aggregators: dict[PipelineConfigName, StatusAggregator] = dict()
     # preload data
     os.makedirs(cache, exist_ok=True)
+    start_time = time.process_time()
     for name, data in job_configs.items():
-        start_time = time.process_time()
         job_server_dicts[name] = collect_jobs_dict(data)
-        job_data[name] = asyncio.run(collect_job_data(job_server_dicts[name], load, store, user_config))
         pipeline_dicts[name] = collect_jobs_pipeline(data)
+    job_data: dict[PipelineConfigName, JobDataDict] = importer.run(
+        importer.collect_shared_job_data(job_server_dicts, deadline=refresh_deadline)
+    )
+    end_time = time.process_time()
+    print(f"Fetched jobs of {len(job_configs)} pipeline configs in {end_time - start_time} sec")
+    discovered: JobDataDict = dict()
+    for name, data in job_configs.items():
+        start_time = time.process_time()
         if recurse:
             jobs_to_recurse = [
                 p["name"] for p in find_all_pipeline(pipeline_dicts[name], lambda _, p: bool(p.get("recurse")))
             ]
             job_data_to_recurse = {k: v for k, v in job_data[name].items() if k in jobs_to_recurse}
             jobs_cache_file = pathlib.Path(cache, data["path_hash"])
-            recurse_downstream(job_data_to_recurse, load, store, jobs_cache_file, user_config)
+            recurse_downstream(
+                job_data_to_recurse, importer, jobs_cache_file, recurse_concurrency, recurse_depth, discovered
+            )
+            discovered.update({k: v for k, v in job_data_to_recurse.items() if k not in jobs_to_recurse})
             job_data[name].update(job_data_to_recurse)
             job_server_dicts[name] = {name: data.server for name, data in job_data[name].items()}
 
         if recurse:
             pipeline_dicts[name] = add_recursive_jobs_pipeline(pipeline_dicts[name], job_data[name])
         importer_utils.add_human_url_to_job_data(job_data[name], data.get("url_translate", {}))
-        calculate_status(pipeline_dicts[name], job_data[name])
+        aggregators[name] = StatusAggregator(pipeline_dicts[name])
+        aggregators[name].calculate(job_data[name])
         end_time = time.process_time()
         print(f"Loaded {name}, {len(job_data[name])} jobs in {end_time - start_time} sec")
+    if store:
+        importer.save_snapshot()
 
-    def get_job_data_(job_config_name: Optional[str] = None, refresh: bool = True) -> tuple[PipelineDict, JobDataDict]:
+    fetcher = BackgroundFetcher(
+        importer, SnapshotStore(dcache), refresh_deadline, incremental, JobHistory(history) if history else None
+    )
+    snapshot_versions: dict[PipelineConfigName, int] = dict()
+
+    def get_job_data_(
+        job_config_name: Optional[str] = None, refresh: bool = True, fetch: bool = False
+    ) -> tuple[PipelineDict, JobDataDict]:
+        """
+        Get the pipeline and job data of `job_config_name`. With `refresh`, the newest snapshot published by the
+        background fetcher is read, which never causes any requests to Jenkins. With `fetch`, the background fetcher
+        is asked for a new snapshot first, concurrent requests from all processes share a single refresh.
+        """
         pipeline_dict_ = pipeline_dicts[job_config_name]
-        if refresh:
+        snapshot = None
+        if fetch:
+            version = fetcher.store.request_refresh(job_config_name)
+            snapshot = fetcher.store.wait_for_newer(job_config_name, version, refresh_deadline)
+        elif refresh:
+            snapshot = fetcher.store.latest(job_config_name)
+        if snapshot is not None and snapshot.version != snapshot_versions.get(job_config_name):
             start_time = time.process_time()
-            job_data_: JobDataDict = asyncio.run(
-                collect_job_data(job_server_dicts[job_config_name], load, store, user_config)
-            )
+            job_data_ = snapshot.job_data
             importer_utils.add_human_url_to_job_data(job_data_, job_configs[job_config_name].get("url_translate", {}))
-            calculate_status(pipeline_dict_, job_data_)
+            changed = snapshot.changed
+            if changed is None or snapshot.version != snapshot_versions.get(job_config_name, 0) + 1:
+                # skipped a snapshot, compare with the job data the statuses were calculated from
+                old_job_data = job_data[job_config_name]
+                changed = {job for job, data in job_data_.items() if old_job_data.get(job) != data}
+            aggregators[job_config_name].update(job_data_, changed)
             end_time = time.process_time()
             job_data[job_config_name] = job_data_
-            print(f"Updated {job_config_name},  {len(job_data_)} jobs in {end_time - start_time} sec")
+            snapshot_versions[job_config_name] = snapshot.version
+            print(
+                f"Updated {job_config_name} to snapshot v{snapshot.version} of {snapshot.timestamp:%H:%M:%S} UTC, "
+                f"{len(job_data_)} jobs ({len(changed)} changed) in {end_time - start_time} sec, "
+                f"{fetcher.store.coalesced(job_config_name)} requested refreshes coalesced so far"
+            )
         else:
             job_data_ = job_data[job_config_name]
 
         return pipeline_dict_, job_data_
 
+    def on_notification(payload: dict) -> list[str]:
+        if (event := parse_notification(payload)) is None:
+            return []
+        return fetcher.push_event(event)
+
     # elements = generate_cyto_elements(pipeline_dict, job_data)
     # display_cyto(elements)
-    if cli_report:
-        display_rich_table(pipeline_dicts, job_data, load, store, short_links)
-    else:
-        display_dash(
-            get_job_data_,
-            viz_dash.Config(
-                debug=debug,
-                job_configs=list(job_configs.keys()),
-            ),
-        )
+    try:
+        if cli_report:
+            display_rich_table(pipeline_dicts, job_data, load, store, short_links)
+        else:
+            for name, data in job_configs.items():
+                polling = PollingConfig.from_pipeline_config(data)
+                fetcher.add_config(
+                    name,
+                    job_server_dicts[name],
+                    job_data[name],
+                    interval=polling.interval or fetch_interval,
+                    polling=polling if adaptive_polling else None,
+                )
+            fetcher.start()
+            display_dash(
+                get_job_data_,
+                viz_dash.Config(
+                    debug=debug,
+                    job_configs=list(job_configs.keys()),
+                ),
+                notification_fn=on_notification if webhook else None,
+                notification_token=webhook_token,
+            )
+    finally:
+        fetcher.stop()
+        importer.close()
+
+
+@cli.command()
+@click.argument("directory", type=click.Path(exists=True, file_okay=False))
+@click.argument("snapshot-file", type=click.Path(dir_okay=False))
+def pack(directory, snapshot_file):
+    """Convert a DIRECTORY of Jenkins JSON data stored with --store into a packed SNAPSHOT_FILE for --load"""
+    start_time = time.process_time()
+    try:
+        writer = pack_directory(directory, snapshot_file)
+    except PackedSnapshotError as e:
+        raise click.ClickException(str(e))
+    end_time = time.process_time()
+    print(
+        f"Packed {len(writer)} responses into {snapshot_file} ({os.path.getsize(snapshot_file)} bytes) "
+        f"in {end_time - start_time} sec"
+    )
 
 
 if __name__ == "__main__":
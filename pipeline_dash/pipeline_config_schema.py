@@ -63,6 +63,16 @@ yaml_schema = {
         "keysrules": {"type": "string"},
         "valuesrules": {"type": "string"},
     },
+    "polling": {
+        "type": "dict",
+        "required": False,
+        "schema": {
+            "floor": {"type": "number", "min": 1},
+            "ceiling": {"type": "number", "min": 1},
+            "backoff": {"type": "number", "min": 1},
+            "interval": {"type": "number", "min": 1},
+        },
+    },
     "servers": {
         "type": "dict",
         "required": True,
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+from array import array
+from collections import OrderedDict
+from typing import Callable, Iterator, Optional, TYPE_CHECKING
+
+from pipeline_dash.job_data import JobData, JobDataDict
+
+if TYPE_CHECKING:
+    from pipeline_dash.pipeline_utils import PipelineDict
+
+MAX_CACHED_TREES = 32
+
+
+class PipelineNode:
+    """View of the node `index` of a `PipelineTree`"""
+
+    __slots__ = ("tree", "index")
+
+    def __init__(self, tree: PipelineTree, index: int):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def name(self) -> str:
+        return self.tree.name(self.index)
+
+    @property
+    def uuid(self) -> str:
+        return self.tree.nodes[self.index]["uuid"]
+
+    @property
+    def server(self) -> Optional[str]:
+        return self.tree.nodes[self.index].get("server")
+
+    @property
+    def is_job(self) -> bool:
+        return bool(self.tree.is_job[self.index])
+
+    @property
+    def depth(self) -> int:
+        return self.tree.depths[self.index]
+
+    @property
+    def parent(self) -> Optional[PipelineNode]:
+        parent = self.tree.parents[self.index]
+        return PipelineNode(self.tree, parent) if parent >= 0 else None
+
+    @property
+    def children(self) -> list[PipelineNode]:
+        return [PipelineNode(self.tree, i) for i in self.tree.children(self.index)]
+
+    @property
+    def dict(self) -> PipelineDict:
+        """The node in the `PipelineDict` the tree was compiled from"""
+        return self.tree.nodes[self.index]
+
+    def __repr__(self) -> str:
+        return f"PipelineNode({self.index}, {self.name!r})"
+
+
+class PipelineTree:
+    """
+    Compiled form of a `PipelineDict`: its nodes in preorder, with the parent, depth and subtree end of each node in
+    flat arrays and the job names interned. The subtree of node `i` are the nodes `i` to `ends[i] - 1`, so traversals
+    are loops over index ranges instead of recursions over nested dicts. Build with `pipeline_tree`, which reuses the
+    tree of a pipeline.
+
+    The tree is an index over the `PipelineDict`, not a replacement: the node dicts stay the storage of the uuid,
+    server and e.g. the status `calculate_status` stores, and `nodes` refers to them. It makes traversals faster, but
+    adds about 35 bytes per node on top of the dicts rather than reducing their memory.
+    """
+
+    __slots__ = ("nodes", "parents", "ends", "depths", "name_ids", "names", "is_job", "_positions")
+
+    def __init__(self, pipeline: PipelineDict):
+        self.nodes: list[PipelineDict] = []
+        """Node dicts in preorder"""
+        self.parents = array("i")
+        """Index of the parent of each node, -1 for the root"""
+        self.ends = array("i")
+        """Index after the last node of the subtree of each node"""
+        self.depths = array("i")
+        self.name_ids = array("i")
+        """Index of the name of each node in `names`"""
+        self.names: list[str] = []
+        self.is_job = bytearray()
+        """1 for the nodes of a job on a server, 0 for groups"""
+        self._positions: Optional[dict[str, int]] = None
+
+        name_ids: dict[str, int] = {}
+        stack: list[tuple[PipelineDict, int, int]] = [(pipeline, -1, 0)]
+        while stack:
+            node, parent, depth = stack.pop()
+            index = len(self.nodes)
+            self.nodes.append(node)
+            self.parents.append(parent)
+            self.depths.append(depth)
+            self.ends.append(index + 1)
+            name = node["name"]
+            if (name_id := name_ids.get(name)) is None:
+                name_id = name_ids[name] = len(self.names)
+                self.names.append(name)
+            self.name_ids.append(name_id)
+            self.is_job.append("server" in node)
+            stack.extend((child, index, depth + 1) for child in reversed(node["children"].values()))
+        for index in range(len(self.nodes) - 1, 0, -1):
+            parent = self.parents[index]
+            if self.ends[index] > self.ends[parent]:
+                self.ends[parent] = self.ends[index]
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __getitem__(self, index: int) -> PipelineNode:
+        return PipelineNode(self, index)
+
+    def name(self, index: int) -> str:
+        return self.names[self.name_ids[index]]
+
+    def children(self, index: int) -> Iterator[int]:
+        """Indices of the children of node `index`"""
+        child, end = index + 1, self.ends[index]
+        while child < end:
+            yield child
+            child = self.ends[child]
+
+    def position(self, uuid: str) -> Optional[int]:
+        """Index of the node `uuid`, None if it is not in the tree"""
+        if self._positions is None:
+            self._positions = {node["uuid"]: index for index, node in enumerate(self.nodes)}
+        return self._positions.get(uuid)
+
+    def find_all(self, select_fn: Callable[[str, PipelineDict], bool]) -> list[PipelineDict]:
+        """All nodes for which `select_fn` is True, in preorder. The root is passed to `select_fn` with an empty name"""
+        names, name_ids = self.names, self.name_ids
+        return [
+            node for index, node in enumerate(self.nodes) if select_fn(names[name_ids[index]] if index else "", node)
+        ]
+
+    def serials(self, job_data: JobDataDict, index: int = 0) -> set[str]:
+        """Serial of the job of node `index`, or the serials of the closest jobs with a serial below it"""
+        serials = set()
+        names, name_ids, ends = self.names, self.name_ids, self.ends
+        i, end = index, ends[index]
+        while i < end:
+            if serial := job_data.get(names[name_ids[i]], JobData.UNDEFINED).serial:
+                serials.add(serial)
+                i = ends[i]
+            else:
+                i += 1
+        return serials
+
+    def all_serials(self, job_data: JobDataDict) -> list[set[str]]:
+        """`serials` of every node, in a single pass over the tree"""
+        serials: list[Optional[set[str]]] = [None] * len(self.nodes)
+        names, name_ids, parents = self.names, self.name_ids, self.parents
+        for i in range(len(self.nodes) - 1, -1, -1):
+            if serial := job_data.get(names[name_ids[i]], JobData.UNDEFINED).serial:
+                serials[i] = {serial}
+            if (parent := parents[i]) >= 0 and serials[i]:
+                if serials[parent] is None:
+                    serials[parent] = set()
+                serials[parent] |= serials[i]  # type: ignore
+        return [s if s is not None else set() for s in serials]
+
+
+_trees: OrderedDict[str, PipelineTree] = OrderedDict()
+
+
+def pipeline_tree(pipeline: PipelineDict) -> PipelineTree:
+    """
+    `PipelineTree` of `pipeline`, compiled on first use and reused as long as `pipeline` is the same object. Nodes added
+    to a pipeline later on require `invalidate_trees`.
+    """
+    tree = _trees.get(pipeline["uuid"])
+    if tree is None or tree.nodes[0] is not pipeline:
+        tree = _trees[pipeline["uuid"]] = PipelineTree(pipeline)
+        while len(_trees) > MAX_CACHED_TREES:
+            _trees.popitem(last=False)
+    _trees.move_to_end(pipeline["uuid"])
+    return tree
+
+
+def invalidate_trees() -> None:
+    """Drop all compiled trees, after nodes were added to a pipeline"""
+    _trees.clear()
@@ -3,13 +3,13 @@ from __future__ import annotations
 import collections
 import itertools
 import uuid
-from typing import Any, Callable, Concatenate, ParamSpec, TypedDict, Union
+from typing import Any, Callable, Concatenate, Iterable, ParamSpec, TypedDict, Union
 
 import mergedeep  # type: ignore
 from typing_extensions import NotRequired
 
 from pipeline_dash.job_data import JobData, JobDataDict, JobName
-from pipeline_dash.utils import timeit
+from pipeline_dash.pipeline_tree import invalidate_trees, pipeline_tree
 
 
 class PipelineDict(TypedDict):
@@ -100,17 +100,111 @@ def find_pipeline_path(pipeline: PipelineDict, select_fn: Callable[[str, Pipelin
 
 def find_all_pipeline(pipeline: PipelineDict, select_fn: Callable[[str, PipelineDict], bool]) -> list[PipelineDict]:
     """Find all sub-pipelines for which select_fn is True"""
+    if not pipeline:
+        return []
+    return pipeline_tree(pipeline).find_all(select_fn)
 
-    def _find(name_, pipeline_):
-        rv = []
-        if select_fn(name_, pipeline_):
-            rv.append(pipeline_)
-        rv2 = recurse_pipeline(pipeline_, _find)
-        return rv + list(itertools.chain.from_iterable(rv2) if rv2 is not None else [])
 
-    # if select_fn("", pipeline):
-    #     return pipeline
-    return _find("", pipeline) or []
+NODE_NAMESPACE = uuid.UUID("6f1b2d4e-5c3a-4e8b-9d7f-2a1c0e9b8d6f")
+"""Namespace of the uuids of pipeline nodes, see `node_uuid`"""
+
+
+def node_uuid(parent_uuid: str, name: str, server: str | None = None) -> str:
+    """
+    Stable uuid of the node `name` (a job on `server`, or a group if None) below the node `parent_uuid`. As the uuid of
+    the parent is derived the same way, it depends on the names and servers of all ancestors, so that a node keeps its
+    uuid across refreshes and restarts.
+    :param parent_uuid: Uuid of the parent node, the name of the pipeline config for the root
+    """
+    return str(uuid.uuid5(NODE_NAMESPACE, f"{parent_uuid}/{server or ''}/{name}"))
+
+
+class PipelineIndex:
+    """
+    Index of the nodes of a `PipelineDict` by uuid (with their parent) and by name. Nodes are indexed by their path of
+    child names from the root, so that the index can be used with any copy of the pipeline, e.g. one read from the
+    cache. Lookups are O(1), resolving a node in a pipeline is O(depth).
+    """
+
+    def __init__(self, pipeline: PipelineDict):
+        self.root_uuid = pipeline["uuid"]
+        self._paths: dict[str, tuple[str, ...]] = {}
+        self._parents: dict[str, str | None] = {}
+        self._uuids_by_name: collections.defaultdict[str, list[str]] = collections.defaultdict(list)
+        self.add(pipeline)
+
+    def add(self, node: PipelineDict, parent: PipelineDict | None = None) -> None:
+        """Index `node`, a child of the indexed `parent` (None for the root), and all of its descendants"""
+        path = self._paths[parent["uuid"]] + (node["name"],) if parent is not None else ()
+        stack: list[tuple[PipelineDict, tuple[str, ...], str | None]] = [
+            (node, path, parent["uuid"] if parent else None)
+        ]
+        while stack:
+            node_, path_, parent_uuid = stack.pop()
+            self._paths[node_["uuid"]] = path_
+            self._parents[node_["uuid"]] = parent_uuid
+            self._uuids_by_name[node_["name"]].append(node_["uuid"])
+            stack.extend((child, path_ + (name,), node_["uuid"]) for name, child in node_["children"].items())
+
+    def __contains__(self, uuid_: str) -> bool:
+        return uuid_ in self._paths
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def path(self, uuid_: str) -> tuple[str, ...] | None:
+        """Path of child names from the root to the node `uuid_`, None if it is not indexed"""
+        return self._paths.get(uuid_)
+
+    def parent(self, uuid_: str) -> str | None:
+        """Uuid of the parent of the node `uuid_`, None for the root"""
+        return self._parents.get(uuid_)
+
+    def ancestors(self, uuid_: str) -> list[str]:
+        """Uuids of the ancestors of the node `uuid_`, from its parent up to the root"""
+        ancestors = []
+        parent = self._parents.get(uuid_)
+        while parent is not None:
+            ancestors.append(parent)
+            parent = self._parents.get(parent)
+        return ancestors
+
+    def uuids(self, name: str) -> list[str]:
+        """Uuids of all nodes of the job `name`"""
+        return self._uuids_by_name.get(name, [])
+
+    def find(self, pipeline: PipelineDict, uuid_: str) -> PipelineDict | None:
+        """Node `uuid_` of `pipeline`, which must be a copy of the indexed pipeline"""
+        path = self._paths.get(uuid_)
+        return resolve_path(pipeline, path) if path is not None else None
+
+
+_indexes: dict[str, PipelineIndex] = {}
+
+
+def pipeline_index(pipeline: PipelineDict) -> PipelineIndex:
+    """
+    `PipelineIndex` of `pipeline` (or a copy of it), maintained by `collect_jobs_pipeline` and
+    `add_recursive_jobs_pipeline`. Built on first use for pipelines created elsewhere.
+    """
+    index = _indexes.get(pipeline["uuid"])
+    if index is None:
+        index = _indexes[pipeline["uuid"]] = PipelineIndex(pipeline)
+    return index
+
+
+def resolve_path(pipeline: PipelineDict, path: Iterable[str]) -> PipelineDict | None:
+    """Follow the child names of `path` from the root of `pipeline`, None if a child does not exist"""
+    node: PipelineDict | None = pipeline
+    for name in path:
+        if (node := node["children"].get(name)) is None:
+            return None
+    return node
+
+
+def find_pipeline_by_uuid(pipeline: PipelineDict, uuid_: str) -> PipelineDict | None:
+    """Find the node `uuid_` of `pipeline` using its `PipelineIndex`"""
+    return pipeline_index(pipeline).find(pipeline, uuid_)
 
 
 def collect_jobs_pipeline(yaml_data: dict) -> PipelineDict:
@@ -132,9 +226,10 @@ def collect_jobs_pipeline(yaml_data: dict) -> PipelineDict:
         p = PipelineDict(
             name=name,
             children={},
-            uuid=str(uuid.uuid4()),
+            uuid=node_uuid(variables["parent_uuid"], name, server_),
             recurse=recurse_ or False,
         )
+        variables_["parent_uuid"] = p["uuid"]
         if isinstance(pipeline, dict):
             if label := pipeline.get("$label"):
                 p["label"] = label
@@ -146,38 +241,48 @@ def collect_jobs_pipeline(yaml_data: dict) -> PipelineDict:
 
     # struct: collections.OrderedDict = collections.OrderedDict()
     pipelines: dict[str, PipelineDict] = {}
+    root_uuid = node_uuid(yaml_data.get("name") or yaml_data.get("path_hash", ""), "")
     for server, data in yaml_data["servers"].items():
         tmp: dict[str, PipelineDict]
         for k in data["pipelines"]:
+            variables = {"server": server, "parent_uuid": root_uuid}
             if type(data["pipelines"]) is dict:
-                tmp = fill_pipeline(k, data["pipelines"][k], {"server": server}) or dict()
+                tmp = fill_pipeline(k, data["pipelines"][k], variables) or dict()
             else:
-                tmp = fill_pipeline(k, [], server) or dict()
+                tmp = fill_pipeline(k, [], variables) or dict()
             mergedeep.merge(pipelines, tmp, strategy=mergedeep.Strategy.TYPESAFE_ADDITIVE)
-    return PipelineDict(
+    pipeline = PipelineDict(
         name="",
         children=pipelines,
-        uuid=str(uuid.uuid4()),
+        uuid=root_uuid,
     )
+    _indexes[pipeline["uuid"]] = PipelineIndex(pipeline)
+    return pipeline
 
 
 def add_recursive_jobs_pipeline(pipeline: PipelineDict, job_data: JobDataDict) -> PipelineDict:
+    index = pipeline_index(pipeline)
+
     def fill_pipeline(name: str, pipeline_: PipelineDict):
         if "server" in pipeline_ and pipeline_.get("recurse") and job_data.get(name, JobData.UNDEFINED).downstream:
             server = pipeline_["server"]
             for k, v in job_data[name].downstream.items():
-                pipeline_["children"].setdefault(
-                    k,
-                    PipelineDict(
+                if k not in job_data:
+                    # beyond the discovery depth limit
+                    continue
+                if k not in pipeline_["children"]:
+                    pipeline_["children"][k] = PipelineDict(
                         name=k,
                         children={},
-                        uuid=str(uuid.uuid4()),
+                        uuid=node_uuid(pipeline_["uuid"], k, v),
                         recurse=True,
-                    ),
-                ).setdefault("server", v)
+                    )
+                    index.add(pipeline_["children"][k], pipeline_)
+                pipeline_["children"][k].setdefault("server", v)
         recurse_pipeline(pipeline_, fill_pipeline)
 
     fill_pipeline("", pipeline)
+    invalidate_trees()
     return pipeline
 
 
@@ -200,30 +305,4 @@ def collect_jobs_dict(yaml_data: dict) -> dict[JobName, str]:
 
 
 def get_downstream_serials(d: PipelineDict, job_data: dict) -> set[str]:
-    def _collect(name, sub_dict: PipelineDict) -> set[str] | None:
-        serials_: set[str] = set()
-        serial = job_data.get(name, JobData.UNDEFINED).serial
-        if serial:
-            return {serial}
-        other_serials = recurse_pipeline(sub_dict, _collect)
-        if other_serials:
-            serials_ |= set(itertools.chain.from_iterable(other_serials))
-        return serials_ if serials_ else None
-
-    serials = _collect(d["name"], d)
-    return serials if serials else set()
-
-
-@timeit
-def translate_uuid(
-    uuid: str, old_pipeline: PipelineDict, new_pipeline: PipelineDict
-) -> tuple[str, PipelineDict] | None:
-    sub_dict: PipelineDict = new_pipeline
-    path = find_pipeline_path(old_pipeline, lambda _, p: p.get("uuid", "") == uuid)
-    if path is not None:
-        # pprint(path)
-        for child in path:
-            sub_dict = sub_dict.get("children", {}).get(child, {})  # type: ignore
-        if sub_dict:
-            return sub_dict["uuid"], sub_dict
-    return None
+    return pipeline_tree(d).serials(job_data)
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Iterable, Optional
+
+import numpy as np
+
+from pipeline_dash.job_data import JobData, JobDataDict, JobName, JobStatus
+from pipeline_dash.pipeline_tree import pipeline_tree
+from pipeline_dash.pipeline_utils import PipelineDict
+
+_STATUSES = ("FAILURE", "UNSTABLE", "In Progress", "SUCCESS", "NOT RUN", "ABORTED", None)
+"""Statuses by code, starting with the downstream statuses by priority"""
+_CODES = {status: code for code, status in enumerate(_STATUSES)} | {None: 2}
+"""Code of each job status, undefined counts as in progress"""
+_UNDEFINED = len(_STATUSES)
+_VALUE_CODES = _CODES | {None: _UNDEFINED}
+"""Code of each `JobStatus` value, undefined has its own code to be set to in progress"""
+_NOT_RUN = _CODES["NOT RUN"]
+_NONE = len(_STATUSES) - 1
+"""Code of nodes without a status"""
+_BUCKETS = 4
+"""Number of downstream statuses, a subtree with none of them is NOT RUN"""
+_BUCKET_OF = np.array([0, 1, 2, 3, _BUCKETS, _BUCKETS, 2], dtype=np.int8)
+"""Downstream status of each code, `_BUCKETS` for codes that do not count. A missing last job counts as in progress."""
+
+
+class StatusAggregator:
+    """
+    Calculates the "status" and "downstream_status" of every node of a pipeline, and keeps the number of jobs of each
+    status in the subtree of every node. `calculate` works on the arrays of the `PipelineTree` with NumPy. After some
+    jobs changed, `update` only recalculates the nodes on their paths to the root, and the subtrees whose serial changed
+    with them.
+
+    The status of a job is NOT RUN if its serial is older than the first serial on the path from the root to it. The
+    downstream status of a node is the worst status of the jobs in its subtree, except for the last job in postorder
+    (the node itself for jobs).
+    """
+
+    def __init__(self, pipeline: PipelineDict):
+        self.pipeline = pipeline
+        self.tree = tree = pipeline_tree(pipeline)
+        n = len(tree)
+        self._parents = parents = np.asarray(tree.parents)
+        self._ends = ends = np.asarray(tree.ends)
+        self._name_ids = np.asarray(tree.name_ids)
+        self._is_job = is_job = np.frombuffer(tree.is_job, dtype=np.bool_)
+        self._job_nodes = np.flatnonzero(is_job)
+        self._job_names = {tree.names[name_id] for name_id in np.asarray(tree.name_ids)[self._job_nodes].tolist()}
+        depths = np.asarray(tree.depths)
+        order = np.argsort(depths, kind="stable")
+        self._levels = np.split(order, np.flatnonzero(np.diff(depths[order])) + 1)
+        """Node indices by depth"""
+
+        self._serials = np.full(n, None, dtype=object)
+        """First serial on the path from the root to each node"""
+        self._codes = np.full(n, _NONE, dtype=np.int8)
+        """Status code of each node"""
+        self._old_serials = np.zeros(n, dtype=np.bool_)
+        self._counts = np.zeros((_BUCKETS + 1, n), dtype=np.int_)
+        """Jobs of each downstream status in the subtree of each node"""
+        jobs = np.concatenate(([0], np.cumsum(is_job)))
+        self._jobs = jobs[ends] - jobs[:n]
+        """Jobs in the subtree of each node"""
+        # the last job in postorder is the node itself for jobs, else the one of its last child
+        last_children = np.full(n + 1, n)
+        children = np.arange(1, n)
+        last = children[ends[children] == ends[parents[children]]]
+        last_children[parents[last]] = last
+        tails = np.full(n + 1, -1)
+        for level in reversed(self._levels):
+            tails[level] = np.where(is_job[level], level, tails[last_children[level]])
+        self._tails = tails[:n]
+        """Last job in postorder of the subtree of each node, -1 if there is none"""
+        self._nodes_by_name: Optional[defaultdict[JobName, list[int]]] = None
+        self._undefined: set[JobName] = set()
+        """Jobs whose undefined status was set to in progress, to be set again in the job data of an `update`"""
+        self.updated = 0
+        """Nodes whose downstream status was recalculated by the last `calculate` or `update`"""
+
+    def nodes_by_name(self) -> defaultdict[JobName, list[int]]:
+        """Indices of the nodes of each name, without the root"""
+        if self._nodes_by_name is None:
+            self._nodes_by_name = defaultdict(list)
+            for i in range(1, len(self.tree)):
+                self._nodes_by_name[self.tree.name(i)].append(i)
+        return self._nodes_by_name
+
+    def _job_status(self, i: int, job_data: JobDataDict) -> None:
+        tree = self.tree
+        name = tree.name(i) if i else ""
+        parent = tree.parents[i]
+        serial = self._serials[i] = (self._serials[parent] if parent >= 0 else None) or job_data.get(
+            name, JobData.UNDEFINED
+        ).serial
+        if tree.is_job[i]:
+            job = job_data[name]
+            if (job.serial is None and serial) or (
+                serial and job.serial is not None and float(job.serial or 0) < float(serial)
+            ):
+                code = _NOT_RUN
+                self._old_serials[i] = True
+            else:
+                code = _CODES[job.status.value]
+                self._old_serials[i] = False
+            self._codes[i] = code
+            tree.nodes[i]["status"] = _STATUSES[code]
+
+    def _set_in_progress(self, job_data: JobDataDict, names: Iterable[JobName]) -> None:
+        """Set the undefined status of the jobs `names` to in progress, unless all their nodes are NOT RUN"""
+        nodes_by_name = self.nodes_by_name()
+        for name in names:
+            if (job := job_data.get(name)) is not None and job.status.value is None:
+                if any(self._is_job[i] and not self._old_serials[i] for i in nodes_by_name.get(name, ())):
+                    job.status = JobStatus.IN_PROGRESS
+                    self._undefined.add(name)
+
+    def _downstream_status(self, i: int) -> None:
+        downstream_status = None
+        if self._jobs[i] > 1:
+            if self._old_serials[i]:
+                downstream_status = "NOT RUN"
+            else:
+                tail = self._tails[i]
+                last_bucket = _BUCKET_OF[self._codes[tail] if tail >= 0 else _NONE]
+                downstream_status = next(
+                    (
+                        _STATUSES[bucket]
+                        for bucket in range(_BUCKETS)
+                        if self._counts[bucket, i] > (bucket == last_bucket)
+                    ),
+                    "NOT RUN",
+                )
+        self.tree.nodes[i]["downstream_status"] = downstream_status
+
+    def calculate(self, job_data: JobDataDict) -> None:
+        """Calculate the statuses of all nodes from `job_data`"""
+        tree = self.tree
+        n = len(tree)
+        parents, ends, name_ids, is_job = self._parents, self._ends, self._name_ids, self._is_job
+
+        # serial, serial value and status code of each name
+        jobs = [job_data.get(name, JobData.UNDEFINED) for name in tree.names]
+        if missing := self._job_names - job_data.keys():
+            raise KeyError(next(iter(missing)))
+        serials: list[Optional[str]] = [job.serial for job in jobs]
+        no_job_serials = np.fromiter((serial is None for serial in serials), dtype=np.bool_, count=len(serials))
+        values = np.fromiter(
+            (float(serial or 0) if serial is not None else np.nan for serial in serials),
+            dtype=np.float64,
+            count=len(serials),
+        )
+        # `_value_` skips the slow `Enum.value` property
+        codes = np.fromiter((_VALUE_CODES[job.status._value_] for job in jobs), dtype=np.int8, count=len(jobs))
+        # the serial of the root is the one of the job without a name
+        root_serial = job_data.get("", JobData.UNDEFINED).serial
+        serials.append(root_serial)
+        values = np.append(values, float(root_serial) if root_serial else np.nan)
+        node_names = name_ids.copy()
+        node_names[0] = len(tree.names)
+        node_serials = np.array(serials, dtype=object)[node_names]
+
+        # node with the first serial on the path from the root to each node, -1 if there is none
+        has_serials = node_serials.astype(np.bool_)
+        sources = np.full(n + 1, -1)
+        sources[0] = 0 if has_serials[0] else -1
+        for level in self._levels[1:]:
+            parent_sources = sources[parents[level]]
+            sources[level] = np.where(parent_sources >= 0, parent_sources, np.where(has_serials[level], level, -1))
+        sources = sources[:n]
+        self._serials = np.append(node_serials, None)[sources]
+
+        # jobs with a serial older than the one of their path are NOT RUN
+        path_values = np.append(values[node_names], np.nan)[sources]
+        self._old_serials = old_serials = (
+            is_job & (sources >= 0) & (no_job_serials[name_ids] | (values[name_ids] < path_values))
+        )
+        job_codes = np.where(codes == _UNDEFINED, _CODES[None], codes)[name_ids]
+        self._codes = np.where(is_job, np.where(old_serials, _NOT_RUN, job_codes), _NONE).astype(np.int8)
+
+        # the jobs of a subtree are a contiguous range in preorder
+        buckets = np.where(is_job, _BUCKET_OF[self._codes], _BUCKETS)
+        counts = np.zeros((_BUCKETS + 1, n + 1), dtype=np.int_)
+        np.cumsum(buckets == np.arange(_BUCKETS + 1)[:, None], axis=1, out=counts[:, 1:])
+        self._counts = counts[:, ends] - counts[:, :n]
+
+        # the first downstream status with jobs in the subtree, without its last job in postorder
+        tails = self._tails
+        last_buckets = _BUCKET_OF[np.where(tails >= 0, self._codes[tails], _NONE)]
+        worse = self._counts[:_BUCKETS] > (np.arange(_BUCKETS)[:, None] == last_buckets)
+        downstream = np.where(worse.any(axis=0), worse.argmax(axis=0), _NOT_RUN)
+        downstream = np.where(self._jobs > 1, np.where(old_serials, _NOT_RUN, downstream), _NONE)
+
+        nodes = tree.nodes
+        for i, code in zip(self._job_nodes.tolist(), self._codes[self._job_nodes].tolist()):
+            nodes[i]["status"] = _STATUSES[code]
+        for node, code in zip(nodes, downstream.tolist()):
+            node["downstream_status"] = _STATUSES[code]
+        in_progress = np.zeros(len(tree.names), dtype=np.bool_)
+        in_progress[name_ids[is_job & ~old_serials]] = True
+        self._undefined = set()
+        for name_id in np.flatnonzero(in_progress & (codes == _UNDEFINED)).tolist():
+            job_data[tree.names[name_id]].status = JobStatus.IN_PROGRESS
+            self._undefined.add(tree.names[name_id])
+        self.updated = n
+
+    def update(self, job_data: JobDataDict, changed: Iterable[JobName]) -> None:
+        """
+        Recalculate the statuses after the jobs `changed` changed in `job_data`. Costs O(depth) per changed job, plus
+        the size of its subtree if its serial changed.
+        """
+        tree = self.tree
+        ends, parents = tree.ends, tree.parents
+        nodes_by_name = self.nodes_by_name()
+        dirty: set[int] = set()
+        evaluated: set[JobName] = set()
+        changed, self._undefined = set(changed) | self._undefined, set()
+        for name in changed:
+            for i in nodes_by_name.get(name, ()):
+                j, end = i, ends[i]
+                while j < end:
+                    serial, code, old_serial = self._serials[j], self._codes[j], self._old_serials[j]
+                    self._job_status(j, job_data)
+                    evaluated.add(tree.name(j))
+                    if self._old_serials[j] != old_serial:
+                        dirty.add(j)
+                    if self._codes[j] != code:
+                        old_bucket, bucket = _BUCKET_OF[code], _BUCKET_OF[self._codes[j]]
+                        k = j
+                        while k >= 0:
+                            self._counts[old_bucket, k] -= 1
+                            self._counts[bucket, k] += 1
+                            dirty.add(k)
+                            k = parents[k]
+                    # the subtree below only depends on this node through its serial
+                    j = j + 1 if self._serials[j] != serial else ends[j]
+        for i in dirty:
+            self._downstream_status(i)
+        self._set_in_progress(job_data, evaluated)
+        self.updated = len(dirty)
+
+
+def calculate_status(pipeline: PipelineDict, job_data: JobDataDict) -> None:
+    """
+    Add "status" and "downstream_status" values to each `pipeline` entry recursively.
+    :param pipeline: `PipelineDict` pipeline to update
+    :param job_data: Job data dict that will be used to calculate "status" and "downstream_status"
+    """
+    StatusAggregator(pipeline).calculate(job_data)
@@ -39,6 +39,13 @@ window.myNamespace = Object.assign({}, window.myNamespace, {
             // return cell.getData()
             // return element
         },
+        historyCellFormat: function (cell, formatterParams, onRendered) {
+            // [status, color] of the most recent builds, oldest first
+            return (cell.getValue() || []).map(([status, color]) =>
+                `<span title='${status}' style='display:inline-block; width:6px; height:1em; margin-right:1px; ` +
+                `background-color:${color}'></span>`
+            ).join("")
+        },
         infoIconCellClick: function (e, cell) {
             console.log("infoIconCellClick")
             if (!cell.getRow().getData()?.url)
@@ -187,7 +187,7 @@ def generate_node_traces(graph):
         y=[pos[1] for _, pos in graph.nodes.data("pos")],
         mode="markers",
         textposition="middle right",
-        hovertemplate="%{customdata.name}<br>%{customdata.serial}<extra></extra>",
+        hovertemplate="%{customdata.name}<br>%{customdata.serial}%{customdata.history}<extra></extra>",
         showlegend=False,
         marker=dict(
             size=15,
@@ -14,11 +14,15 @@ from dash.exceptions import PreventUpdate  # type: ignore
 from dash_tabulator import DashTabulator  # type: ignore
 
 from pipeline_dash.job_data import JobData, JobDataDict
-from pipeline_dash.pipeline_utils import get_downstream_serials, PipelineDict
+from pipeline_dash.pipeline_tree import pipeline_tree, PipelineTree
+from pipeline_dash.pipeline_utils import PipelineDict
 from pipeline_dash.viz.dash import components, viz_dash
 from pipeline_dash.viz.dash.logged_callback import logged_callback
 from pipeline_dash.viz.dash.partial_callback import PartialCallback
 
+LIVE_REFRESH_INTERVAL = 10 * 1000
+"""Refresh interval in ms, short enough to show the builds reported by notifications while they are recent"""
+
 
 class LeftPane(dbc.Col):
     class Ids:
@@ -58,12 +62,14 @@ class LeftPane(dbc.Col):
         callback_manager: dash.DiskcacheManager
         RefreshCallbackType = PartialCallback[Callable[..., Any]]
         refresh: RefreshCallbackType
-        RefreshDataCallbackType = Callable[[str], tuple[PipelineDict, JobDataDict]]
+        RefreshDataCallbackType = Callable[..., tuple[PipelineDict, JobDataDict]]
         refresh_data: RefreshDataCallbackType
 
     @dataclass
     class Config:
         job_configs: list[str]
+        live_updates: bool = False
+        """Jobs are updated by notifications, refresh every `LIVE_REFRESH_INTERVAL` by default to show them"""
 
     def __init__(self, app, pipeline_dict: PipelineDict, job_data: JobDataDict, callbacks: Callbacks, config: Config):
 
@@ -110,15 +116,16 @@ class LeftPane(dbc.Col):
                         dbc.Select(
                             id=self.ids.selects.refresh_interval,
                             options=[
+                                dict(label="10 s", value=LIVE_REFRESH_INTERVAL),
                                 dict(label="1 min", value=60 * 1000),
                                 dict(label="5 min", value=5 * 60 * 1000),
                                 dict(label="10 mins", value=10 * 60 * 1000),
                             ],
-                            value=5 * 60 * 1000,
+                            value=LIVE_REFRESH_INTERVAL if config.live_updates else 5 * 60 * 1000,
                             persistence=True,
                         ),
                         dbc.InputGroupText(
-                            dbc.Switch(id=self.ids.checkboxes.refresh, persistence=True),
+                            dbc.Switch(id=self.ids.checkboxes.refresh, value=config.live_updates, persistence=True),
                         ),
                         dbc.Button(
                             html.I(className="bi-arrow-clockwise"),
@@ -274,14 +281,9 @@ class LeftPane(dbc.Col):
 
     @classmethod
     def generate_job_details(cls, pipeline_dict: PipelineDict, job_data: JobDataDict):
-        job_details = []
-        for name, data in pipeline_dict["children"].items():
-            job_details += add_jobs_to_table(
-                name=name,
-                job_struct=data,
-                job_data=job_data,
-            )
-        return job_details
+        tree = pipeline_tree(pipeline_dict)
+        rows = _table_rows(tree, job_data)
+        return [rows[child] for child in tree.children(0)]
 
     @classmethod
     def setup_sel_job_config_callbacks(cls, app: dash.Dash) -> None:
@@ -332,7 +334,7 @@ class LeftPane(dbc.Col):
             if n_clicks is None:
                 raise PreventUpdate()
             current_time = datetime.datetime.now().time().isoformat("seconds")
-            return *callback.function(*args, **kwargs), current_time
+            return *callback.function(*args, **kwargs, fetch=True), current_time
 
     @classmethod
     def setup_intvl_refresh_callback(
@@ -467,6 +469,16 @@ class LeftPane(dbc.Col):
                                 responsive=2,
                                 widthGrow=1,
                             ),
+                            dict(
+                                title="History",
+                                field="history",
+                                formatter=ns("historyCellFormat"),
+                                headerSort=False,
+                                minWidth=80,
+                                responsive=4,
+                                visible=_has_history(table_data),
+                                widthGrow=0,
+                            ),
                             dict(
                                 title="Job",
                                 field="url",
@@ -530,10 +542,16 @@ class LeftPane(dbc.Col):
             """
 
 
+def _has_history(table_data: list[dict]) -> bool:
+    return any(row.get("history") or _has_history(row.get("_children") or []) for row in table_data)
+
+
 def add_jobs_to_table(name: str, job_struct: PipelineDict, job_data: JobDataDict, indent=1) -> List[dict]:
-    details: dict = dict(
-        _children=[],
-    )
+    return [_table_rows(pipeline_tree(job_struct), job_data, name)[0]]
+
+
+def _table_rows(tree: PipelineTree, job_data: JobDataDict, root_name: Optional[str] = None) -> List[dict]:
+    """Table row of every node of `tree`, each with the rows of its children in `_children`"""
     status_color_map = defaultdict(
         lambda: "#7c8187",
         {
@@ -544,52 +562,62 @@ def add_jobs_to_table(name: str, job_struct: PipelineDict, job_data: JobDataDict
             None: "#2d6e9a",
         },
     )
-    if "server" in job_struct:
-        fields = job_data[name]
-        status = fields.status.value
-        downstream_status = job_struct.get("downstream_status", None)
-        if downstream_status and downstream_status != status:
-            status = f"{status} / {downstream_status}"
-        details.update(
-            dict(
-                name=fields.name,
-                serial=fields.serial,
-                build_num=fields.build_num,
-                timestamp=fields.timestamp.strftime("%y-%m-%d %H:%M UTC") if fields.timestamp else None,
-                status=status,
-                url=fields.human_url,
-                num_children=len(job_struct["children"]),
-            )
+    serials = None
+    rows: List[dict] = []
+    for i, job_struct in enumerate(tree.nodes):
+        name = root_name if i == 0 and root_name is not None else tree.name(i)
+        details: dict = dict(
+            _children=[],
         )
-    else:
+        if "server" in job_struct:
+            fields = job_data[name]
+            status = fields.status.value
+            downstream_status = job_struct.get("downstream_status", None)
+            if downstream_status and downstream_status != status:
+                status = f"{status} / {downstream_status}"
+            if fields.stale:
+                status = f"{status} (stale)"
+            details.update(
+                dict(
+                    name=fields.name,
+                    serial=fields.serial,
+                    build_num=fields.build_num,
+                    timestamp=fields.timestamp.strftime("%y-%m-%d %H:%M UTC") if fields.timestamp else None,
+                    status=status,
+                    history=[[s.value, status_color_map[s.value]] for s in fields.history.statuses()]
+                    if fields.history
+                    else None,
+                    url=fields.human_url,
+                    num_children=len(job_struct["children"]),
+                )
+            )
+        else:
+            if serials is None:
+                serials = tree.all_serials(job_data)
+            details.update(
+                dict(
+                    name=name,
+                    serial=sorted(serials[i]),
+                    status=job_struct.get("downstream_status", None),
+                )
+            )
+        job_status = job_data.get(name, JobData.UNDEFINED).status.value
+        downstream_status = job_struct.get("downstream_status")
         details.update(
             dict(
-                name=name,
-                serial=sorted(get_downstream_serials(job_struct, job_data)),
-                status=job_struct.get("downstream_status", None),
+                _color=[
+                    status_color_map[job_status or downstream_status],
+                    status_color_map[downstream_status if downstream_status else job_status],
+                ],
+                _uuid=job_struct["uuid"],
             )
         )
-    details.update(
-        dict(
-            _color=[
-                status_color_map[
-                    job_data.get(name, JobData.UNDEFINED).status.value or job_struct.get("downstream_status")],
-                status_color_map[job_struct.get("downstream_status") if job_struct.get("downstream_status") else job_data.get(name, JobData.UNDEFINED).status.value]
-            ],
-            _uuid=job_struct["uuid"],
-        )
-    )
-
-    for next_name in job_struct["children"]:
-        children = add_jobs_to_table(
-            name=next_name,
-            job_struct=job_struct["children"][next_name],
-            job_data=job_data,
-            indent=indent + 1,
-        )
-        details["_children"] += children
+        rows.append(details)
+        if (parent := tree.parents[i]) >= 0:
+            rows[parent]["_children"].append(details)
 
-    if not details["_children"]:
-        details["_children"] = None
+    for details in rows:
+        if not details["_children"]:
+            details["_children"] = None
 
-    return [details]
+    return rows
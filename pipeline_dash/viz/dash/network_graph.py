@@ -7,8 +7,9 @@ import networkx  # type: ignore
 import networkx as nx
 from typing_extensions import NotRequired
 
-from pipeline_dash.job_data import JobData, JobDataDict
-from pipeline_dash.pipeline_utils import get_downstream_serials, PipelineDict
+from pipeline_dash.job_data import BuildHistory, JobData, JobDataDict, JobStatus
+from pipeline_dash.pipeline_tree import pipeline_tree, PipelineTree
+from pipeline_dash.pipeline_utils import PipelineDict
 
 
 class NodeCustomData(TypedDict):
@@ -19,15 +20,33 @@ class NodeCustomData(TypedDict):
     status: str
     url: str | None
     label: NotRequired[str]
+    history: str
     uuid: str
     # downstream_serials: tuple[str, ...]
 
 
+HISTORY_GLYPHS = {
+    JobStatus.SUCCESS: "✓",
+    JobStatus.FAILURE: "✗",
+    JobStatus.UNSTABLE: "!",
+    JobStatus.ABORTED: "-",
+    JobStatus.IN_PROGRESS: "…",
+}
+
+
+def history_text(history: Optional[BuildHistory]) -> str:
+    """Hover text line of the results of the most recent builds, oldest first, empty without history"""
+    if not history:
+        return ""
+    return "<br>" + "".join(HISTORY_GLYPHS.get(status, "?") for status in history.statuses())
+
+
 def generate_nx(job_tree: PipelineDict, job_data: JobDataDict) -> networkx.DiGraph:
     def generate_custom_data(
         d: PipelineDict,
         job_data: JobDataDict,
         depth: int,
+        downstream_serials: set[str],
     ) -> NodeCustomData:
         name = d["name"]
         if name in job_data:
@@ -41,8 +60,9 @@ def generate_nx(job_tree: PipelineDict, job_data: JobDataDict) -> networkx.DiGra
             "status": status,
             "downstream_status": d["downstream_status"],
             "url": job_data[name].human_url or job_data[name].url if name in job_data else None,
-            "serial": job_data.get(name, JobData.UNDEFINED).serial or sorted(get_downstream_serials(d, job_data)),
+            "serial": job_data.get(name, JobData.UNDEFINED).serial or sorted(downstream_serials),
             "name": name,
+            "history": history_text(job_data[name].history if name in job_data else None),
             "uuid": d["uuid"],
             # "downstream_serials": tuple(get_downstream_serials(d)),
         }
@@ -51,40 +71,28 @@ def generate_nx(job_tree: PipelineDict, job_data: JobDataDict) -> networkx.DiGra
 
         return custom_data
 
-    def get_nodes(d: PipelineDict, parent="", depth=0) -> Tuple[dict, List[Tuple[str, str]]]:
+    def get_nodes(tree: PipelineTree) -> Tuple[dict, List[Tuple[str, str]]]:
         _nodes = dict()
         _edges = []
-        if parent == "" and not d["name"]:
-            for name, data in d["children"].items():
-                new_nodes, new_edges = get_nodes(data, "", 0)
-                _nodes.update(new_nodes)
-                _edges += new_edges
-        else:
-            if parent == "" and d["name"]:
-                id = d["name"]
-                custom_data = generate_custom_data(d, job_data, depth)
-                _nodes[id] = custom_data
-                parent = id
-                depth = 1
-            for name, data in d["children"].items():
-                id = f"{parent}.{name}"
-                if name in job_data:
-                    status = data["status"]
-                else:
-                    status = data["downstream_status"]
-                if status is None:
-                    status = "In Progress"
-                custom_data = generate_custom_data(data, job_data, depth)
-                _nodes[id] = custom_data
-                if parent:
-                    _edges += [(parent, id)]
-                new_nodes, new_edges = get_nodes(data, id, depth + 1)
-                _nodes.update(new_nodes)
-                _edges += new_edges
+        serials = tree.all_serials(job_data)
+        # the children of a root without a name are shown as separate pipelines
+        first = 0 if tree.nodes[0]["name"] else 1
+        ids = [""] * len(tree)
+        for i in range(first, len(tree)):
+            name = tree.name(i)
+            parent = tree.parents[i]
+            depth = tree.depths[i] - first
+            if depth == 0:
+                id = name
+            else:
+                id = f"{ids[parent]}.{name}"
+                _edges.append((ids[parent], id))
+            ids[i] = id
+            _nodes[id] = generate_custom_data(tree.nodes[i], job_data, depth, serials[i])
         return _nodes, _edges
 
     start_time = time.process_time()
-    nodes, edges = get_nodes(job_tree)
+    nodes, edges = get_nodes(pipeline_tree(job_tree))
     graph = nx.DiGraph()
     graph.add_edges_from(edges)
     for n, v in nodes.items():
@@ -1,3 +1,4 @@
+import hmac
 import json
 import time
 import uuid
@@ -14,12 +15,13 @@ import plotly  # type: ignore
 from dash import ALL, dcc, html, Input, Output, State  # type: ignore
 from dash.exceptions import PreventUpdate  # type: ignore
 from dash_extensions import enrich as de  # type: ignore
+import flask
 from flask import Flask
 from plotly import graph_objects as go  # type: ignore
 
 import pipeline_dash.viz.dash.components.jobs_pipeline_fig
 from pipeline_dash.job_data import JobData, JobDataDict
-from pipeline_dash.pipeline_utils import find_pipeline, PipelineDict, translate_uuid
+from pipeline_dash.pipeline_utils import find_pipeline_by_uuid, PipelineDict
 from . import components, network_graph
 from .cache import cache
 from .components.job_pane import JobPane
@@ -38,13 +40,50 @@ class Ids:
     stores = StoreIds
 
 
+NOTIFICATION_ROUTE = "/api/jenkins/notification"
+NOTIFICATION_TOKEN_HEADER = "X-Pipeline-Dash-Token"
+
+
+def add_notification_route(flask_app: Flask, notification_fn: Callable[[dict], list[str]], token: str) -> None:
+    """
+    Serve Jenkins notifications at `NOTIFICATION_ROUTE`. Every request has to carry `token`, in the "token" query
+    parameter (the Notification plugin only lets you set the URL) or the `NOTIFICATION_TOKEN_HEADER` header.
+    :param notification_fn: Called with the payload of every accepted notification, returns the updated job configs
+    :param token: Shared secret of the dashboard and Jenkins
+    """
+    if not token:
+        raise ValueError("A token is required to accept Jenkins notifications")
+
+    @flask_app.route(NOTIFICATION_ROUTE, methods=["POST"])
+    def jenkins_notification():
+        sent = flask.request.args.get("token") or flask.request.headers.get(NOTIFICATION_TOKEN_HEADER) or ""
+        if not hmac.compare_digest(sent.encode(), token.encode()):
+            return flask.jsonify(error="Missing or invalid token"), 401
+        payload = flask.request.get_json(force=True, silent=True)
+        if not isinstance(payload, dict):
+            return flask.jsonify(error="Expected a JSON object"), 400
+        return flask.jsonify(updated=notification_fn(payload))
+
+
 @dataclass
 class Config:
     job_configs: list[str]
     debug: bool = False
 
 
-def display_dash(get_job_data_fn: Callable[[str], tuple[PipelineDict, JobDataDict]], config: Config):
+def display_dash(
+    get_job_data_fn: Callable[..., tuple[PipelineDict, JobDataDict]],
+    config: Config,
+    notification_fn: Optional[Callable[[dict], list[str]]] = None,
+    notification_token: Optional[str] = None,
+):
+    """
+    :param get_job_data_fn: Returns the pipeline and job data of a job config
+    :param config: Dashboard settings
+    :param notification_fn: Called with the payload of every Jenkins notification posted to `NOTIFICATION_ROUTE`,
+    returns the names of the updated job configs. The route is only served if this is set.
+    :param notification_token: Token every notification has to carry, see `add_notification_route`
+    """
     background_callback_manager = dash.DiskcacheManager(cache)
     pipeline_dict, job_data = get_job_data_fn(config.job_configs[0])
     cache["pipeline_dict"] = pipeline_dict
@@ -62,6 +101,9 @@ def display_dash(get_job_data_fn: Callable[[str], tuple[PipelineDict, JobDataDic
     # toolbar = flask_debugtoolbar.DebugToolbarExtension(flask_app)
     session_id = str(uuid.uuid4())
 
+    if notification_fn is not None:
+        add_notification_route(flask_app, notification_fn, notification_token or "")
+
     app = de.DashProxy(
         __name__,
         server=flask_app,
@@ -81,13 +123,14 @@ def display_dash(get_job_data_fn: Callable[[str], tuple[PipelineDict, JobDataDic
     dash_bootstrap_templates.load_figure_template("darkly")
 
     @logged_callback
-    def callback_refresh(job_config_name, figure_root, session_id) -> tuple[go.Figure, list[dict], str, str]:
-        _pipeline_dict = cache["pipeline_dict"]
+    def callback_refresh(
+        job_config_name, figure_root, session_id, fetch: bool = False
+    ) -> tuple[go.Figure, list[dict], str, str]:
         # TODO: don't regen the world just to refresh some data from Jenkins
         print(f"CALLBACK {job_config_name} {figure_root}")
-        pipeline_dict_new, job_data_new = get_job_data_fn(job_config_name)
-        if rv := translate_uuid(figure_root, _pipeline_dict, pipeline_dict_new):
-            figure_root, sub_dict = rv
+        pipeline_dict_new, job_data_new = get_job_data_fn(job_config_name, fetch=fetch)
+        # node uuids are derived from their path, so the figure root is the same node in the new pipeline
+        if figure_root and (sub_dict := find_pipeline_by_uuid(pipeline_dict_new, figure_root)):
             print(f"Sub dict found: True")
         else:
             sub_dict = pipeline_dict_new
@@ -123,7 +166,7 @@ def display_dash(get_job_data_fn: Callable[[str], tuple[PipelineDict, JobDataDic
             refresh_data=get_job_data_fn,
             callback_manager=background_callback_manager,
         ),
-        config=components.LeftPane.Config(job_configs=config.job_configs),
+        config=components.LeftPane.Config(job_configs=config.job_configs, live_updates=notification_fn is not None),
     )
 
     layout_graph, fig = components.graph_col.generate(app, graph, session_id)
@@ -202,7 +245,7 @@ def display_dash(get_job_data_fn: Callable[[str], tuple[PipelineDict, JobDataDic
         if uuid is None:
             raise PreventUpdate
         _pipeline_dict = cache["pipeline_dict"]
-        sub_dict = find_pipeline(_pipeline_dict, lambda _, p: p.get("uuid", "") == uuid)
+        sub_dict = find_pipeline_by_uuid(_pipeline_dict, uuid)
         if sub_dict is None:
             raise PreventUpdate()
         job_name = sub_dict["name"]
@@ -300,7 +343,7 @@ def display_dash(get_job_data_fn: Callable[[str], tuple[PipelineDict, JobDataDic
             raise PreventUpdate()
         start_time = time.process_time()
         _pipeline_dict = cache["pipeline_dict"]
-        sub_dict = find_pipeline(_pipeline_dict, lambda _, p: p.get("uuid", "") == figure_root)
+        sub_dict = find_pipeline_by_uuid(_pipeline_dict, figure_root)
         nonlocal fig
         if sub_dict is None:
             print(f"Callback(cb_handle_new_figure_root): sub_dict for {figure_root} not found")
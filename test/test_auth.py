@@ -0,0 +1,101 @@
+import asyncio
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from pipeline_dash.importer.auth import find_form, LoginError, needs_login, SsoAuthenticator
+from pipeline_dash.importer.jenkins import JenkinsImporter
+
+USER = {"email": "user@example.com", "password": "secret"}
+
+
+class TestLoginPage(TestCase):
+    def test_find_form(self):
+        html = """<form id="other"><input name="a" value="1"></form>
+        <form id="login-form" action="/+login"><input name="csrfmiddlewaretoken" value="t"><input name="email"></form>"""
+        form = find_form(html, "login-form")
+        self.assertEqual("/+login", form.action)
+        self.assertEqual({"csrfmiddlewaretoken": "t", "email": ""}, form.inputs)
+        with self.assertRaises(LoginError):
+            find_form(html, "openid_message")
+
+    def test_needs_login(self):
+        url = "https://jenkins/job/a/api/json"
+        self.assertFalse(needs_login(url, 200, url))
+        self.assertTrue(needs_login(url, 401, url))
+        self.assertTrue(needs_login(url, 200, "https://jenkins/login?from=%2Fjob%2Fa%2Fapi%2Fjson"))
+        self.assertTrue(needs_login(url, 200, "https://login.ubuntu.com/+openid"))
+
+    def test_needs_login_encoded(self):
+        # the response URL has the path percent-encoded
+        for job, encoded in (("My Job", "My%20Job"), ("Bäckerei", "B%C3%A4ckerei")):
+            with self.subTest(job=job):
+                url = f"https://jenkins/job/{job}/api/json?tree=name"
+                self.assertFalse(needs_login(url, 200, f"https://jenkins/job/{encoded}/api/json?tree=name"))
+                self.assertTrue(needs_login(url, 200, f"https://jenkins/login?from=%2Fjob%2F{encoded}%2Fapi%2Fjson"))
+
+
+class TestSsoAuthenticator(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.logins = 0
+
+        async def api(request: web.Request) -> web.Response:
+            if request.cookies.get("session") != "valid":
+                raise web.HTTPFound("/securityRealm/commenceLogin")
+            return web.json_response({"name": request.match_info["name"]})
+
+        async def commence_login(request: web.Request) -> web.Response:
+            return web.Response(text="<html>login</html>")
+
+        async def login(request: web.Request) -> web.Response:
+            await asyncio.sleep(0.05)
+            self.logins += 1
+            response = web.Response(text="<html>logged in</html>")
+            response.set_cookie("session", "valid")
+            return response
+
+        app = web.Application()
+        app.router.add_get("/job/{name}/api/json", api)
+        app.router.add_get("/securityRealm/commenceLogin", commence_login)
+        app.router.add_get("/login", login)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.addAsyncCleanup(self.server.close)
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.cookie_file = os.path.join(tmp_dir.name, "cookies")
+
+    def authenticator(self) -> SsoAuthenticator:
+        async def sso_login(session, url):
+            async with session.get(self.server.make_url("/login")):
+                pass
+
+        authenticator = SsoAuthenticator(USER, self.cookie_file)
+        authenticator._sso_login = sso_login
+        return authenticator
+
+    async def test_login_once(self):
+        importer = JenkinsImporter(authenticator=self.authenticator())
+        self.addAsyncCleanup(importer._close_session)
+        jobs = [str(self.server.make_url(f"/job/{n}")) for n in "abcde"]
+        data = await asyncio.gather(*(importer.api(j) for j in jobs))
+        self.assertEqual(list("abcde"), [d["name"] for d in data])
+        self.assertEqual(1, self.logins, "concurrent rejected requests did not share a login")
+        self.assertTrue(os.path.exists(self.cookie_file))
+
+        # a new importer reuses the saved cookies
+        importer = JenkinsImporter(authenticator=self.authenticator())
+        self.addAsyncCleanup(importer._close_session)
+        self.assertEqual({"name": "a"}, await importer.api(jobs[0]))
+        self.assertEqual(1, self.logins)
+
+    async def test_encoded_job_names(self):
+        importer = JenkinsImporter(authenticator=self.authenticator())
+        self.addAsyncCleanup(importer._close_session)
+        for name in ("My Job", "Bäckerei"):
+            job = f"http://{self.server.host}:{self.server.port}/job/{name}"
+            self.assertEqual({"name": name}, await importer.api(job))
+        self.assertEqual(1, self.logins, "logged in again for a job name that is percent-encoded in the response")
@@ -0,0 +1,103 @@
+import os
+import tempfile
+import threading
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+import diskcache  # type: ignore
+
+from pipeline_dash.history import JobHistory
+from pipeline_dash.importer.fetcher import BackgroundFetcher, SnapshotStore
+from pipeline_dash.importer.jenkins import JenkinsImporter
+from pipeline_dash.importer.packed import PackedSnapshot
+from pipeline_dash.job_data import JobData, JobStatus
+
+
+class TestSnapshotStore(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        cache = diskcache.Cache(tmp_dir.name)
+        self.addCleanup(cache.close)
+        self.store = SnapshotStore(cache)
+
+    def test_publish(self):
+        self.assertIsNone(self.store.latest("config"))
+        first = self.store.publish("config", {"a": JobData(name="a", status=JobStatus.SUCCESS)})
+        second = self.store.publish("config", {"a": JobData(name="a", status=JobStatus.FAILURE)})
+        self.assertGreater(second.version, first.version)
+        latest = self.store.latest("config")
+        self.assertEqual(second.version, latest.version)
+        self.assertEqual(JobStatus.FAILURE, latest.job_data["a"].status)
+        self.assertIsNone(self.store.latest("other"))
+
+
+class TestBackgroundFetcher(IsolatedAsyncioTestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.dir = tmp_dir.name
+        self.cache = diskcache.Cache(os.path.join(self.dir, "cache"))
+        self.addCleanup(self.cache.close)
+
+    async def test_refresh_saves_packed_snapshot(self):
+        path = os.path.join(self.dir, "snapshot.pack")
+        importer = JenkinsImporter(store_dir=path)
+        fetcher = BackgroundFetcher(importer, SnapshotStore(self.cache))
+        fetcher.add_config("config", {"a": "https://test-server"}, {})
+
+        async def collect_job_data(jobs, stats=None, previous=None, deadline=None):
+            importer.stored.add("response", {"name": "a"})
+            return {"a": JobData(name="a", status=JobStatus.SUCCESS)}
+
+        with patch.object(importer, "collect_job_data", side_effect=collect_job_data):
+            await fetcher.refresh("config")
+        await fetcher._saving
+        with PackedSnapshot(path) as snapshot:
+            self.assertEqual({"name": "a"}, snapshot.get("response"))
+        self.assertFalse(importer.stored.dirty)
+
+    async def test_store_written_off_loop(self):
+        store = SnapshotStore(self.cache)
+        importer = JenkinsImporter()
+        fetcher = BackgroundFetcher(importer, store)
+        self.addCleanup(fetcher.stop)
+        fetcher.add_config("config", {"a": "https://test-server"}, {})
+        threads: list[threading.Thread] = []
+        publish = store.publish
+
+        def record_thread(*args):
+            threads.append(threading.current_thread())
+            return publish(*args)
+
+        async def collect_job_data(jobs, stats=None, previous=None, deadline=None):
+            return {"a": JobData(name="a", status=JobStatus.SUCCESS)}
+
+        with (
+            patch.object(store, "publish", side_effect=record_thread),
+            patch.object(importer, "collect_job_data", side_effect=collect_job_data),
+        ):
+            snapshot = await fetcher.refresh("config")
+        self.assertEqual(1, len(threads))
+        self.assertIsNot(threading.current_thread(), threads[0], "snapshot published on the event loop")
+        self.assertEqual(snapshot.version, store.latest("config").version)
+        self.assertEqual({"a"}, store.latest("config").changed)
+
+    async def test_history_ingested_off_loop(self):
+        history = JobHistory(os.path.join(self.dir, "history.db"))
+        self.addCleanup(history.close)
+        fetcher = BackgroundFetcher(JenkinsImporter(), SnapshotStore(self.cache), history=history)
+        threads: list[threading.Thread] = []
+        ingest = history.ingest
+
+        def record_thread(job_data):
+            threads.append(threading.current_thread())
+            return ingest(job_data)
+
+        build = JobData(name="a", status=JobStatus.SUCCESS, build_num="3", duration=1.5, server="https://test-server")
+        with patch.object(history, "ingest", side_effect=record_thread):
+            fetcher.add_config("config", {"a": "https://test-server"}, {"a": build})
+            fetcher.stop()
+        self.assertEqual(1, len(threads))
+        self.assertIsNot(threading.current_thread(), threads[0], "SQLite written on the event loop")
+        self.assertEqual([1.5], history.durations("https://test-server", "a"))
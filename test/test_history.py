@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+from unittest import TestCase
+
+from pipeline_dash.history import HISTORY_SCHEMA_VERSION, JobHistory
+from pipeline_dash.job_data import JobData, JobStatus
+
+SERVER = "https://test-server"
+
+
+def job(build_num: str, status: JobStatus = JobStatus.SUCCESS, **kwargs) -> JobData:
+    return JobData(name="a", status=status, build_num=build_num, server=SERVER, **kwargs)
+
+
+class TestJobHistory(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.history = JobHistory(os.path.join(tmp_dir.name, "history.db"))
+        self.addCleanup(self.history.close)
+
+    def test_ingest(self):
+        timestamp = datetime(2023, 1, 2, 3, 4, 5)
+        self.assertEqual(1, self.history.ingest({"a": job("1", timestamp=timestamp, duration=12.5, serial="7")}))
+        self.assertEqual(0, self.history.ingest({"a": job("1", JobStatus.FAILURE)}), "stored build was updated")
+        self.assertEqual(0, self.history.ingest({"a": job("2", JobStatus.UNDEFINED)}))
+        self.assertEqual(0, self.history.ingest({"a": job("2", JobStatus.FAILURE, stale=True)}))
+        self.assertEqual(1, self.history.ingest({"a": job("2", JobStatus.FAILURE)}))
+        self.assertEqual(0, self.history.ingest({"b": JobData(name="b", status=JobStatus.NOT_RUN, server=SERVER)}))
+
+        builds = self.history.last_builds(SERVER, "a")
+        self.assertEqual([2, 1], [b.build_num for b in builds])
+        self.assertEqual(timestamp, builds[1].timestamp)
+        self.assertEqual([JobStatus.FAILURE, JobStatus.SUCCESS], self.history.last_results(SERVER, "a"))
+        self.assertEqual([None, 12.5], self.history.durations(SERVER, "a"))
+        self.assertEqual([None, "7"], self.history.serials(SERVER, "a"))
+
+    def test_last_n(self):
+        for build_num in range(1, 21):
+            self.history.ingest({"a": job(str(build_num))})
+        self.assertEqual([20, 19, 18], [b.build_num for b in self.history.last_builds(SERVER, "a", 3)])
+        self.assertEqual([], self.history.last_builds("https://other-server", "a"))
+
+    def test_non_numeric_build_id(self):
+        self.assertEqual(1, self.history.ingest({"a": job("2023-01-02_03-04-05"), "b": job("3")}))
+        self.assertEqual([], self.history.last_builds(SERVER, "a"))
+        self.assertEqual([3], [b.build_num for b in self.history.last_builds(SERVER, "b")])
+
+    def test_schema_version(self):
+        self.history.ingest({"a": job("1")})
+        self.history.close()
+        self.assertEqual([1], [b.build_num for b in JobHistory(self.history.path).last_builds(SERVER, "a")])
+        con = sqlite3.connect(self.history.path)
+        with con:
+            con.execute(f"PRAGMA user_version = {HISTORY_SCHEMA_VERSION + 1}")
+        con.close()
+        with self.assertLogs("pipeline_dash.history", "WARNING"):
+            history = JobHistory(self.history.path)
+        self.addCleanup(history.close)
+        self.assertEqual([], history.last_builds(SERVER, "a"))
+        history.ingest({"a": job("2")})
+        self.assertEqual([2], [b.build_num for b in history.last_builds(SERVER, "a")])
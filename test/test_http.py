@@ -0,0 +1,99 @@
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from pipeline_dash.importer.http import ConnectionStats, create_session, PoolConfig, ValidatorCache
+from pipeline_dash.importer.jenkins import JenkinsImporter
+
+
+class TestValidatorCache(TestCase):
+    def test_validators(self):
+        cache = ValidatorCache()
+        self.assertEqual({}, cache.request_headers("key"))
+        cache.store("key", '"1"', "Mon, 01 Jan 2024 00:00:00 GMT", '{"id": "1"}')
+        self.assertEqual(
+            {"If-None-Match": '"1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}, cache.request_headers("key")
+        )
+        # without validators the response cannot be revalidated
+        cache.store("key", None, None, '{"id": "2"}')
+        self.assertEqual({}, cache.request_headers("key"))
+        self.assertIsNone(cache.not_modified("key"))
+
+    def test_not_modified_copy(self):
+        cache = ValidatorCache()
+        cache.store("key", '"1"', None, '{"id": "1", "actions": []}')
+        data = cache.not_modified("key")
+        data["actions"].append("changed")
+        self.assertEqual({"id": "1", "actions": []}, cache.not_modified("key"))
+        self.assertEqual((2, 1), (cache.hits, cache.misses))
+
+    def test_max_entries(self):
+        cache = ValidatorCache(max_entries=2)
+        for key in "abc":
+            cache.store(key, '"1"', None, "{}")
+        self.assertEqual({}, cache.request_headers("a"))
+        self.assertEqual({"If-None-Match": '"1"'}, cache.request_headers("c"))
+
+
+class TestConditionalRequests(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.requests: list[dict[str, str]] = []
+
+        async def handler(request: web.Request) -> web.Response:
+            self.requests.append(dict(request.headers))
+            if request.headers.get("If-None-Match") == '"7"':
+                return web.Response(status=304)
+            return web.json_response(
+                {"id": "7", "result": "SUCCESS"},
+                headers={"ETag": '"7"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"},
+            )
+
+        app = web.Application()
+        app.router.add_get("/job/a/7/api/json", handler)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.addAsyncCleanup(self.server.close)
+        self.importer = JenkinsImporter()
+        self.addAsyncCleanup(self.importer._close_session)
+        self.url = str(self.server.make_url("/job/a/7"))
+
+    async def test_not_modified_round_trip(self):
+        first = await self.importer.api(self.url)
+        first["result"] = "changed by caller"
+        second = await self.importer.api(self.url)
+        self.assertEqual({"id": "7", "result": "SUCCESS"}, second)
+        self.assertNotIn("If-None-Match", self.requests[0])
+        self.assertEqual('"7"', self.requests[1]["If-None-Match"])
+        self.assertEqual("Mon, 01 Jan 2024 00:00:00 GMT", self.requests[1]["If-Modified-Since"])
+        self.assertEqual((1, 1), (self.importer.validators.hits, self.importer.validators.misses))
+
+
+class TestPooledSession(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        async def handler(request: web.Request) -> web.Response:
+            return web.json_response({"name": request.match_info["name"]})
+
+        app = web.Application()
+        app.router.add_get("/job/{name}/api/json", handler)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.addAsyncCleanup(self.server.close)
+
+    async def test_connection_stats(self):
+        stats = ConnectionStats()
+        async with create_session(PoolConfig(), stats) as session:
+            for name in "ab":
+                async with session.get(self.server.make_url(f"/job/{name}/api/json")) as r:
+                    await r.read()
+        self.assertEqual(ConnectionStats(requests=2, connections_created=1, connections_reused=1), stats)
+
+    async def test_session_reused(self):
+        importer = JenkinsImporter()
+        self.addAsyncCleanup(importer._close_session)
+        await importer.api(str(self.server.make_url("/job/a")))
+        session = importer._session
+        await importer.api(str(self.server.make_url("/job/b")))
+        self.assertIs(session, importer._session)
+        self.assertEqual(1, importer.connection_stats.connections_created)
+        self.assertEqual(1, importer.connection_stats.connections_reused)
@@ -0,0 +1,390 @@
+import asyncio
+import os
+import pathlib
+import tempfile
+from dataclasses import replace
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+from pipeline_dash.history import JobHistory
+from pipeline_dash.importer.jenkins import (
+    BadRequestError,
+    BUILD_DURATION_TREE,
+    BUILD_TREE,
+    FetchMode,
+    FetchStats,
+    JenkinsImporter,
+    JOB_TREE,
+    recurse_downstream,
+    SNAPSHOT_TREE,
+)
+from pipeline_dash.importer.topology import TopologyCache
+from pipeline_dash.importer.resilience import CircuitOpenError
+from pipeline_dash.job_data import BuildHistory, JobData, JobStatus
+
+SERVER = "https://test-server"
+
+DOWNSTREAM = {
+    "root": ["a", "b"],
+    "a": ["c"],
+    "b": ["c", "d"],
+    "c": ["e"],
+    "d": [],
+    "e": [],
+}
+
+
+def job(name: str) -> JobData:
+    return JobData(
+        name=name,
+        status=JobStatus.SUCCESS,
+        server=SERVER,
+        downstream={d: SERVER for d in DOWNSTREAM[name]},
+    )
+
+
+def build(number: int, result: str = "SUCCESS", url: str = f"{SERVER}/job/a") -> dict:
+    return {
+        "id": str(number),
+        "result": result,
+        "timestamp": 0,
+        "url": f"{url}/{number}/",
+        "actions": [{"_class": "hudson.model.ParametersAction", "parameters": [{"name": "SERIAL", "value": "1.5"}]}],
+    }
+
+
+class TestSnapshotMode(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.importer = JenkinsImporter(fetch_mode=FetchMode.SNAPSHOT)
+        self.requested: list[str] = []
+        self.snapshot_response: object = {"name": "a", "lastBuild": build(7), "downstreamProjects": []}
+
+    async def api(self, url, tree="", depth=None):
+        self.requested.append(tree)
+        if tree == SNAPSHOT_TREE:
+            if isinstance(self.snapshot_response, Exception):
+                raise self.snapshot_response
+            return self.snapshot_response
+        if tree == JOB_TREE:
+            return {"name": "a", "lastBuild": {"url": f"{url}/7/"}, "downstreamProjects": [{"name": "b"}]}
+        if tree == BUILD_TREE:
+            return build(7, "FAILURE")
+        raise AssertionError(tree)
+
+    async def get_job_data(self) -> tuple[JobData, FetchStats]:
+        stats = FetchStats()
+        with patch.object(self.importer, "api", side_effect=self.api):
+            return await self.importer.get_job_data(SERVER, "a", stats=stats), stats
+
+    async def test_single_request(self):
+        data, stats = await self.get_job_data()
+        self.assertEqual([SNAPSHOT_TREE], self.requested)
+        self.assertEqual((JobStatus.SUCCESS, "7", "1.5"), (data.status, data.build_num, data.serial))
+        self.assertEqual(1, stats.round_trips_saved)
+        self.assertEqual(set(), self.importer.snapshot_rejected_servers)
+
+    async def test_bad_request_falls_back(self):
+        self.snapshot_response = BadRequestError(SERVER)
+        data, stats = await self.get_job_data()
+        self.assertEqual([SNAPSHOT_TREE, JOB_TREE, BUILD_TREE], self.requested)
+        self.assertEqual(JobStatus.FAILURE, data.status)
+        self.assertEqual({"b": SERVER}, data.downstream)
+        self.assertEqual({SERVER}, self.importer.snapshot_rejected_servers)
+        self.assertEqual(1, stats.snapshot_fallbacks)
+
+        # the server is only queried in two steps afterwards
+        self.requested.clear()
+        await self.get_job_data()
+        self.assertEqual([JOB_TREE, BUILD_TREE], self.requested)
+
+    async def test_projection_ignored_falls_back(self):
+        self.snapshot_response = {"name": "a", "lastBuild": {"url": f"{SERVER}/job/a/7/"}, "downstreamProjects": []}
+        data, _ = await self.get_job_data()
+        self.assertEqual([SNAPSHOT_TREE, JOB_TREE, BUILD_TREE], self.requested)
+        self.assertEqual(JobStatus.FAILURE, data.status)
+        self.assertEqual({SERVER}, self.importer.snapshot_rejected_servers)
+
+    async def test_failed_response_keeps_snapshot_mode(self):
+        # what `api` returns for a response that is not JSON, after retries
+        self.snapshot_response = {}
+        data, _ = await self.get_job_data()
+        self.assertIsNone(data)
+        self.assertEqual(set(), self.importer.snapshot_rejected_servers)
+
+
+class TestDuration(IsolatedAsyncioTestCase):
+    async def test_duration_stored(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        requested: list[str] = []
+
+        async def api(url, tree="", depth=None):
+            requested.append(tree)
+            if tree == JOB_TREE:
+                return {"name": "a", "lastBuild": {"url": f"{url}/7/"}, "downstreamProjects": []}
+            # Jenkins only returns the duration if it is requested
+            last_build = build(7) | ({"duration": 90000} if "duration" in tree else {})
+            if tree in (BUILD_TREE, BUILD_DURATION_TREE):
+                return last_build
+            return {"name": "a", "lastBuild": last_build, "downstreamProjects": []}
+
+        for fetch_mode in (FetchMode.TWO_STEP, FetchMode.SNAPSHOT):
+            for build_duration in (False, True):
+                with self.subTest(fetch_mode=fetch_mode, build_duration=build_duration):
+                    requested.clear()
+                    importer = JenkinsImporter(fetch_mode=fetch_mode, build_duration=build_duration)
+                    with patch.object(importer, "api", side_effect=api):
+                        data = await importer.get_job_data(SERVER, "a")
+                    history = JobHistory(os.path.join(tmp_dir.name, f"{fetch_mode.value}-{build_duration}.db"))
+                    self.addCleanup(history.close)
+                    history.ingest({data.name: data})
+                    self.assertEqual([90.0 if build_duration else None], history.durations(SERVER, data.name))
+                    # without the duration, the request URLs and with them the keys of --store / --load are unchanged
+                    old_trees = (JOB_TREE, BUILD_TREE, SNAPSHOT_TREE)
+                    self.assertEqual(build_duration, any(tree not in old_trees for tree in requested))
+
+
+class TestBulkMode(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.importer = JenkinsImporter(fetch_mode=FetchMode.BULK)
+        self.requested: list[tuple[str, str]] = []
+        self.listing: object = {
+            "jobs": [
+                {"_class": "com.cloudbees.hudson.plugins.folder.Folder", "name": "sub"},
+                {"name": "a", "lastBuild": build(7), "downstreamProjects": []},
+                {"name": "b", "lastBuild": None, "downstreamProjects": []},
+            ]
+        }
+
+    async def api(self, url, tree="", depth=None):
+        self.requested.append((url, tree))
+        if tree.startswith("jobs["):
+            if isinstance(self.listing, Exception):
+                raise self.listing
+            return self.listing
+        if tree == SNAPSHOT_TREE:
+            return {"name": url.rpartition("/")[2], "lastBuild": build(3, "UNSTABLE", url), "downstreamProjects": []}
+        if tree == JOB_TREE:
+            return {"name": url.rpartition("/")[2], "lastBuild": {"url": f"{url}/3/"}, "downstreamProjects": []}
+        if tree == BUILD_TREE:
+            return build(3, "UNSTABLE", url)
+        raise AssertionError(tree)
+
+    async def collect(self, jobs: list[str]) -> dict:
+        with patch.object(self.importer, "api", side_effect=self.api):
+            return await self.importer.collect_job_data({job: SERVER for job in jobs})
+
+    async def test_listing(self):
+        data = await self.collect(["team/job/a", "team/job/b"])
+        self.assertEqual([f"{SERVER}/job/team"], [url for url, _ in self.requested])
+        self.assertEqual(JobStatus.SUCCESS, data["team/job/a"].status)
+        self.assertEqual(JobStatus.NOT_RUN, data["team/job/b"].status)
+        self.assertEqual(set(), self.importer.snapshot_rejected_servers, "sub-folder taken for a rejected listing")
+
+    async def test_missing_job_fetched(self):
+        data = await self.collect(["team/job/a", "team/job/c"])
+        self.assertEqual((f"{SERVER}/job/team/job/c", SNAPSHOT_TREE), self.requested[-1])
+        self.assertEqual(JobStatus.UNSTABLE, data["team/job/c"].status)
+
+    async def test_rejected_listing_falls_back(self):
+        self.listing = BadRequestError(SERVER)
+        data = await self.collect(["team/job/a", "team/job/b"])
+        self.assertEqual({SERVER}, self.importer.snapshot_rejected_servers)
+        self.assertEqual({JobStatus.UNSTABLE}, {d.status for d in data.values()})
+        self.assertEqual(1 + 2 * 2, len(self.requested), "listing, then two requests per job")
+
+    async def test_probe_skips_sub_folders(self):
+        self.listing = {
+            "jobs": [
+                {"_class": "com.cloudbees.hudson.plugins.folder.Folder", "name": "sub"},
+                {"name": "a", "lastBuild": {"number": 7}},
+                {"name": "b", "lastBuild": None},
+            ]
+        }
+        with patch.object(self.importer, "api", side_effect=self.api):
+            found = await self.importer.probe_folder(SERVER, "team", ["team/job/a", "team/job/b", "team/job/sub"])
+        self.assertEqual({"team/job/a": "7", "team/job/b": None}, found)
+        self.assertEqual(set(), self.importer.snapshot_rejected_servers, "sub-folder taken for a rejected listing")
+
+
+class TestDiscoverDownstream(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.importer = JenkinsImporter()
+        self.fetched: list[str] = []
+
+        async def get_job_data(server, name, fetch_mode=None, stats=None):
+            self.fetched.append(name)
+            return job(name)
+
+        patcher = patch.object(self.importer, "get_job_data", side_effect=get_job_data)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_discover_all(self):
+        discovered = await self.importer.discover_downstream({"root": job("root")})
+        self.assertEqual({"a", "b", "c", "d", "e"}, set(discovered))
+        self.assertEqual(sorted(self.fetched), sorted(set(self.fetched)), "jobs fetched more than once")
+
+    async def test_discover_max_depth(self):
+        discovered = await self.importer.discover_downstream({"root": job("root")}, max_depth=2)
+        self.assertEqual({"a", "b", "c", "d"}, set(discovered))
+
+    async def test_discover_known(self):
+        discovered = await self.importer.discover_downstream({"root": job("root")}, known={"b": job("b")})
+        self.assertEqual({"a", "b", "c", "d", "e"}, set(discovered))
+        self.assertNotIn("b", self.fetched)
+
+
+class TestRecurseDownstream(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.cache_file = pathlib.Path(tmp_dir.name) / "topology.pickle"
+        TopologyCache.from_job_data({name: job(name) for name in DOWNSTREAM}).save(self.cache_file)
+        self.importer = JenkinsImporter()
+
+    def test_stale_prefetched_job_discovered_again(self):
+        async def collect_job_data(pipeline_jobs, stats=None, previous=None, deadline=None):
+            # c could not be fetched in time
+            data = {name: job(name) for name in pipeline_jobs}
+            data["c"] = JobData(name="c", status=JobStatus.UNDEFINED, server=SERVER, stale=True)
+            return data
+
+        async def get_job_data(server, name, fetch_mode=None, stats=None):
+            return job(name)
+
+        job_data = {"root": job("root")}
+        with (
+            patch.object(self.importer, "collect_job_data", side_effect=collect_job_data),
+            patch.object(self.importer, "get_job_data", side_effect=get_job_data) as fetched,
+        ):
+            recurse_downstream(job_data, self.importer, self.cache_file)
+        self.assertEqual(["c"], [c.args[1] for c in fetched.call_args_list])
+        self.assertEqual(set(DOWNSTREAM), set(job_data))
+        self.assertFalse(job_data["c"].stale)
+        self.assertEqual({"e": SERVER}, TopologyCache.load(self.cache_file).jobs["c"].downstream)
+
+
+class TestCollectJobData(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.importer = JenkinsImporter()
+
+        async def get_job_data(server, name, fetch_mode=None, stats=None):
+            if name == "slow":
+                await asyncio.sleep(10)
+            if name == "down":
+                raise CircuitOpenError(server)
+            return job(name)
+
+        patcher = patch.object(self.importer, "get_job_data", side_effect=get_job_data)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_deadline_keeps_previous(self):
+        previous = {"slow": job("d"), "down": job("e")}
+        data = await self.importer.collect_job_data(
+            {"a": SERVER, "slow": SERVER, "down": SERVER}, previous=previous, deadline=0.1
+        )
+        self.assertFalse(data["a"].stale)
+        self.assertTrue(data["slow"].stale)
+        self.assertEqual("d", data["slow"].name)
+        self.assertTrue(data["down"].stale)
+        self.assertFalse(previous["slow"].stale, "previous job data modified")
+
+    async def test_no_previous(self):
+        data = await self.importer.collect_job_data({"slow": SERVER}, deadline=0.1)
+        self.assertTrue(data["slow"].stale)
+        self.assertEqual(JobStatus.UNDEFINED, data["slow"].status)
+
+
+class TestDeadline(IsolatedAsyncioTestCase):
+    async def test_deadline_cancels_request(self):
+        importer = JenkinsImporter()
+        cancelled: list[str] = []
+
+        async def slow_fetch(session, url, api_url, file_name):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(url)
+                raise
+
+        with patch.object(importer, "_fetch", side_effect=slow_fetch):
+            data = await importer.collect_job_data({"slow": SERVER}, deadline=0.1)
+            self.addAsyncCleanup(importer._close_session)
+        self.assertTrue(data["slow"].stale)
+        self.assertEqual([f"{SERVER}/job/slow"], cancelled, "request kept running after the deadline")
+        self.assertFalse(importer.api_flight.in_flight(f"{SERVER}/job/slow/api/json?tree={SNAPSHOT_TREE}"))
+
+
+class TestRefreshJobData(IsolatedAsyncioTestCase):
+    async def test_only_changed_fetched(self):
+        importer = JenkinsImporter()
+        previous = {
+            "a": JobData(name="a", status=JobStatus.SUCCESS, build_num="1", server=SERVER),
+            "b": JobData(name="b", status=JobStatus.IN_PROGRESS, build_num="2", server=SERVER),
+            "c": JobData(name="c", status=JobStatus.SUCCESS, build_num="3", server=SERVER),
+            "d": JobData(name="d", status=JobStatus.NOT_RUN, server=SERVER),
+        }
+        fetched: list[str] = []
+
+        async def probe_folder(server, folder, jobs, stats=None):
+            return {"a": "1", "b": "2", "c": "4", "d": None}
+
+        async def get_job_data(server, name, fetch_mode=None, stats=None):
+            fetched.append(name)
+            return JobData(name=name, status=JobStatus.SUCCESS, server=server)
+
+        with patch.object(importer, "probe_folder", side_effect=probe_folder), patch.object(
+            importer, "get_job_data", side_effect=get_job_data
+        ):
+            data = await importer.refresh_job_data({name: SERVER for name in previous}, previous)
+        self.assertEqual(["b", "c"], sorted(fetched))
+        self.assertIs(previous["a"], data["a"])
+        self.assertIs(previous["d"], data["d"])
+
+
+class TestCollectSharedJobData(IsolatedAsyncioTestCase):
+    async def test_shared_jobs_fetched_once(self):
+        importer = JenkinsImporter()
+        fetched: list[str] = []
+
+        async def get_job_data(server, name, fetch_mode=None, stats=None):
+            fetched.append(name)
+            return replace(job(name), history=BuildHistory(2))
+
+        with patch.object(importer, "get_job_data", side_effect=get_job_data):
+            data = await importer.collect_shared_job_data(
+                {"one": {"a": SERVER, "b": SERVER}, "two": {"b": SERVER, "c": SERVER}}
+            )
+        self.assertEqual(["a", "b", "c"], sorted(fetched))
+        self.assertEqual({"a", "b"}, set(data["one"]))
+        self.assertEqual({"b", "c"}, set(data["two"]))
+        self.assertEqual(data["one"]["b"], data["two"]["b"])
+        self.assertIsNot(data["one"]["b"], data["two"]["b"])
+        self.assertIsNot(data["one"]["b"].downstream, data["two"]["b"].downstream, "configs share the downstream dict")
+        self.assertIsNot(data["one"]["b"].history, data["two"]["b"].history)
+
+
+class TestBuildHistory(IsolatedAsyncioTestCase):
+    async def test_history_in_snapshot_request(self):
+        importer = JenkinsImporter(fetch_mode=FetchMode.SNAPSHOT, build_history=3)
+        requested: list[str] = []
+
+        async def api(url, tree="", depth=None):
+            requested.append(tree)
+            return {
+                "name": "a",
+                "lastBuild": {"id": "7", "result": "FAILURE", "timestamp": 0, "url": f"{url}/7/", "actions": []},
+                "downstreamProjects": [],
+                "builds": [
+                    {"number": 7, "result": "FAILURE", "timestamp": 0, "duration": 2000},
+                    {"number": 6, "result": "SUCCESS", "timestamp": 0, "duration": 1000},
+                ],
+            }
+
+        with patch.object(importer, "api", side_effect=api):
+            data = await importer.get_job_data(SERVER, "a")
+        self.assertEqual([f"{SNAPSHOT_TREE},builds[number,result,timestamp,duration]{{0,3}}"], requested)
+        self.assertEqual([JobStatus.SUCCESS, JobStatus.FAILURE], data.history.statuses())
+        self.assertEqual(2.0, data.duration)
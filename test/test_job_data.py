@@ -0,0 +1,30 @@
+import pickle
+from datetime import datetime
+from unittest import TestCase
+
+from pipeline_dash.job_data import BuildHistory, BuildSummary, JobStatus
+
+
+class TestBuildHistory(TestCase):
+    def test_ring_buffer(self):
+        history = BuildHistory(3)
+        self.assertEqual([], list(history))
+        for number in range(1, 6):
+            history.append(BuildSummary(number, JobStatus.SUCCESS if number % 2 else JobStatus.FAILURE))
+        self.assertEqual(3, len(history))
+        self.assertEqual([3, 4, 5], [b.number for b in history])
+        self.assertEqual([JobStatus.SUCCESS, JobStatus.FAILURE, JobStatus.SUCCESS], history.statuses())
+
+    def test_from_builds(self):
+        history = BuildHistory.from_builds(
+            [
+                {"number": 3, "result": None, "timestamp": 1672628645000, "duration": 0},
+                {"number": 2, "result": "UNSTABLE", "timestamp": 1672628645000, "duration": 1500},
+            ],
+            capacity=5,
+        )
+        self.assertEqual(5, history.capacity)
+        older, newer = list(history)
+        self.assertEqual(BuildSummary(2, JobStatus.UNSTABLE, datetime(2023, 1, 2, 3, 4, 5), 1.5), older)
+        self.assertEqual(BuildSummary(3, JobStatus.IN_PROGRESS, datetime(2023, 1, 2, 3, 4, 5), None), newer)
+        self.assertEqual(history, pickle.loads(pickle.dumps(history)))
@@ -0,0 +1,39 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from pipeline_dash.importer.limiter import LimiterConfig, ServerLimiter, ThrottledError
+
+
+class TestServerLimiter(IsolatedAsyncioTestCase):
+    async def test_max_in_flight(self):
+        limiter = ServerLimiter("test", LimiterConfig(max_in_flight=3))
+        peak = 0
+
+        async def request():
+            nonlocal peak
+            async with limiter.request():
+                peak = max(peak, limiter.in_flight)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(request() for _ in range(10)))
+        self.assertEqual(3, peak)
+        self.assertEqual(0, limiter.in_flight)
+        self.assertEqual(0, limiter.queued)
+
+    async def test_throttled_halves_limit(self):
+        limiter = ServerLimiter("test", LimiterConfig(max_in_flight=8))
+        with self.assertRaises(ThrottledError):
+            async with limiter.request():
+                raise ThrottledError()
+        stats = limiter.stats()
+        self.assertEqual(4, stats.limit)
+        self.assertEqual(1, stats.throttled)
+        self.assertEqual(0, stats.in_flight)
+
+    async def test_limit_recovers(self):
+        limiter = ServerLimiter("test", LimiterConfig(max_in_flight=4, min_in_flight=1, latency_tolerance=float("inf")))
+        limiter.limit = 1.0
+        for _ in range(20):
+            async with limiter.request():
+                pass
+        self.assertEqual(4, limiter.stats().limit)
@@ -0,0 +1,64 @@
+import asyncio
+import os
+import threading
+import unittest
+import warnings
+from unittest import TestCase
+
+from pipeline_dash.importer.jenkins import JenkinsImporter
+from pipeline_dash.importer.loop import EventLoopThread
+
+
+async def loop_and_thread() -> tuple[int, int]:
+    return id(asyncio.get_running_loop()), threading.get_ident()
+
+
+class TestEventLoopThread(TestCase):
+    def setUp(self):
+        self.loop = EventLoopThread(name="test-loop")
+        self.addCleanup(self.loop.stop)
+
+    def test_shared_loop(self):
+        first = self.loop.run(loop_and_thread())
+        self.assertEqual(first, self.loop.run(loop_and_thread()))
+        self.assertNotEqual(threading.get_ident(), first[1])
+
+    def test_run_in_loop_thread(self):
+        async def nested():
+            return self.loop.run(loop_and_thread())
+
+        with self.assertRaises(RuntimeError):
+            self.loop.run(nested())
+
+    @unittest.skipUnless(hasattr(os, "fork"), "requires os.fork")
+    def test_forked_child_gets_new_loop_and_session(self):
+        importer = JenkinsImporter()
+        importer.loop = self.loop
+        self.addCleanup(importer.run, importer._close_session())
+
+        async def session_id() -> int:
+            return id(importer._get_session())
+
+        parent_loop = self.loop.run(loop_and_thread())
+        parent_session = importer.run(session_id())
+        read_fd, write_fd = os.pipe()
+        with warnings.catch_warnings():
+            # forking while the loop thread runs is what a background Dash callback does
+            warnings.simplefilter("ignore", DeprecationWarning)
+            pid = os.fork()
+        if pid == 0:  # pragma: no cover - child process
+            try:
+                child_loop = self.loop.run(loop_and_thread(), timeout=10)
+                child_session = importer.run(session_id())
+                ok = child_loop != parent_loop and child_session != parent_session
+                os.write(write_fd, b"ok" if ok else b"reused")
+            finally:
+                os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd, "rb") as f:
+            result = f.read()
+        os.waitpid(pid, 0)
+        self.assertEqual(b"ok", result, "forked child did not get a new loop and session")
+        # the parent keeps its loop and session
+        self.assertEqual(parent_loop, self.loop.run(loop_and_thread()))
+        self.assertEqual(parent_session, importer.run(session_id()))
@@ -0,0 +1,121 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from click.testing import CliRunner
+
+from pipeline_dash.importer.jenkins import JenkinsImporter
+from pipeline_dash.importer.packed import (
+    _TRAILER,
+    pack_directory,
+    PackedSnapshot,
+    PackedSnapshotError,
+    PackedSnapshotWriter,
+)
+from pipeline_dash.main import cli
+
+
+class TestPackedSnapshot(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.dir = tmp_dir.name
+        self.path = os.path.join(self.dir, "snapshot.pack")
+
+    def test_write_and_read(self):
+        writer = PackedSnapshotWriter(self.path)
+        writer.add("a", {"name": "a", "lastBuild": None})
+        writer.add("b", {"name": "b"})
+        writer.add("c", {"name": "b"})
+        writer.save()
+        with PackedSnapshot(self.path) as snapshot:
+            self.assertEqual(3, len(snapshot))
+            self.assertEqual({"name": "a", "lastBuild": None}, snapshot.get("a"))
+            self.assertEqual({"name": "b"}, snapshot.get("c"))
+            self.assertIsNone(snapshot.get("d"))
+            self.assertEqual(snapshot.raw("b"), snapshot.raw("c"))
+        self.assertEqual(["snapshot.pack"], os.listdir(self.dir), "temporary file left behind")
+
+    def test_deduplicated(self):
+        writer = PackedSnapshotWriter(self.path)
+        writer.add("a", {"name": "a"})
+        writer.save()
+        size = os.path.getsize(self.path)
+        for key in "bcdefgh":
+            writer.add(key, {"name": "a"})
+        writer.save()
+        # only the index grows
+        self.assertLess(os.path.getsize(self.path) - size, 100)
+
+    def test_keeps_existing(self):
+        writer = PackedSnapshotWriter(self.path)
+        writer.add("a", {"name": "a"})
+        writer.add("b", {"name": "b"})
+        writer.save()
+        writer = PackedSnapshotWriter(self.path)
+        self.assertFalse(writer.dirty)
+        writer.add("b", {"name": "new"})
+        writer.save()
+        with PackedSnapshot(self.path) as snapshot:
+            self.assertEqual({"name": "a"}, snapshot.get("a"))
+            self.assertEqual({"name": "new"}, snapshot.get("b"))
+
+    def test_invalid(self):
+        with open(self.path, "wb") as f:
+            f.write(b"{}" * 100)
+        with self.assertRaises(PackedSnapshotError):
+            PackedSnapshot(self.path)
+
+    def test_corrupt_index(self):
+        writer = PackedSnapshotWriter(self.path)
+        writer.add("a", {"name": "a"})
+        writer.save()
+        with open(self.path, "r+b") as f:
+            # the trailer is intact, the index before it is not
+            f.seek(-_TRAILER.size - 4, os.SEEK_END)
+            f.write(b"\0" * 4)
+        with self.assertRaises(PackedSnapshotError):
+            PackedSnapshot(self.path)
+
+    def test_load_corrupt(self):
+        with open(self.path, "wb") as f:
+            f.write(b"{}" * 100)
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=self.dir):
+            result = runner.invoke(cli, ["dash", "--cache", "cache", "--load", self.path, self.path])
+        self.assertEqual(1, result.exit_code, result.output)
+        self.assertIn("is not a packed snapshot", result.output)
+        self.assertNotIn("Traceback", result.output)
+
+    def test_store_suffix(self):
+        directory = os.path.join(self.dir, "responses")
+        self.assertIsNone(JenkinsImporter(store_dir=directory).stored, "directory written as packed snapshot")
+        self.assertIsNotNone(JenkinsImporter(store_dir=self.path).stored)
+
+    def test_empty(self):
+        open(self.path, "wb").close()
+        with self.assertRaises(PackedSnapshotError):
+            PackedSnapshot(self.path)
+        writer = PackedSnapshotWriter(self.path)
+        self.assertEqual(0, len(writer), "empty file is a new snapshot")
+
+    def test_superseded_dropped(self):
+        writer = PackedSnapshotWriter(self.path)
+        writer.add("a", {"result": None})
+        writer.add("b", {"result": None})
+        for result in ("FAILURE", "SUCCESS"):
+            writer.add("a", {"result": result})
+        writer.add("b", {"result": "SUCCESS"})
+        self.assertEqual(1, len(writer._records), "superseded records kept")
+
+    def test_pack_directory(self):
+        responses = os.path.join(self.dir, "responses")
+        os.mkdir(responses)
+        for key in ("0a", "1b"):
+            with open(os.path.join(responses, key), "w") as f:
+                json.dump({"name": key}, f)
+        pack_directory(responses, self.path)
+        with PackedSnapshot(self.path) as snapshot:
+            self.assertEqual(["0a", "1b"], sorted(snapshot.keys()))
+            self.assertEqual({"name": "1b"}, snapshot.get("1b"))
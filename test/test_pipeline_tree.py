@@ -0,0 +1,63 @@
+from unittest import TestCase
+
+import yaml
+
+from pipeline_dash.job_data import JobData, JobStatus
+from pipeline_dash.pipeline_tree import pipeline_tree, PipelineTree
+from pipeline_dash.pipeline_utils import collect_jobs_pipeline
+
+PIPELINE_YAML = """
+servers:
+  "https://test-server":
+    pipelines:
+      .group:
+        a:
+          b:
+          c:
+        d:
+      e:
+"""
+
+
+def job(name: str, serial: str | None = None) -> JobData:
+    return JobData(name=name, status=JobStatus.SUCCESS, serial=serial, server="https://test-server")
+
+
+class TestPipelineTree(TestCase):
+    def setUp(self):
+        self.pipeline = collect_jobs_pipeline(yaml.safe_load(PIPELINE_YAML))
+        self.tree = PipelineTree(self.pipeline)
+
+    def test_preorder(self):
+        tree = self.tree
+        self.assertEqual(["", "group", "a", "b", "c", "d", "e"], [tree.name(i) for i in range(len(tree))])
+        self.assertEqual([-1, 0, 1, 2, 2, 1, 0], list(tree.parents))
+        self.assertEqual([7, 6, 5, 4, 5, 6, 7], list(tree.ends))
+        self.assertEqual([0, 1, 2, 3, 3, 2, 1], list(tree.depths))
+        self.assertEqual([0, 0, 1, 1, 1, 1, 1], list(tree.is_job))
+        self.assertEqual([1, 6], list(tree.children(0)))
+        self.assertEqual([3, 4], list(tree.children(2)))
+        self.assertEqual([], list(tree.children(3)))
+
+    def test_node(self):
+        a = self.tree[2]
+        self.assertEqual("a", a.name)
+        self.assertEqual("https://test-server", a.server)
+        self.assertEqual("group", a.parent.name)
+        self.assertEqual(["b", "c"], [child.name for child in a.children])
+        self.assertIs(self.pipeline["children"]["group"]["children"]["a"], a.dict)
+        self.assertEqual(2, self.tree.position(a.uuid))
+
+    def test_serials(self):
+        job_data = {"a": job("a"), "b": job("b", "2"), "c": job("c", "1"), "d": job("d", "3"), "e": job("e")}
+        self.assertEqual({"1", "2", "3"}, self.tree.serials(job_data))
+        self.assertEqual({"1", "2"}, self.tree.serials(job_data, 2))
+        self.assertEqual({"2"}, self.tree.serials(job_data, 3))
+        self.assertEqual(
+            [self.tree.serials(job_data, i) for i in range(len(self.tree))], self.tree.all_serials(job_data)
+        )
+
+    def test_cached(self):
+        self.assertIs(pipeline_tree(self.pipeline), pipeline_tree(self.pipeline))
+        copy = collect_jobs_pipeline(yaml.safe_load(PIPELINE_YAML))
+        self.assertIs(copy, pipeline_tree(copy).nodes[0], "tree of another pipeline with the same uuids reused")
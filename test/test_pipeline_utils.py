@@ -1,9 +1,18 @@
+import pickle
 from unittest import TestCase
-from unittest.mock import patch
 
 import yaml
 
-from pipeline_dash.pipeline_utils import collect_jobs_pipeline, find_all_pipeline, PipelineDict
+from pipeline_dash.job_data import JobData, JobStatus
+from pipeline_dash.pipeline_utils import (
+    add_recursive_jobs_pipeline,
+    collect_jobs_pipeline,
+    find_all_pipeline,
+    find_pipeline_by_uuid,
+    node_uuid,
+    pipeline_index,
+    PipelineDict,
+)
 
 
 class Test(TestCase):
@@ -53,10 +62,11 @@ class Test(TestCase):
         )
         self.assertEqual([test_dict, test_child], find_all_pipeline(test_dict, lambda name, p: p["recurse"] == True))
 
-    @patch("uuid.uuid4")
-    def test_collect_jobs_pipeline(self, uuid_mock):
+    def test_collect_jobs_pipeline(self):
         self.maxDiff = None
-        uuid_mock.return_value = "fakeuuid"
+        root_uuid = node_uuid("", "")
+        group_uuid = node_uuid(root_uuid, "lunar")
+        job_uuid = node_uuid(group_uuid, "test-job-name", "https://test-server")
 
         test_yaml = yaml.safe_load(
             """
@@ -71,16 +81,16 @@ class Test(TestCase):
         self.assertDictEqual(
             PipelineDict(
                 name="",
-                uuid="fakeuuid",
+                uuid=root_uuid,
                 children={
                     "lunar": PipelineDict(
                         name="lunar",
-                        uuid="fakeuuid",
+                        uuid=group_uuid,
                         recurse=False,
                         children={
                             "test-job-name": PipelineDict(
                                 name="test-job-name",
-                                uuid="fakeuuid",
+                                uuid=job_uuid,
                                 server="https://test-server",
                                 children={},
                                 recurse=True,
@@ -104,16 +114,16 @@ class Test(TestCase):
         self.assertDictEqual(
             PipelineDict(
                 name="",
-                uuid="fakeuuid",
+                uuid=root_uuid,
                 children={
                     "lunar": PipelineDict(
                         name="lunar",
-                        uuid="fakeuuid",
+                        uuid=group_uuid,
                         recurse=True,
                         children={
                             "test-job-name": PipelineDict(
                                 name="test-job-name",
-                                uuid="fakeuuid",
+                                uuid=job_uuid,
                                 server="https://test-server",
                                 children={},
                                 recurse=True,
@@ -124,3 +134,66 @@ class Test(TestCase):
             ),
             collect_jobs_pipeline(test_yaml),
         )
+
+    def test_pipeline_index(self):
+        test_yaml = yaml.safe_load(
+            """
+            servers:
+              "https://test-server":
+                pipelines:
+                  .group:
+                    a:
+                      b:
+                      c:
+                    b:
+            """
+        )
+        pipeline = collect_jobs_pipeline(test_yaml)
+        index = pipeline_index(pipeline)
+        group = pipeline["children"]["group"]
+        a = group["children"]["a"]
+        b = a["children"]["b"]
+        self.assertEqual(6, len(index))
+        self.assertEqual(("group", "a", "b"), index.path(b["uuid"]))
+        self.assertEqual([a["uuid"], group["uuid"], pipeline["uuid"]], index.ancestors(b["uuid"]))
+        self.assertEqual(2, len(index.uuids("b")))
+        self.assertIs(pipeline, find_pipeline_by_uuid(pipeline, pipeline["uuid"]))
+        self.assertIsNone(find_pipeline_by_uuid(pipeline, "unknown"))
+
+        # usable with a copy of the pipeline, e.g. read from the cache
+        copy = pickle.loads(pickle.dumps(pipeline))
+        self.assertEqual(b, find_pipeline_by_uuid(copy, b["uuid"]))
+        self.assertIsNot(b, find_pipeline_by_uuid(copy, b["uuid"]))
+
+        # nodes added for recursive jobs are indexed
+        a["children"]["c"]["recurse"] = True
+        job_data = {
+            "c": JobData(name="c", status=JobStatus.SUCCESS, downstream={"d": "https://test-server"}),
+            "d": JobData(name="d", status=JobStatus.SUCCESS),
+        }
+        add_recursive_jobs_pipeline(pipeline, job_data)
+        d = a["children"]["c"]["children"]["d"]
+        self.assertEqual(("group", "a", "c", "d"), index.path(d["uuid"]))
+        self.assertEqual(d, find_pipeline_by_uuid(pipeline, d["uuid"]))
+        self.assertIsNone(find_pipeline_by_uuid(copy, d["uuid"]))
+
+    def test_stable_uuids(self):
+        test_yaml = yaml.safe_load(
+            """
+            name: config
+            servers:
+              "https://test-server":
+                pipelines:
+                  .group:
+                    a:
+                      b:
+                    b:
+            """
+        )
+        pipeline = collect_jobs_pipeline(test_yaml)
+        self.assertEqual(pipeline, collect_jobs_pipeline(test_yaml), "uuids changed when collected again")
+        group = pipeline["children"]["group"]
+        self.assertNotEqual(group["children"]["b"]["uuid"], group["children"]["a"]["children"]["b"]["uuid"])
+
+        test_yaml["name"] = "other config"
+        self.assertNotEqual(pipeline["uuid"], collect_jobs_pipeline(test_yaml)["uuid"])
@@ -0,0 +1,48 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from pipeline_dash.importer.resilience import BreakerConfig, BreakerState, CircuitBreaker, RetryBudget
+
+
+class TestCircuitBreaker(TestCase):
+    def setUp(self):
+        self.now = 100.0
+        patcher = patch("pipeline_dash.importer.resilience.time.monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker("test", BreakerConfig(failure_threshold=3, reset_timeout=30.0))
+
+    def test_opens_after_threshold(self):
+        for _ in range(2):
+            self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(BreakerState.OPEN, self.breaker.state)
+        self.assertFalse(self.breaker.allow())
+
+    def test_probe(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.now += 30.0
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow(), "more than one probe let through")
+        self.breaker.record_failure()
+        self.assertEqual(BreakerState.OPEN, self.breaker.state)
+        self.now += 30.0
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(BreakerState.CLOSED, self.breaker.state)
+        self.assertTrue(self.breaker.allow())
+
+
+class TestRetryBudget(TestCase):
+    @patch("pipeline_dash.importer.resilience.time.monotonic", return_value=0.0)
+    def test_budget(self, _):
+        budget = RetryBudget(ratio=0.5, min_per_second=0.0, max_tokens=2.0)
+        self.assertTrue(budget.try_spend())
+        self.assertTrue(budget.try_spend())
+        self.assertFalse(budget.try_spend())
+        budget.record_request()
+        budget.record_request()
+        self.assertTrue(budget.try_spend())
+        self.assertEqual(1, budget.exhausted)
@@ -0,0 +1,89 @@
+import asyncio
+import tempfile
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+import diskcache  # type: ignore
+
+from pipeline_dash.importer.jenkins import hash_url, JenkinsImporter
+from pipeline_dash.importer.response_cache import CacheTTL, ResponseCache
+
+SERVER = "https://test-server"
+
+
+def temp_cache(test: TestCase) -> diskcache.Cache:
+    tmp_dir = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp_dir.cleanup)
+    cache = diskcache.Cache(tmp_dir.name)
+    test.addCleanup(cache.close)
+    return cache
+
+
+class TestCacheTTL(TestCase):
+    def test_for_response(self):
+        ttl = CacheTTL(success=1000, completed=500, in_progress=2, job=30)
+        self.assertEqual(1000, ttl.for_response({"id": "1", "result": "SUCCESS"}))
+        self.assertEqual(500, ttl.for_response({"id": "1", "result": "FAILURE"}))
+        self.assertEqual(2, ttl.for_response({"id": "1", "result": None}))
+        self.assertEqual(30, ttl.for_response({"name": "a", "lastBuild": {"url": "x"}}))
+        self.assertEqual(30, ttl.for_response({"name": "a", "lastBuild": {"id": "1", "result": "SUCCESS"}}))
+        self.assertEqual(2, ttl.for_response({"name": "a", "lastBuild": {"id": "1", "result": None}}))
+        listing = {"jobs": [{"name": "a", "lastBuild": None}, {"name": "b", "lastBuild": {"result": None}}]}
+        self.assertEqual(2, ttl.for_response(listing))
+
+    def test_from_options(self):
+        ttl = CacheTTL.from_options(("success=86400", "in-progress=1"))
+        self.assertEqual(86400, ttl.success)
+        self.assertEqual(1, ttl.in_progress)
+        self.assertEqual(CacheTTL.job, ttl.job)
+        with self.assertRaises(ValueError):
+            CacheTTL.from_options(("unknown=1",))
+
+
+class TestResponseCache(IsolatedAsyncioTestCase):
+    async def test_fresh_and_stale(self):
+        cache = ResponseCache(temp_cache(self), CacheTTL(success=1000, in_progress=2))
+        self.assertIsNone(await cache.get("key"))
+        with patch("time.time", return_value=100.0):
+            await cache.store("done", {"result": "SUCCESS"})
+            await cache.store("running", {"result": None})
+        with patch("time.time", return_value=110.0):
+            self.assertEqual(({"result": "SUCCESS"}, True), await cache.get("done"))
+            self.assertEqual(({"result": None}, False), await cache.get("running"))
+        self.assertEqual((1, 1, 1), (cache.fresh, cache.stale, cache.misses))
+
+
+class TestReadThroughApi(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.cache = ResponseCache(temp_cache(self), CacheTTL(in_progress=0))
+        self.importer = JenkinsImporter(response_cache=self.cache)
+        self.fetched: list[str] = []
+        self.result = None
+
+        async def fetch(session, url, api_url, file_name):
+            self.fetched.append(api_url)
+            await asyncio.sleep(0)
+            data = {"id": "1", "result": self.result}
+            await self.cache.store(file_name, data)
+            return data
+
+        patcher = patch.object(self.importer, "_fetch", side_effect=fetch)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await self.importer._close_session()
+
+    async def test_serve_stale_while_revalidating(self):
+        self.assertEqual({"id": "1", "result": None}, await self.importer.api(f"{SERVER}/job/a/1"))
+        self.assertEqual(1, len(self.fetched))
+        # expired immediately, served stale and revalidated in the background
+        self.result = "SUCCESS"
+        self.assertEqual({"id": "1", "result": None}, await self.importer.api(f"{SERVER}/job/a/1"))
+        self.assertEqual({"id": "1", "result": None}, await self.importer.api(f"{SERVER}/job/a/1"))
+        await asyncio.gather(*self.importer._revalidations)
+        self.assertEqual(2, len(self.fetched), "concurrent revalidations were not coalesced")
+        # revalidated response is fresh
+        self.assertEqual({"id": "1", "result": "SUCCESS"}, await self.importer.api(f"{SERVER}/job/a/1"))
+        self.assertEqual(2, len(self.fetched))
+        self.assertIsNotNone(await self.cache.get(hash_url(f"{SERVER}/job/a/1/api/json")))
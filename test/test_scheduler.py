@@ -0,0 +1,45 @@
+from dataclasses import replace
+from unittest import TestCase
+
+from pipeline_dash.importer.scheduler import PollingConfig, PollScheduler
+from pipeline_dash.job_data import JobData, JobStatus
+
+SERVER = "https://test-server"
+
+
+def job(name: str, status: JobStatus, build_num: str = "1") -> JobData:
+    return JobData(name=name, status=status, build_num=build_num, server=SERVER)
+
+
+class TestPollScheduler(TestCase):
+    def setUp(self):
+        self.scheduler = PollScheduler({"done": SERVER, "running": SERVER}, PollingConfig(floor=10, ceiling=50))
+        self.previous = {"done": job("done", JobStatus.SUCCESS), "running": job("running", JobStatus.IN_PROGRESS)}
+
+    def test_backoff(self):
+        now = 0.0
+        intervals = []
+        for _ in range(5):
+            self.scheduler.update(self.previous, self.previous, now)
+            self.assertEqual({"running"}, set(self.scheduler.due(now + 10)))
+            intervals.append(self.scheduler._next_poll["done"] - now)
+            now = self.scheduler._next_poll["done"]
+            self.assertIn("done", self.scheduler.due(now))
+        self.assertEqual([20, 40, 50, 50, 50], intervals)
+
+    def test_changed_resets_interval(self):
+        for _ in range(3):
+            self.scheduler.update(self.previous, self.previous, 0.0)
+        self.assertEqual(50, self.scheduler._interval["done"])
+        self.scheduler.update(self.previous, {"done": job("done", JobStatus.FAILURE, "2")}, 0.0)
+        self.assertEqual(10, self.scheduler._interval["done"])
+        self.assertEqual({"done": SERVER, "running": SERVER}, self.scheduler.due(10.0))
+
+    def test_stale_keeps_floor(self):
+        for _ in range(3):
+            self.scheduler.update(self.previous, self.previous, 0.0)
+        self.assertEqual(50, self.scheduler._interval["done"])
+        # the job could not be fetched and kept its previous data, which looks unchanged
+        self.scheduler.update(self.previous, {"done": replace(self.previous["done"], stale=True)}, 0.0)
+        self.assertEqual(10, self.scheduler._interval["done"])
+        self.assertIn("done", self.scheduler.due(10.0))
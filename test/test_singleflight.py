@@ -0,0 +1,58 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from pipeline_dash.importer.singleflight import SingleFlight
+
+
+class TestSingleFlight(IsolatedAsyncioTestCase):
+    async def test_coalesce(self):
+        flight: SingleFlight[int] = SingleFlight()
+        calls = 0
+
+        async def fetch() -> int:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)), flight.do("other", fetch))
+        self.assertEqual(2, calls)
+        self.assertEqual(1, len(set(results[:5])))
+        self.assertEqual((2, 4), (flight.calls, flight.coalesced))
+        self.assertEqual(3, await flight.do("key", fetch), "finished call was reused")
+
+    async def test_exception_shared(self):
+        flight: SingleFlight[int] = SingleFlight()
+
+        async def fail() -> int:
+            await asyncio.sleep(0.01)
+            raise ValueError()
+
+        results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+    async def test_cancelled_with_last_waiter(self):
+        flight: SingleFlight[int] = SingleFlight()
+        started, cancelled = asyncio.Event(), asyncio.Event()
+
+        async def fetch() -> int:
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return 1
+
+        first = asyncio.create_task(flight.do("key", fetch))
+        second = asyncio.create_task(flight.do("key", fetch))
+        await started.wait()
+        first.cancel()
+        await asyncio.sleep(0)
+        self.assertFalse(cancelled.is_set(), "call cancelled while another caller waits for it")
+        self.assertTrue(flight.in_flight("key"))
+        second.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.gather(first, second, return_exceptions=True)
+        await asyncio.sleep(0)
+        self.assertFalse(flight.in_flight("key"))
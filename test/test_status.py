@@ -0,0 +1,179 @@
+import collections
+import copy
+import itertools
+from typing import List, Optional
+from unittest import TestCase
+
+import yaml
+
+from pipeline_dash.job_data import JobData, JobDataDict, JobName, JobStatus
+from pipeline_dash.pipeline_tree import pipeline_tree
+from pipeline_dash.pipeline_utils import collect_jobs_pipeline, PipelineDict, recurse_pipeline
+from pipeline_dash.status import calculate_status, StatusAggregator
+
+PIPELINE_YAML = """
+servers:
+  "https://test-server":
+    pipelines:
+      .group:
+        a:
+          b:
+          c:
+            d:
+        e:
+      f:
+"""
+
+
+def job(name: str, status: JobStatus = JobStatus.SUCCESS, serial: str | None = None) -> JobData:
+    return JobData(name=name, status=status, serial=serial, server="https://test-server")
+
+
+def baseline_calculate_status(pipeline: PipelineDict, job_data: JobDataDict) -> None:
+    """The recursive `calculate_status` that `StatusAggregator` replaced, kept as it was to compare against"""
+
+    def recursive_calculate_status(name: JobName, p: PipelineDict, serial: Optional[str] = None) -> List[str]:
+        if not serial:
+            serial = job_data.get(name, JobData.UNDEFINED).serial
+        statuses = recurse_pipeline(p, recursive_calculate_status, serial)
+        old_serial = False
+        if "server" in p:
+            if (job_data[name].serial is None and serial) or (
+                serial and job_data[name].serial is not None and float(job_data[name].serial or 0) < float(serial)
+            ):
+                status = [JobStatus.NOT_RUN.value]
+                old_serial = True
+            else:
+                if job_data[name].status.value is None:
+                    job_data[name].status = JobStatus.IN_PROGRESS
+                status = [job_data[name].status.value]
+
+            p["status"] = status[0]
+            if statuses is None:
+                statuses = []
+            statuses.append(status)
+        if isinstance(statuses, list) and isinstance(statuses[0], list):
+            statuses = list(itertools.chain.from_iterable(statuses))
+        if len(statuses) > 1:
+            counter = collections.Counter(statuses[:-1])
+            if old_serial:
+                p["downstream_status"] = "NOT RUN"
+            elif counter["FAILURE"]:
+                p["downstream_status"] = "FAILURE"
+            elif counter["UNSTABLE"]:
+                p["downstream_status"] = "UNSTABLE"
+            elif counter["In Progress"] or counter[None]:
+                p["downstream_status"] = "In Progress"
+            elif counter["SUCCESS"]:
+                p["downstream_status"] = "SUCCESS"
+            else:
+                p["downstream_status"] = "NOT RUN"
+        else:
+            p["downstream_status"] = None
+
+        return statuses
+
+    recursive_calculate_status("", pipeline)
+
+
+def statuses(pipeline: dict) -> list[tuple]:
+    return [(node["name"], node.get("status"), node.get("downstream_status")) for node in pipeline_tree(pipeline).nodes]
+
+
+class TestStatusAggregator(TestCase):
+    def setUp(self):
+        self.pipeline = collect_jobs_pipeline(yaml.safe_load(PIPELINE_YAML))
+        self.job_data = {name: job(name, serial="1") for name in "abcdef"}
+        self.aggregator = StatusAggregator(self.pipeline)
+        self.aggregator.calculate(self.job_data)
+
+    def assert_same_as_baseline(self, job_data):
+        expected = collect_jobs_pipeline(yaml.safe_load(PIPELINE_YAML))
+        expected_job_data = copy.deepcopy(job_data)
+        baseline_calculate_status(expected, expected_job_data)
+        self.assertEqual(statuses(expected), statuses(self.pipeline))
+        self.assertEqual(
+            {k: v.status for k, v in expected_job_data.items()}, {k: v.status for k, v in job_data.items()}
+        )
+
+    def test_calculate(self):
+        self.assertEqual("SUCCESS", self.pipeline["children"]["group"]["downstream_status"])
+        job_data = self.job_data | {"d": job("d", JobStatus.FAILURE, "1")}
+        self.aggregator.calculate(job_data)
+        self.assertEqual("FAILURE", self.pipeline["children"]["group"]["downstream_status"])
+        self.assertEqual("FAILURE", self.pipeline["children"]["group"]["children"]["a"]["downstream_status"])
+
+    def test_update_status(self):
+        job_data = self.job_data | {"d": job("d", JobStatus.FAILURE, "1")}
+        self.aggregator.update(job_data, {"d"})
+        self.assert_same_as_baseline(job_data)
+        self.assertEqual(5, self.aggregator.updated, "only d and its ancestors are recalculated")
+
+    def test_update_serial(self):
+        # a new build of a with a newer serial makes the old builds below it NOT RUN
+        job_data = self.job_data | {"a": job("a", JobStatus.IN_PROGRESS, "2")}
+        self.aggregator.update(job_data, {"a"})
+        self.assert_same_as_baseline(job_data)
+        self.assertEqual("NOT RUN", self.pipeline["children"]["group"]["children"]["a"]["children"]["b"]["status"])
+
+        job_data = job_data | {name: job(name, serial="2") for name in "bcd"}
+        self.aggregator.update(job_data, {"b", "c", "d"})
+        self.assert_same_as_baseline(job_data)
+
+    def test_update_undefined(self):
+        job_data = self.job_data | {"f": job("f", JobStatus.UNDEFINED)}
+        self.aggregator.update(job_data, {"f"})
+        self.assertEqual(JobStatus.IN_PROGRESS, job_data["f"].status)
+        # unchanged, but a new snapshot with new job data objects
+        job_data = copy.deepcopy(job_data)
+        job_data |= {"f": job("f", JobStatus.UNDEFINED), "b": job("b", JobStatus.UNSTABLE, "1")}
+        self.aggregator.update(job_data, {"b"})
+        self.assert_same_as_baseline(job_data)
+
+    def test_calculate_statuses(self):
+        pipeline = collect_jobs_pipeline(
+            yaml.safe_load(
+                """
+                servers:
+                  "https://test-server":
+                    pipelines:
+                      .group:
+                        a:
+                          b:
+                          c:
+                        .deploy:
+                          f:
+                      d:
+                        e:
+                """
+            )
+        )
+        job_data = {
+            "a": job("a", serial="2"),
+            "b": job("b", JobStatus.FAILURE, "2"),
+            "c": job("c", JobStatus.UNDEFINED, "2"),
+            "d": job("d", JobStatus.UNSTABLE, "3"),
+            "e": job("e", JobStatus.UNDEFINED, "2"),
+            "f": job("f", JobStatus.SUCCESS, "1"),
+        }
+        baseline_pipeline, baseline_job_data = copy.deepcopy(pipeline), copy.deepcopy(job_data)
+        calculate_status(pipeline, job_data)
+        baseline_calculate_status(baseline_pipeline, baseline_job_data)
+        self.assertEqual(statuses(baseline_pipeline), statuses(pipeline))
+        self.assertEqual(
+            {k: v.status for k, v in baseline_job_data.items()}, {k: v.status for k, v in job_data.items()}
+        )
+        expected = [
+            ("", None, "FAILURE"),
+            ("group", None, "FAILURE"),
+            ("a", "SUCCESS", "FAILURE"),
+            ("b", "FAILURE", None),
+            ("c", "In Progress", None),
+            ("deploy", None, None),
+            ("f", "SUCCESS", None),
+            ("d", "UNSTABLE", "NOT RUN"),
+            ("e", "NOT RUN", None),
+        ]
+        self.assertEqual(expected, statuses(pipeline))
+        self.assertEqual(JobStatus.IN_PROGRESS, job_data["c"].status)
+        self.assertEqual(JobStatus.UNDEFINED, job_data["e"].status, "NOT RUN jobs keep their status")
@@ -0,0 +1,68 @@
+import pathlib
+import pickle
+import tempfile
+from unittest import TestCase
+
+from pipeline_dash.importer.topology import TopologyCache, TopologyEntry
+from pipeline_dash.job_data import JobData, JobStatus
+
+SERVER = "https://test-server"
+
+DOWNSTREAM = {
+    "root": ["a", "b"],
+    "a": ["c"],
+    "b": [],
+    "c": ["d"],
+    "d": [],
+}
+
+
+def job(name: str, build_num: str = "1") -> JobData:
+    return JobData(
+        name=name,
+        status=JobStatus.SUCCESS,
+        build_num=build_num,
+        server=SERVER,
+        downstream={d: SERVER for d in DOWNSTREAM[name]},
+    )
+
+
+class TestTopologyCache(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = pathlib.Path(tmp_dir.name) / "topology.pickle"
+        self.cache = TopologyCache.from_job_data({name: job(name) for name in DOWNSTREAM})
+
+    def test_save_and_load(self):
+        self.assertEqual(TopologyCache(), TopologyCache.load(self.path))
+        self.cache.save(self.path)
+        self.assertEqual(self.cache, TopologyCache.load(self.path))
+
+    def test_load_outdated(self):
+        with open(self.path, "wb") as f:
+            pickle.dump(TopologyCache(jobs={"a": TopologyEntry(SERVER, "1")}, version=0), f)
+        self.assertEqual(TopologyCache(), TopologyCache.load(self.path))
+        self.path.write_bytes(b"not a pickle")
+        with self.assertLogs("pipeline_dash.importer.topology", "WARNING"):
+            self.assertEqual(TopologyCache(), TopologyCache.load(self.path))
+
+    def test_is_valid(self):
+        self.assertTrue(self.cache.is_valid("a", job("a")))
+        self.assertFalse(self.cache.is_valid("a", job("a", build_num="2")), "new build may have new edges")
+        self.assertFalse(self.cache.is_valid("unknown", job("a")))
+
+    def test_valid_subtree(self):
+        self.assertEqual({name: SERVER for name in "abcd"}, self.cache.valid_subtree({"root": job("root")}))
+        # the edges of a changed root have to be discovered again
+        self.assertEqual({}, self.cache.valid_subtree({"root": job("root", build_num="2")}))
+        self.assertEqual(
+            {"b": SERVER},
+            self.cache.valid_subtree({"root": job("root"), "a": job("a", build_num="2")}),
+            "subtree of the changed root a is left out",
+        )
+
+    def test_stale_jobs_left_out(self):
+        stale = JobData(name="a", status=JobStatus.UNDEFINED, server=SERVER, stale=True)
+        cache = TopologyCache.from_job_data({"root": job("root"), "a": stale})
+        self.assertEqual({"root"}, set(cache.jobs))
@@ -0,0 +1,112 @@
+import tempfile
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+import diskcache  # type: ignore
+from flask import Flask
+
+from pipeline_dash.importer.fetcher import BackgroundFetcher, SnapshotStore
+from pipeline_dash.importer.jenkins import JenkinsImporter
+from pipeline_dash.importer.webhook import apply_event, parse_notification
+from pipeline_dash.job_data import JobData, JobStatus
+from pipeline_dash.viz.dash.viz_dash import add_notification_route, NOTIFICATION_ROUTE, NOTIFICATION_TOKEN_HEADER
+
+SERVER = "https://test-server"
+
+
+def notification(number: int, phase: str = "COMPLETED", status: str = "SUCCESS", job: str = "team/job/Build") -> dict:
+    return {
+        "name": job.rpartition("/")[2],
+        "url": f"job/{job}/",
+        "build": {
+            "number": number,
+            "phase": phase,
+            "status": status,
+            "full_url": f"{SERVER}/job/{job}/{number}/",
+            "url": f"job/{job}/{number}/",
+            "parameters": {"SERIAL": "1.2"},
+        },
+    }
+
+
+class TestParseNotification(TestCase):
+    def test_completed(self):
+        event = parse_notification(notification(5))
+        self.assertEqual(SERVER, event.server)
+        self.assertEqual("team/job/Build", event.job)
+        self.assertEqual(5, event.build_num)
+        self.assertEqual(JobStatus.SUCCESS, event.status)
+        self.assertEqual("1.2", event.serial)
+
+    def test_started(self):
+        self.assertEqual(JobStatus.IN_PROGRESS, parse_notification(notification(5, "STARTED", None)).status)
+
+    def test_ignored(self):
+        self.assertIsNone(parse_notification(notification(5, "QUEUED")))
+        self.assertIsNone(parse_notification({"name": "Build"}))
+        self.assertIsNone(parse_notification({"url": "job/Build/", "build": {"phase": "STARTED"}}))
+
+
+class TestApplyEvent(TestCase):
+    def test_apply(self):
+        data = JobData(name="Build", status=JobStatus.SUCCESS, build_num="4", serial="1.1", server=SERVER)
+        started = apply_event(data, parse_notification(notification(5, "STARTED", None)))
+        self.assertEqual(("5", JobStatus.IN_PROGRESS), (started.build_num, started.status))
+        completed = apply_event(started, parse_notification(notification(5, status="FAILURE")))
+        self.assertEqual(("5", JobStatus.FAILURE, "1.2"), (completed.build_num, completed.status, completed.serial))
+        self.assertIsNone(apply_event(completed, parse_notification(notification(5, "STARTED", None))))
+        self.assertIsNone(apply_event(completed, parse_notification(notification(4))))
+
+
+class TestPush(IsolatedAsyncioTestCase):
+    async def test_push(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        cache = diskcache.Cache(tmp_dir.name)
+        self.addCleanup(cache.close)
+        fetcher = BackgroundFetcher(JenkinsImporter(), SnapshotStore(cache))
+        build = JobData(name="Build", status=JobStatus.SUCCESS, build_num="4", server=SERVER)
+        fetcher.add_config("one", {"team/job/Build": SERVER}, {"team/job/Build": build})
+        fetcher.add_config("two", {"Other": SERVER}, {"Other": build})
+
+        self.assertEqual(["one"], await fetcher.push(parse_notification(notification(5, status="FAILURE"))))
+        self.assertEqual(JobStatus.FAILURE, fetcher.store.latest("one").job_data["team/job/Build"].status)
+        self.assertEqual({"team/job/Build"}, fetcher.store.latest("one").changed)
+        self.assertIsNone(fetcher.store.latest("two").changed, "first snapshot")
+        self.assertEqual([], await fetcher.push(parse_notification(notification(5, status="FAILURE"))))
+
+        # a refresh that fetched the older build does not undo the pushed one
+        await fetcher._publish("one", {"team/job/Build": build})
+        self.assertEqual("5", fetcher.store.latest("one").job_data["team/job/Build"].build_num)
+        self.assertEqual(frozenset(), fetcher.store.latest("one").changed)
+
+        # the plugin is configured with another URL of the server
+        other_url = notification(6, job="Other")
+        other_url["build"]["full_url"] = "https://jenkins.test-server/job/Other/6/"
+        with self.assertLogs("pipeline_dash.importer.fetcher", "WARNING") as logs:
+            self.assertEqual([], await fetcher.push(parse_notification(other_url)))
+        self.assertIn("https://jenkins.test-server", logs.output[0])
+
+
+class TestNotificationRoute(TestCase):
+    def setUp(self):
+        self.payloads: list[dict] = []
+        app = Flask(__name__)
+        add_notification_route(app, lambda payload: self.payloads.append(payload) or ["one"], "secret")
+        self.client = app.test_client()
+
+    def test_token_required(self):
+        self.assertEqual(401, self.client.post(NOTIFICATION_ROUTE, json=notification(5)).status_code)
+        self.assertEqual(401, self.client.post(f"{NOTIFICATION_ROUTE}?token=wrong", json=notification(5)).status_code)
+        self.assertEqual([], self.payloads)
+
+    def test_token(self):
+        r = self.client.post(f"{NOTIFICATION_ROUTE}?token=secret", json=notification(5))
+        self.assertEqual((200, {"updated": ["one"]}), (r.status_code, r.get_json()))
+        r = self.client.post(NOTIFICATION_ROUTE, json=notification(5), headers={NOTIFICATION_TOKEN_HEADER: "secret"})
+        self.assertEqual(200, r.status_code)
+        self.assertEqual(400, self.client.post(f"{NOTIFICATION_ROUTE}?token=secret", data="[]").status_code)
+        self.assertEqual(2, len(self.payloads))
+
+    def test_no_token(self):
+        with self.assertRaises(ValueError):
+            add_notification_route(Flask(__name__), lambda payload: [], "")